@@ -1,16 +1,17 @@
 import sys
 sys.path.append('.')
 
-import numpy as np
-import pygfx as gfx
+# 编译进程池的子进程(spawn)会重新导入本模块，界面相关的导入只在主进程进行
+if __name__ == '__main__':
+    import numpy as np
+    import pygfx as gfx
 
-import gi
-gi.require_version("Gtk", "4.0")
-from gi.repository import GLib, Gtk, Gio
+    import gi
+    gi.require_version("Gtk", "4.0")
+    from gi.repository import GLib, Gtk, Gio
 
-from app_window import *
+    from app_window import *
 
-if __name__ == '__main__':
     GLib.set_application_name('Simtoy')
 
     settings = Gtk.Settings.get_default()
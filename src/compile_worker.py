@@ -0,0 +1,19 @@
+import os
+import sys
+import types
+
+# 编译进程池(见 simtoy/tools/engravtor/compiler.py)子进程的入口。
+# 子进程反序列化任务时要导入 simtoy.tools.engravtor 下的模块，而simtoy包和engravtor包的__init__会加载GTK、pygfx和渲染器；
+# 子进程先把这几个包登记为只有搜索路径的包，之后只导入编译用到的NumPy模块
+
+
+PACKAGES = ['simtoy','simtoy.tools','simtoy.tools.engravtor']
+
+def initialize():
+    # 进程池的initializer，在子进程执行第一个任务之前调用；本模块不导入simtoy
+    root = os.path.dirname(os.path.abspath(__file__))
+    for name in PACKAGES:
+        if name in sys.modules: continue
+        package = types.ModuleType(name)
+        package.__path__ = [os.path.join(root,*name.split('.'))]
+        sys.modules[name] = package
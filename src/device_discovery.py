@@ -8,14 +8,20 @@ import threading
 import serial
 
 from simtoy import *
+from simtoy.tools.engravtor.toolpath import GcodeWriter
+from simtoy.tools.engravtor.compactor import pulse_resolution
 
 class USBController:
     def __init__(self):
         self.serial = None
         self.name = ''
+        self.pulse = '$222P1P400'
+        self.writer = GcodeWriter(pulse_resolution(self.pulse),comments=False)
         self.steps = []        
         self.connected = False
         self.mutex = threading.Lock()
+        # 待发送队列和writer的模态状态由界面线程和发送线程共用；mutex在整个作业期间由发送线程持有，队列另用一把锁
+        self.queue_lock = threading.Lock()
         self.event = threading.Event()
         threading.Thread(target=self.worker,daemon=True).start()
 
@@ -65,7 +71,7 @@ class USBController:
 
     def set_pulse(self):
         with self.mutex:
-            req = f'$222P1P400\n'.encode()
+            req = f'{self.pulse}\n'.encode()
             self.serial.write(req)
             res = self.serial.readline()
 
@@ -81,34 +87,60 @@ class USBController:
             self.serial.write(req)
             res = self.serial.readline()
             
-    def excute(self, gcode:str):
-        reqs = []
-        for line in gcode.splitlines(True):
-            if not line.strip(): continue
-            if line.strip().startswith(';'): continue
-            reqs.append(line.encode())
-        self.steps.extend(reqs)
+    def excute(self, gcode):
+        # gcode为工具路径数组(发送时才格式化为文本)，或手工输入的G代码文本
+        if isinstance(gcode,str):
+            reqs = []
+            for line in gcode.splitlines(True):
+                if not line.strip(): continue
+                if line.strip().startswith(';'): continue
+                reqs.append(line.encode())
+            with self.queue_lock:
+                self.steps.extend(reqs)
+                # 手工指令改变了机器状态，之后的工具路径输出完整的模态字
+                self.writer.reset()
+        else:
+            with self.queue_lock:
+                self.steps.append(gcode)
         self.event.set()
 
+    def clear(self):
+        # 丢弃未发送的指令；writer的模态状态与机器对应不上，之后的工具路径输出完整的模态字
+        with self.queue_lock:
+            self.steps.clear()
+            self.writer.reset()
+
+    def take(self,n):
+        # 从待发送队列取出最多n行文本
+        reqs = []
+        while self.steps and len(reqs) < n:
+            head = self.steps[0]
+            if isinstance(head,bytes):
+                reqs.append(self.steps.pop(0))
+                continue
+            rows = head[:n - len(reqs)]
+            reqs.extend(f'{line}\n'.encode() for line in self.writer.lines(rows))
+            if len(rows) == len(head): self.steps.pop(0)
+            else: self.steps[0] = head[len(rows):]
+        return reqs
+
     def worker(self):
         import time
                                                        
         while True:
-            count = len(self.steps)
             sent = 0
             received = 0
             limit = 500
 
             with self.mutex:
-                while count or received < sent:
-                    req = self.steps[:received + limit - sent]
+                while self.steps or received < sent:
+                    with self.queue_lock:
+                        req = self.take(received + limit - sent)
 
                     if req:
                         s = b''.join(req)
                         self.serial.write(s)
-                        self.steps = self.steps[len(req):]
                         sent += len(req)
-                        count -= len(req)
 
                     res = self.serial.read_all().splitlines(True)
 
@@ -8,6 +8,8 @@ import pygfx as gfx
 from simtoy import *
 from simtoy.tools.engravtor import *
 import threading
+import queue
+import traceback
 
 @Gtk.Template(filename='ui/panel.ui')
 class Panel (Gtk.Box):
@@ -46,6 +48,8 @@ class Panel (Gtk.Box):
     box_start = Gtk.Template.Child('box_start')
     btn_start = Gtk.Template.Child('start')
     textview_gcode = Gtk.Template.Child('textview_gcode')
+    lbl_estimate = Gtk.Template.Child('estimate')
+    spin_rate = Gtk.Template.Child('rate')
     
     # listview = Gtk.Template.Child('geoms')
     # expander_device = Gtk.Template.Child('expander_device')
@@ -371,7 +375,7 @@ class Panel (Gtk.Box):
             GLib.idle_add(present)
         else:
             sender.set_label('走边框')
-            controller.steps.clear()
+            controller.clear()
             controller.excute('G0\n')
 
     @GObject.Signal(return_type=bool, arg_types=(object,))
@@ -387,31 +391,45 @@ class Panel (Gtk.Box):
         self.box_process.set_visible(False)
        
         self.emit('preview', True)
-        self.gcode = []
         buffer = self.textview_gcode.get_buffer()
         buffer.set_text('')
+        self.lbl_estimate.set_label('正在编译…')
 
-        svg = self.owner.export_svg()
-        import tempfile
-        temp_file = tempfile.NamedTemporaryFile(delete=False); temp_file.close()
-        svg_filepath = temp_file.name + '.svg'
-        gc_filepath = temp_file.name + '.gc'
-
-        with open(svg_filepath,'w',encoding='utf-8') as f2:
-            f2.write(svg)
-        
-        import subprocess as sp
-        cmd = ['python','src/gcoder.py',svg_filepath,gc_filepath]
-        self.p = sp.Popen(cmd,stdout=sp.PIPE,text=True,encoding='utf-8')
-        print(' '.join(cmd))
-        
         controller = None
         item = self.device_selection.get_selected_item()
         if item and item.controller.connected:
             controller = item.controller
         else:
             controller = self.owner
-        limit = line_count = 0
+        limit = line_count = shown = 0
+
+        from simtoy.tools.engravtor.toolpath import Toolpath,GcodeWriter,OP_OFF,OP_END
+        from simtoy.tools.engravtor.compactor import pulse_resolution
+        from simtoy.tools.engravtor.estimate import Estimator
+        resolution = pulse_resolution(controller.pulse)
+        names,paths = self.owner.export_toolpath(resolution)
+        # 工具路径按行存放，文本框里的第n行就是第n条指令
+        self.gcode = Toolpath()
+        writer = GcodeWriter(resolution,names)
+        estimator = Estimator()
+        compiled = False
+        error = None
+
+        # 编译在后台线程进行，逐个元素的工具路径经队列交给界面线程，None表示编译结束；
+        # 编译出错时先放入异常再放入None，界面停止等待并显示错误
+        arrays = queue.Queue()
+        cancel = threading.Event()
+        def worker():
+            try:
+                for path in paths:
+                    if cancel.is_set(): return
+                    arrays.put(path)
+            except Exception as e:
+                traceback.print_exc()
+                arrays.put(e)
+            finally:
+                arrays.put(None)
+        threading.Thread(target=worker,daemon=True).start()
 
         def f():
             def f2(line):
@@ -428,36 +446,62 @@ class Panel (Gtk.Box):
                 buffer.place_cursor(iter)
                 buffer.delete_mark(mark)
 
-            nonlocal line_count,limit
-            if not self.get_root().get_mapped() or (line_count == len(self.gcode) and self.p.poll() is not None):
+            nonlocal line_count,limit,compiled,shown,error
+            if not self.get_root().get_mapped() or (line_count == len(self.gcode) and compiled):
+                cancel.set()
                 return False
 
-            lines = self.p.stdout.readlines(20 * 500)
-
-            if len(lines):                
-                self.gcode.extend(lines)
-                f2(''.join(lines))
+            if shown == len(self.gcode) and not compiled:
+                # 取出已编译好的全部数组，没有则等下一次空闲回调
+                while not compiled and not arrays.empty():
+                    path = arrays.get()
+                    if isinstance(path,Exception):
+                        error = path
+                        continue
+                    compiled = path is None
+                    if path is not None:
+                        self.gcode.extend(path)
+                        estimator.add(path)
+                    self.show_estimate(estimator,names,compiled)
+                    if error is not None:
+                        self.lbl_estimate.set_label(f'编译失败：{error}')
+                        self.lbl_estimate.set_tooltip_text(f'{type(error).__name__}: {error}')
+
+            if shown < len(self.gcode):
+                rows = self.gcode[shown:shown + 500]
+                f2(''.join(line + '\n' for line in writer.lines(rows)))
+                shown += len(rows)
 
             if not self.btn_start.get_active(): return True
 
-            try:
-                limit = self.gcode.index('M5\n',limit) + 1
-                if self.gcode[limit] == 'M2\n': limit += 1
-            except:
-                pass
+            end = self.gcode.find(OP_OFF,limit)
+            if end >= 0:
+                limit = end + 1
+                if limit < len(self.gcode) and self.gcode[limit]['op'] == OP_END: limit += 1
 
             if line_count == limit: return True
             
             f3(limit)
 
-            lines = ''.join(self.gcode[line_count:limit])
-            controller.excute(lines)
+            controller.excute(self.gcode[line_count:limit])
 
             line_count = limit
             return True
         
         GLib.idle_add(f)
 
+    def show_estimate(self,estimator,names,compiled):
+        from simtoy.tools.engravtor.estimate import format_duration
+        label = f'预计 {format_duration(estimator.time)}  切割 {estimator.cut / 1000:.2f}m  空程 {estimator.travel / 1000:.2f}m'
+        if estimator.saved: label += f'  (排序减少 {sum(estimator.saved.values()) / 1000:.2f}m)'
+        self.lbl_estimate.set_label(label if compiled else f'{label}  (编译中)')
+        lines = []
+        for e,t in estimator.elements.items():
+            line = f'{names[e]}: {format_duration(t)}'
+            if e in estimator.saved: line += f'  空程减少 {estimator.saved[e] / 1000:.2f}m'
+            lines.append(line)
+        self.lbl_estimate.set_tooltip_text('\n'.join(lines))
+
     @Gtk.Template.Callback()
     def btn_back_clicked(self,sender):
         self.btn_start.set_active(False)
@@ -474,7 +518,7 @@ class Panel (Gtk.Box):
         else:
             controller = self.owner
         
-        controller.steps.clear()
+        controller.clear()
         controller.excute('M5\nG0\n')
 
 
@@ -484,3 +528,14 @@ class Panel (Gtk.Box):
             sender.set_label('停止')
         else:
             sender.set_label('开始')
+
+        # 模拟器停止时暂停在当前位置，再次开始时接着播放
+        item = self.device_selection.get_selected_item()
+        if item and item.controller.connected: return
+        if sender.get_active(): self.owner.steps.play()
+        else: self.owner.steps.pause()
+
+    @Gtk.Template.Callback()
+    def rate_value_changed(self,spin):
+        # 模拟器按倍速播放，不影响真实设备
+        self.owner.steps.set_rate(spin.get_value())
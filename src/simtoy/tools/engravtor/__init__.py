@@ -10,6 +10,7 @@ from pygfx.utils.transform import AffineTransform
 import pylinalg as la
 from importlib.resources import files
 import numpy as np
+import traceback
 from PIL import Image
 
 
@@ -162,6 +163,19 @@ class Element(gfx.WorldObject):
         self.params['passes'] = 2
         self.params['pass_depth'] = 0.0
         self.params['layers'] = 10
+        self.params['precision'] = 10
+        self.params['bidirectional'] = True
+        # None为按速度自动计算(见 raster.overscan_distance)，set_overscan手动指定
+        self.params['overscan'] = None
+        self.params['path_order'] = True
+        self.params['simplify'] = True
+        self.params['pitch'] = 0.1
+        self.params['crystal_fill'] = 'surface'
+        self.params['dwell'] = 1.0
+        self.params['relief'] = 'depth'
+        self.params['hatch_angle'] = 0.0
+        self.params['dither'] = 'none'
+        self.params['resample'] = 'area'
         
         self.obj = None
     def set_excutable(self,state):
@@ -195,6 +209,42 @@ class Element(gfx.WorldObject):
     def set_layers(self,layers):
         self.params['layers'] = layers
 
+    def set_precision(self,precision):
+        self.params['precision'] = precision
+
+    def set_bidirectional(self,state):
+        self.params['bidirectional'] = state
+
+    def set_overscan(self,overscan):
+        self.params['overscan'] = overscan
+
+    def set_path_order(self,state):
+        self.params['path_order'] = state
+
+    def set_simplify(self,state):
+        self.params['simplify'] = state
+
+    def set_pitch(self,pitch):
+        self.params['pitch'] = pitch
+
+    def set_crystal_fill(self,fill):
+        self.params['crystal_fill'] = fill
+
+    def set_dwell(self,dwell):
+        self.params['dwell'] = dwell
+
+    def set_relief(self,relief):
+        self.params['relief'] = relief
+
+    def set_hatch_angle(self,angle):
+        self.params['hatch_angle'] = angle
+
+    def set_dither(self,method):
+        self.params['dither'] = method
+
+    def set_resample(self,method):
+        self.params['resample'] = method
+
     def get_geometry_bounding_box(self):
         return self.obj.get_geometry_bounding_box()
     
@@ -249,15 +299,11 @@ class Label(Element):
         cr.restore()
     
     def draw_to_image(self):
-        temp_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1)  # 临时1x1像素表面
-        temp_ctx = cairo.Context(temp_surface)
-        
-        # 配置与最终绘制一致的字体
-        temp_ctx.select_font_face(self.family, cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
-        temp_ctx.set_font_size(self.font_size)
+        # 与导出轮廓共用每种(字体, 字号)的排版上下文，不再每次创建临时表面
+        from .glyphs import glyphs
         
         # 获取文字的详细边界信息（核心参数）
-        self.text_info = temp_ctx.text_extents(self.text)
+        self.text_info = glyphs.context(self.family,self.font_size).text_extents(self.text)
         text_width = self.text_info.width          # 文字左边缘到右边缘的实际宽度（无多余）
         text_height = self.text_info.height        # 文字上边缘到下边缘的实际高度（含上下伸部分）
 
@@ -296,13 +342,41 @@ class Label(Element):
         self.text = text
         
         surface = self.draw_to_image()
-        im = np.frombuffer(surface.get_data(), dtype=np.uint8).reshape((surface.get_height(),surface.get_width(), 4))
-        tex = gfx.Texture(im[...,[2,1,0,3]],dim=2)
-        tex_map = gfx.TextureMap(tex)
-        
-        self.remove(self.obj)
-        self.obj = gfx.Mesh(gfx.plane_geometry(surface.get_width() / 1000,surface.get_height() / 1000),gfx.MeshBasicMaterial(map=tex_map,depth_test=False))
-        self.add(self.obj)
+        w,h = surface.get_width(),surface.get_height()
+        im = np.frombuffer(surface.get_data(), dtype=np.uint8).reshape((h,surface.get_stride() // 4, 4))[:,:w,[2,1,0,3]]
+
+        # 纹理按2的幂预留空间，文字变长超出时才重新分配纹理和网格
+        shape = self.texture.data.shape[:2] if self.obj is not None else (0,0)
+        if h > shape[0] or w > shape[1]:
+            shape = tuple(max(64,1 << (max(n,shape[k]) - 1).bit_length()) for k,n in enumerate((h,w)))
+            self.texture = gfx.Texture(np.zeros((*shape,4),dtype=np.uint8),dim=2)
+            geometry = gfx.plane_geometry(1,1)
+            self.plane = (geometry.positions.data.copy(),geometry.texcoords.data.copy())
+            self.remove(self.obj)
+            self.obj = gfx.Mesh(geometry,gfx.MeshBasicMaterial(map=gfx.TextureMap(self.texture),depth_test=False))
+            self.add(self.obj)
+            self.drawn = (0,0)
+
+        # 只上传与上一次内容不同的矩形区域，上次超出本次文字范围的部分清零
+        data = self.texture.data
+        H,W = max(h,self.drawn[0]),max(w,self.drawn[1])
+        image = np.zeros((H,W,4),dtype=np.uint8)
+        image[:h,:w] = im
+        changed = np.any(data[:H,:W] != image,axis=2)
+        rows,cols = np.nonzero(changed.any(axis=1))[0],np.nonzero(changed.any(axis=0))[0]
+        if len(rows):
+            r0,r1,c0,c1 = rows[0],rows[-1] + 1,cols[0],cols[-1] + 1
+            data[r0:r1,c0:c1] = image[r0:r1,c0:c1]
+            self.texture.update_range((c0,r0,0),(c1 - c0,r1 - r0,1))
+        self.drawn = (h,w)
+
+        # 网格只修改顶点和纹理坐标：平面大小为文字大小，纹理坐标只取纹理左上角的文字部分
+        positions,texcoords = self.plane
+        geometry = self.obj.geometry
+        geometry.positions.data[:,:2] = positions[:,:2] * [w / 1000,h / 1000]
+        geometry.texcoords.data[:] = texcoords * [w / shape[1],h / shape[0]]
+        geometry.positions.update_full()
+        geometry.texcoords.update_full()
 
     def set_engraving_mode(self,mode : str):
         self.params['engraving_mode'] = mode
@@ -314,29 +388,63 @@ class Bitmap(Element):
         self.params['engraving_mode'] = 'fill'
 
         self.filepath = filepath
-        im = Image.open(filepath).convert('RGBA')
-        self.im = im
+        self.load_pixels()
         
-        tex = gfx.Texture(np.asarray(im),dim=2)
+        tex = gfx.Texture(self.pixels,dim=2)
         tex_map = gfx.TextureMap(tex,filter='nearest')
-        self.obj = gfx.Mesh(gfx.plane_geometry(im.size[0] / 1000,im.size[1] / 1000),gfx.MeshBasicMaterial(map=tex_map,depth_test=False))
+        self.obj = gfx.Mesh(gfx.plane_geometry(self.size[0] / 1000,self.size[1] / 1000),gfx.MeshBasicMaterial(map=tex_map,depth_test=False))
         self.add(self.obj)
  
         self.draw_to_image()
     
+    def load_pixels(self):
+        # 超大位图在后台线程转换为磁盘上的分块存储(见tiles.py)，内存中只保留显示用的缩略图；
+        # 转换完成前显示透明的占位图，完成后由 Engravtor.step 换上缩略图(见 show_store)
+        from .tiles import TILED_PIXELS,open_large,open_store,mip_shape
+        from .job import BitmapSource
+        with open_large(self.filepath) as im:
+            self.size = im.size
+            tiled = im.size[0] * im.size[1] > TILED_PIXELS
+        if tiled:
+            self.loading = open_store(self.filepath)
+            h,w = mip_shape(self.size[::-1])
+            im = Image.new('RGBA',(w,h))
+        else:
+            self.loading = None
+            im = Image.open(self.filepath).convert('RGBA')
+        self.im = im
+        # 像素只保留一份，预览纹理和编译共用
+        self.pixels = np.asarray(im)
+        # 重采样、半色调和等值线的缓存，编译时在编译线程计算(见 job.BitmapSource)；编译时转换未完成则等待
+        self.source = BitmapSource(self.pixels,self.loading,self.size)
+
+    def show_store(self):
+        # 后台转换完成：换上磁盘存储的缩略图
+        loading,self.loading = self.loading,None
+        if loading.exception() is not None:
+            traceback.print_exception(loading.exception())
+            return
+        self.source.load()
+        self.pixels = self.source.pixels
+        self.im = Image.fromarray(self.pixels,'RGBA')
+        self.obj.material.map = gfx.TextureMap(gfx.Texture(self.pixels,dim=2),filter='nearest')
+
     def set_engraving_mode(self,mode : str):
         self.params['engraving_mode'] = mode
 
         self.remove(self.obj)
-        im = Image.open(self.filepath)
-        im = im.convert('RGBA')
-        self.im = im
+        self.load_pixels()
         
-        tex = gfx.Texture(np.asarray(im),dim=2)
+        tex = gfx.Texture(self.pixels,dim=2)
         tex_map = gfx.TextureMap(tex,filter='nearest')
-        self.obj = gfx.Mesh(gfx.plane_geometry(im.size[0] / 1000,im.size[1] / 1000),gfx.MeshBasicMaterial(map=tex_map,depth_test=False))
+        self.obj = gfx.Mesh(gfx.plane_geometry(self.size[0] / 1000,self.size[1] / 1000),gfx.MeshBasicMaterial(map=tex_map,depth_test=False))
         self.add(self.obj)
 
+    def get_isolines(self,layers):
+        # 各层灰度等值线(像素坐标)，预览和编译共用；超大位图转换完成前没有等值线
+        if self.loading is not None: return []
+        return self.source.get_isolines(layers)
+
     def get_image(self):
         return self.im.astype(np.uint8)
     
@@ -365,24 +473,24 @@ class Bitmap(Element):
 
         
         if self.params['engraving_mode'] == 'fill':
+            # 超大位图绘制缩略图，放大到原图尺寸
+            cr.scale(self.size[0] / pixel_width,self.size[1] / pixel_height)
             stride = cairo.ImageSurface.format_stride_for_width(cairo.FORMAT_ARGB32, pixel_width)
             surface = cairo.ImageSurface.create_for_data(np.asarray(self.im)[...,[2,1,0,3]].copy().data, cairo.FORMAT_ARGB32, pixel_width, pixel_height, stride)
             cr.set_source_surface(surface, -pixel_width / 2, -pixel_height / 2)
             cr.paint()
         else:
-            gray = np.asarray(self.im.convert('L'))
-            
-            for i in range(255):
-                mask = (gray < i+1)
-                im = np.full_like(gray,0)
-                im[mask] = 255
-                im = Image.fromarray(im,'L').convert('RGBA')
-
-                stride = cairo.ImageSurface.format_stride_for_width(cairo.FORMAT_ARGB32, pixel_width)
-                surface = cairo.ImageSurface.create_for_data(np.asanyarray(im).copy().data, cairo.FORMAT_ARGB32, pixel_width, pixel_height, stride)
-                cr.set_source_surface(surface, -pixel_width / 2, -pixel_height / 2)
-                cr.get_source().set_filter(cairo.FILTER_NEAREST)  # 强制最近邻
-                cr.paint()
+            # 各层等值线围成的区域逐层叠加，越深的层颜色越深
+            layers = max(1,round(self.params['layers']))
+            cr.set_fill_rule(cairo.FILL_RULE_EVEN_ODD)
+            for k,(paths,closed) in enumerate(self.get_isolines(layers)):
+                for points in paths:
+                    cr.move_to(points[0][0],-points[0][1])
+                    for x,y in points[1:]: cr.line_to(x,-y)
+                    cr.close_path()
+                gray = 1 - (k + 1) / layers
+                cr.set_source_rgb(gray,gray,gray)
+                cr.fill()
         
         cr.restore()
         pass
@@ -490,10 +598,51 @@ class Model(Element):
     def set_pass_depth(self,depth : float):
         self.params['pass_depth'] = depth
 
+class BurnTrace(gfx.Line):
+    # 已加工的轨迹：顶点缓冲预先分配，每帧只写入新走过的出光线段并扩大绘制范围，容量不够时翻倍
+    def __init__(self,thickness,capacity=1 << 16):
+        super().__init__(self.make_geometry(capacity),gfx.LineSegmentMaterial(thickness=thickness,thickness_space='world',color_mode='vertex',depth_test=False))
+        self.count = 0
+
+    def make_geometry(self,capacity):
+        # 每条线段两个顶点
+        geometry = gfx.Geometry(positions=np.zeros((2 * capacity,3),dtype=np.float32),colors=np.zeros((2 * capacity,4),dtype=np.float32))
+        geometry.positions.draw_range = (0,0)
+        return geometry
+
+    def append(self,starts : np.ndarray,ends : np.ndarray,powers : np.ndarray):
+        # 坐标单位毫米，功率越大颜色越深
+        n = len(starts)
+        if not n: return
+        positions,colors = self.geometry.positions,self.geometry.colors
+        if 2 * (self.count + n) > positions.nitems:
+            geometry = self.make_geometry(max(2 * positions.nitems,2 * (self.count + n)) // 2)
+            geometry.positions.data[:2 * self.count] = positions.data[:2 * self.count]
+            geometry.colors.data[:2 * self.count] = colors.data[:2 * self.count]
+            self.geometry = geometry
+            positions,colors = geometry.positions,geometry.colors
+
+        i,j = 2 * self.count,2 * (self.count + n)
+        positions.data[i:j:2,:2] = starts / 1000
+        positions.data[i + 1:j:2,:2] = ends / 1000
+        positions.data[i:j,2] = 0
+        colors.data[i:j,:3] = (0.2,0.1,0.05)
+        colors.data[i:j,3] = np.repeat(np.clip(powers / 100,0,1),2)
+        positions.update_range(i,j - i)
+        colors.update_range(i,j - i)
+        self.count += n
+        positions.draw_range = (0,2 * self.count)
+
+    def clear(self):
+        self.count = 0
+        self.geometry.positions.draw_range = (0,0)
+
 class Engravtor(gfx.WorldObject):
     def __init__(self,*args,**kwargs):
         super().__init__(*args,**kwargs)
-        self.steps = list()
+        from .playback import Playback
+        self.steps = Playback()
+        self.state = None
 
         self.init_params()
 
@@ -525,6 +674,11 @@ class Engravtor(gfx.WorldObject):
         self.laser.render_order = 1
         self.target_area.add(self.laser)
 
+        # 模拟加工时累积显示已加工的轨迹
+        self.trace = BurnTrace(self.lightspotsize / 1000)
+        self.target_area.add(self.trace)
+        self.traced = 0.0
+
         self.add_event_handler(self._process_event,"pointer_down","pointer_move","pointer_up",'wheel')
         self.transform_helper = None
         self.selected_func = None
@@ -595,19 +749,42 @@ class Engravtor(gfx.WorldObject):
                 self.selected_func(None)
     
     def step(self,dt):
-        if self.steps:
-            f = self.steps.pop(0)
-            f(dt)
+        # 后台转换完成的超大位图换上缩略图
+        for obj in self.target_area.children:
+            if isinstance(obj,Bitmap) and obj.loading is not None and obj.loading.done(): obj.show_store()
+
+        if self.steps.count:
+            # 只在位置或功率变化时更新焦点和激光
+            state = self.steps.step(dt)
+            if state != self.state:
+                self.state = state
+                x,y,self.power = state
+                self.focus.local.x = x / 1000
+                self.focus.local.y = y / 1000
+                self.laser.material.color = (1,0,0,self.power / 100)
+                self.laser.geometry.positions.data[1] = self.focus.local.position
+                self.laser.geometry.positions.update_full()
 
         aabb = self.target.get_geometry_bounding_box()
         self.focus.local.z = aabb[1][2] - aabb[0][2]
 
+        # 只追加上一帧之后走过的线段，回放时间倒退(跳转或清空)时从头重新累积
+        if self.steps.time < self.traced:
+            self.trace.clear()
+            self.traced = 0.0
+        if self.steps.time > self.traced:
+            self.trace.append(*self.steps.trace(self.traced,self.steps.time))
+            self.traced = self.steps.time
+        self.trace.local.z = self.focus.local.z
+
     def init_params(self):
         self.y_lim = self.x_lim = (0,0.100)
         self.lightspotsize = 0.1
         self.paths = list()
         self.speed = 100
         self.power = 0
+        # 与USBController一致：400个脉冲走1毫米
+        self.pulse = '$222P1P400'
 
     def get_view_focus(self):
         return self.camera.local.position,self.target_area.local.position
@@ -625,6 +802,7 @@ class Engravtor(gfx.WorldObject):
         target_height = (aabb[1][2] - aabb[0][2])
         target.local.z = target_height / 2
         self.target = target
+        self.consumable = name
         self.target_area.add(target)
     
     def get_viewport(self):
@@ -727,7 +905,6 @@ class Engravtor(gfx.WorldObject):
         height = int((self.y_lim[1] - self.y_lim[0]) * 1000)
         
         import xml.etree.ElementTree as ElementTree
-        import xml.dom.minidom
         import io 
         import base64
         
@@ -760,13 +937,13 @@ class Engravtor(gfx.WorldObject):
                 m6 = f'matrix({sx * np.cos(r)},{-sy * np.sin(r)},{sx * np.sin(r)},{sy * np.cos(r)},{x},{y})'
                 element = ElementTree.Element('image',attrib={
                                                    'type': 'depth' if obj.params['engraving_mode'] == 'external' else 'gray',
-                                                   'precision':f'10', # 1-255
-                                                   'x':f'{-obj.im.size[0] / 2}',
-                                                   'y':f'{-obj.im.size[1] / 2}',
+                                                   'precision':f'{round(obj.params["precision"])}', # 1-255
+                                                   'x':f'{-obj.size[0] / 2}',
+                                                   'y':f'{-obj.size[1] / 2}',
                                                    'pass_depth':f'{-round(obj.params["pass_depth"],2)}',
                                                    'passes':f'{round(obj.params["passes"])}',
-                                                   'width':f'{obj.im.size[0]}',
-                                                   'height':f'{obj.im.size[1]}',
+                                                   'width':f'{obj.size[0]}',
+                                                   'height':f'{obj.size[1]}',
                                                    'layers':f'{round(obj.params["layers"])}',
                                                    'transform':m6,
                                                    'speed':f'{round(obj.params["speed"])}',
@@ -799,131 +976,77 @@ class Engravtor(gfx.WorldObject):
                                                    'speed':f'{round(obj.params["speed"])}',
                                                    'power':f'{round(obj.params["power"])}',
                                                    'href':obj.filepath})
+            elif obj.__class__ == Label:
+                # 文字导出为展平后的轮廓路径(见glyphs.py)，SVG坐标y轴向下
+                from .glyphs import text_outlines
+                d = ' '.join('M ' + ' L '.join(f'{x:.4f},{-y:.4f}' for x,y in points) + ' Z' for points in text_outlines(obj.text,obj.family,obj.font_size))
+                x = obj.local.x*1000 + width/2
+                y = obj.local.y*1000 + height/2
+                r = obj.local.euler_z
+                sx = obj.local.scale_x
+                sy = obj.local.scale_y
+                m6 = f'matrix({sx * np.cos(r)},{-sy * np.sin(r)},{sx * np.sin(r)},{sy * np.cos(r)},{x},{y})'
+                element = ElementTree.Element('path',attrib={
+                                                   'type': obj.params['engraving_mode'],
+                                                   'd':d,
+                                                   'transform':m6,
+                                                   'speed':f'{round(obj.params["speed"])}',
+                                                   'power':f'{round(obj.params["power"])}',
+                                                   'density_y':f'{obj.params["density_y"]}',
+                                                   'hatch_angle':f'{obj.params["hatch_angle"]}'})
             else:
                 continue
 
             element.attrib.pop(ElementTreeParent,None)
             svg.append(element)
 
-        #如何把svg转换为字符串
-        svg_str = ElementTree.tostring(svg, encoding='utf-8')
-         # 解析为DOM对象
-        dom_obj = xml.dom.minidom.parseString(svg_str)
-        # 美化输出（带缩进、换行）
-        formatted_string = dom_obj.toprettyxml(indent='\t',encoding='utf-8').decode()
-        # 清理多余的空行（toprettyxml会生成额外空行，可选步骤）
-        formatted_string = "\n".join([line for line in formatted_string.split("\n") if line.strip()])
-        return formatted_string
-    
-    def excute(self,gcode : str):
-        def excute_next(lines : list[str]):
-            while lines:
-                line = lines.pop(0).strip()
-                if not line or line.startswith(';'): 
-                    continue
-
-                # print(line)
-                moveable = False
-                x,y = self.focus.local.position[:2] * 1000
-                power = self.power
-                speed = self.speed
-                command = line.split(' ')
-                for param in command:
-                    if param.startswith('G0'):
-                        moveable = True
-                        x = 0
-                        y = 0
-                        power = 0
-                    elif param == 'G1': 
-                        moveable = True
-                    elif param.startswith('X'):
-                        x = float(param[1:])
-                        moveable = True
-                    elif param.startswith('Y'):
-                        y = float(param[1:])
-                        moveable = True
-                    elif param.startswith('F'):
-                        self.speed = speed = float(param[1:])
-                    elif param.startswith('S'):
-                        self.power = power = float(param[1:])
-                        self.laser.material.color = (1,0,0,power / 100)
-                    elif param == 'M2':
-                        self.laser.material.color = (1,0,0,0)
-                        continue
-                    elif param == 'M3':
-                        self.laser.material.color = (1,0,0,power / 100)
-                        continue
-                    elif param == 'M5':
-                        self.laser.material.color = (1,0,0,0)
-                        continue
-                    else:
-                        pass
-
-
-                if moveable: self.steps.append(lambda dt: self.move(x,y,speed,power,dt))
-                break
-            
-            if lines: self.steps.append(lambda dt: excute_next(lines))
-                
-        excute_next(gcode.split('\n'))
-
-    def move(self,x,y,speed,power,dt):
-        def make_delta_move(x,y,power):
-            def delta_move(dt):
-                self.focus.local.x = x / 1000
-                self.focus.local.y = y / 1000
-                self.laser.material.color = (1,0,0,power / 100)
-                self.laser.geometry.positions.data[1] = self.focus.local.position
-                self.laser.geometry.positions.update_full()
-            return delta_move
-
-        start = self.focus.local.position[:2] * 1000
-        end = np.array([x,y])
-        dir = end - start
-        S = np.linalg.norm(dir)
-
-        if True and S > 0: 
-            dir /= S
-            v_max=speed; v0=0; v1=0; a=speed
-            # 加速阶段：从v0到v_max
-            t1 = (v_max - v0) / a  # 加速时间
-            s1 = v0 * t1 + 0.5 * a * t1**2  # 加速距离
-                
-            # 减速阶段：从v_max到v1
-            t3 = (v_max - v1) / a  # 减速时间
-            s3 = v_max * t3 - 0.5 * a * t3**2  # 减速距离
-
-            # 匀速阶段：总距离 - 加速距离 - 减速距离
-            s2 = S - s1 - s3
-
-            if s2 < 0:
-                total_v_sq = a * S
-                v_peak = np.sqrt(total_v_sq)  # 三角加速的速度峰值
-                t1 = v_peak / a  # 加速时间 = 减速时间
-                t3 = t1
-                s1 = 0.5 * a * t1**2
-                s3 = s1
-                s2 = 0  # 无匀速阶段
-                v_max = v_peak  # 更新实际峰值速度
-            
-            t2 = s2 / v_max if v_max != 0 else 0  # 匀速时间
-            total_time = t1 + t2 + t3  # 总运动时间
-
-            t = np.linspace(0, total_time, round(total_time / dt))
-
-            for i,ti in enumerate(t):
-                if ti <= t1:
-                    s = v0 * ti + 0.5 * a * ti**2
-                elif ti <= t1 + t2:
-                    s = s1 + v_max * (ti - t1)
-                else:
-                    delta_t = ti - (t1 + t2)
-                    s = s1 + s2 + v_max * delta_t - 0.5 * a * delta_t**2
-
-                xy = start + dir * s
-
-                self.steps.insert(i,make_delta_move(xy[0],xy[1],power))
-        else:
-            self.steps.insert(0,make_delta_move(x,y,power))
+        # 直接缩进后序列化，不再经过minidom重新解析
+        ElementTree.indent(svg,space='\t')
+        return '<?xml version="1.0" encoding="utf-8"?>\n' + ElementTree.tostring(svg,encoding='unicode')
+
+    def save_svg(self,filepath):
+        # SVG只作为磁盘交换格式，加工不再经过SVG
+        with open(filepath,'w',encoding='utf-8') as f:
+            f.write(self.export_svg())
+
+    def build_job(self):
+        from .job import Job
+        # 折线简化和圆弧拟合的误差取光斑直径的一半
+        return Job(self.get_items(),tolerance=self.lightspotsize / 2,x_lim=self.x_lim,y_lim=self.y_lim)
+
+    def export_toolpath(self,resolution=None):
+        # 返回(元素名称, 逐个元素的工具路径生成器)，坐标已量化到机器分辨率
+        from .compiler import compile_toolpath,element_names
+        from .compactor import compact,pulse_resolution
+        job = self.build_job()
+        resolution = resolution or pulse_resolution(self.pulse)
+        return element_names(job),(compact(path,resolution) for path in compile_toolpath(job))
+
+    def predict_burn(self,pitch=None):
+        # 按光斑能量沉积和耗材响应预测的黑度图(见energy.py)，覆盖整个加工范围，第0行在上方
+        from .compiler import compile_toolpath
+        from .playback import Playback
+        from .energy import predict_burn
+        playback = Playback()
+        for path in compile_toolpath(self.build_job()): playback.extend(path)
+        return predict_burn(playback,self.x_lim,self.y_lim,self.lightspotsize,self.consumable,pitch)
+
+    def export_gcode(self,resolution=None):
+        from .compiler import compile_gcode
+        from .compactor import pulse_resolution
+        return compile_gcode(self.build_job(),resolution=resolution or pulse_resolution(self.pulse))
+
+    def excute(self,gcode):
+        # gcode为工具路径数组，或手工输入的G代码文本；加入回放时间轴(见playback.py)，由step逐帧播放
+        from .toolpath import parse_gcode
+        if not self.steps.count: self.steps.x,self.steps.y = self.focus.local.position[:2] * 1000
+        if isinstance(gcode,str):
+            gcode = parse_gcode(gcode,self.steps.x,self.steps.y,self.speed,self.steps.power)
+        self.steps.extend(gcode)
+        if self.steps.speed: self.speed = self.steps.speed
+
+    def clear(self):
+        # 丢弃未播放的指令，与 USBController.clear 一致
+        self.steps.clear()
 
     def is_connected(self): return True
\ No newline at end of file
@@ -0,0 +1,80 @@
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import json
+import os
+import numpy as np
+
+# 按元素缓存编译得到的工具路径：键由源内容、加工参数、局部变换计算，
+# 内存中按LRU淘汰，可选写入磁盘目录供下次启动复用
+
+
+def source_digest(item) -> bytes:
+    # item为JobElement，在编译线程计算
+    h = hashlib.sha1()
+    if item.kind == 'Bitmap':
+        h.update(item.source.get_digest())
+    elif item.kind == 'Vectors':
+        for line in item.lines:
+            h.update(np.ascontiguousarray(line).tobytes())
+            h.update(b'|')
+    elif item.kind == 'Label':
+        h.update(f'{item.text}|{item.family}|{item.font_size}'.encode())
+    elif item.kind == 'Model':
+        with open(item.filepath,'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20),b''):
+                h.update(chunk)
+        h.update(item.matrix.tobytes())
+    return h.digest()
+
+def element_key(item) -> str:
+    # 类型、源内容、实际参与编译的参数和元素变换
+    h = hashlib.sha1()
+    h.update(item.kind.encode())
+    h.update(source_digest(item))
+    h.update(json.dumps(item.params,sort_keys=True,default=str).encode())
+    h.update(np.asarray(item.affine,dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+class CompileCache:
+    def __init__(self,max_rows=5_000_000,directory=None):
+        self.max_rows = max_rows
+        self.directory = directory
+        self.entries : OrderedDict[str,np.ndarray] = OrderedDict()
+        self.rows = 0
+
+    def get(self,key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        if not self.directory: return None
+        path = Path(self.directory) / f'{key}.npy'
+        if not path.exists(): return None
+        path = np.load(path)
+        self._remember(key,path)
+        return path
+
+    def put(self,key,path : np.ndarray):
+        self._remember(key,path)
+        if not self.directory: return
+        os.makedirs(self.directory,exist_ok=True)
+        target = Path(self.directory) / f'{key}.npy'
+        temp = target.with_suffix('.tmp')
+        with open(temp,'wb') as f:
+            np.save(f,path)
+        os.replace(temp,target)
+
+    def _remember(self,key,path):
+        if key in self.entries:
+            self.rows -= len(self.entries.pop(key))
+        self.entries[key] = path
+        self.rows += len(path)
+        # 超出容量时淘汰最久未使用的元素，至少保留刚放入的一个
+        while self.rows > self.max_rows and len(self.entries) > 1:
+            _,old = self.entries.popitem(last=False)
+            self.rows -= len(old)
+
+    def clear(self):
+        self.entries.clear()
+        self.rows = 0
@@ -0,0 +1,76 @@
+import re
+import numpy as np
+from .toolpath import OP_RAPID,OP_LINE,OP_CW,OP_CCW,OP_ON,MOTIONS
+
+# 工具路径压缩：串口只有9600波特，每个字节都要计较。
+# 坐标量化到机器脉冲分辨率，去掉零长度移动，合并同功率同速度的共线G1；
+# 省略模态字由 GcodeWriter 在输出文本时完成
+
+
+def pulse_resolution(setting : str) -> float:
+    # $222P1P400 -> 400个脉冲走1毫米，分辨率0.0025毫米
+    values = [float(v) for v in re.findall(r'P([\d.]+)',setting)]
+    if len(values) < 2 or values[1] == 0: return 0.001
+    return values[0] / values[1]
+
+def forward_fill(mask : np.ndarray) -> np.ndarray:
+    # 每一行之前(含本行)最近一个mask为真的行号，没有则为-1
+    idx = np.where(mask,np.arange(len(mask)),-1)
+    return np.maximum.accumulate(idx) if len(idx) else idx
+
+def drop_zero_moves(path : np.ndarray) -> np.ndarray:
+    # 终点与上一个移动终点相同的G0/G1是多余的；G1改变了功率或速度时保留
+    op = path['op']
+    motion = np.isin(op,MOTIONS)
+    last = forward_fill(motion)
+    prev = np.r_[-1,last[:-1]]
+    has = prev >= 0
+    safe = np.maximum(prev,0)
+    same = has & (path['x'] == path['x'][safe]) & (path['y'] == path['y'][safe])
+
+    # 上一条设置功率、速度的指令
+    setter = forward_fill(np.isin(op,(OP_LINE,OP_CW,OP_CCW,OP_ON)))
+    setter = np.r_[-1,setter[:-1]]
+    ssafe = np.maximum(setter,0)
+    unchanged = (setter >= 0) & (path['power'] == path['power'][ssafe]) & (path['feed'] == path['feed'][ssafe])
+
+    drop = same & ((op == OP_RAPID) | ((op == OP_LINE) & unchanged))
+    return path[~drop]
+
+def merge_collinear(path : np.ndarray,resolution) -> np.ndarray:
+    # 中间点离前后两点连线不超过半个脉冲、且同向前进的G1可以去掉。
+    # 每轮只去掉互不相邻的点，直到没有可去掉的点
+    while len(path) > 2:
+        op = path['op']
+        x = path['x'].astype(np.float64)
+        y = path['y'].astype(np.float64)
+        k = np.arange(1,len(path) - 1)
+        a,b = k - 1,k + 1
+        ok = (op[k] == OP_LINE) & (op[b] == OP_LINE) & np.isin(op[a],MOTIONS)
+        ok &= (path['power'][k] == path['power'][b]) & (path['feed'][k] == path['feed'][b])
+
+        dx,dy = x[b] - x[a],y[b] - y[a]
+        length = np.hypot(dx,dy)
+        ahead = ((x[k] - x[a]) * dx + (y[k] - y[a]) * dy > 0) & ((x[b] - x[k]) * dx + (y[b] - y[k]) * dy > 0)
+        dist = np.abs(dx * (y[k] - y[a]) - dy * (x[k] - x[a])) / np.maximum(length,1e-12)
+        ok &= ahead & (length > 0) & (dist <= resolution / 2)
+        if not ok.any(): break
+
+        # 连续的候选点只去掉奇偶交替的一半
+        starts = forward_fill(ok & ~np.r_[False,ok[:-1]])
+        ok &= (np.arange(len(ok)) - starts) % 2 == 0
+        keep = np.ones(len(path),dtype=bool)
+        keep[k[ok]] = False
+        path = path[keep]
+    return path
+
+def compact(path : np.ndarray,resolution=0.001) -> np.ndarray:
+    path = path.copy()
+    for name in ('x','y'):
+        path[name] = np.round(path[name] / resolution) * resolution
+    # i,j只有圆弧是坐标；暂停(G4)的i是秒数，不能量化到脉冲分辨率
+    arcs = np.isin(path['op'],(OP_CW,OP_CCW))
+    for name in ('i','j'):
+        path[name] = np.where(arcs,np.round(path[name] / resolution) * resolution,path[name])
+    path = drop_zero_moves(path)
+    return merge_collinear(path,resolution)
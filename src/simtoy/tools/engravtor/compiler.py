@@ -0,0 +1,196 @@
+from typing import Iterator
+from concurrent.futures import ProcessPoolExecutor
+import os
+import multiprocessing
+import numpy as np
+from .raster import image_power,compile_raster,overscan_distance
+from .cache import CompileCache
+from .job import Job,JobElement,apply_affine
+from .toolpath import *
+
+# 进程内编译器：读取加工任务(见job.py)，生成工具路径数组(见toolpath.py)，
+# 不再经过 export_svg -> 临时文件 -> gcoder.py子进程 -> 管道轮询
+
+
+def compile_bitmap(item : JobElement) -> np.ndarray:
+    params = item.params
+    affine = item.affine
+    if params['engraving_mode'] == 'external' and params['relief'] == 'contour':
+        # 轮廓浮雕：逐层沿灰度等值线描边，越黑越深
+        from .contour import compile_layers
+        layers = [([apply_affine(affine,p) for p in paths],closed) for paths,closed in item.isolines]
+        return compile_layers(layers,params)
+
+    if item.store is not None:
+        # 超大位图：从磁盘逐个行带读取、编译
+        from .tiles import compile_tiled
+        return compile_tiled(item)
+
+    if params['engraving_mode'] != 'external':
+        if item.dots is not None: powers = np.where(item.dots,round(params['power']),0).astype(np.int32)
+        else: powers = image_power(item.pixels,params['power'],params['precision'])
+        scan = dict(bidirectional=params['bidirectional'],overscan=overscan_distance(params))
+        return compile_raster(powers,affine,params['speed'],**scan)
+
+    # 浮雕：按灰度分层，越黑越深
+    from .raster import image_darkness
+    from .relief import compile_relief
+    return compile_relief(image_darkness(item.pixels),affine,params)
+
+def compile_paths(paths : list[np.ndarray],closed : list[bool],params) -> np.ndarray:
+    # 线条加工：先简化折线，再可选地优化加工顺序和起刀点，最后拟合圆弧输出
+    tolerance = params['tolerance']
+    if params['simplify']:
+        from .simplify import douglas_peucker
+        simplified = []
+        for p,c in zip(paths,closed):
+            p = douglas_peucker(np.vstack((p,p[:1])),tolerance)[:-1] if c else douglas_peucker(p,tolerance)
+            simplified.append(p)
+        paths = simplified
+
+    chunks = []
+    if params['path_order'] and len(paths) > 1:
+        from .ordering import order_paths,arrange_path
+        order,before,after = order_paths(paths,closed)
+        paths = [arrange_path(paths[i],closed[i],start,reverse) for i,start,reverse in order]
+        # 排序前后的空程随工具路径一起缓存，由 Estimator 汇总显示
+        chunks.append(build(OP_COMMENT,i=before,j=after))
+    else:
+        paths = [np.vstack((p,p[:1])) if c else p for p,c in zip(paths,closed)]
+
+    feed,power = params['speed'],round(params['power'])
+    for points in paths:
+        x,y = points[0]
+        chunks.append(build([OP_RAPID,OP_ON],x=x,y=y,feed=feed,power=[0,power]))
+        if not params['simplify']:
+            chunks.append(build(OP_LINE,x=points[1:,0],y=points[1:,1],feed=feed,power=power))
+        else:
+            from .simplify import fit_arcs
+            moves = fit_arcs(points,tolerance)
+            ends = np.array([end for end,_,_ in moves])
+            starts = np.r_[0,ends[:-1]]
+            ops = np.array([OP_LINE if center is None else OP_CCW if ccw else OP_CW for _,center,ccw in moves])
+            centers = np.array([points[end] if center is None else center for end,center,_ in moves])
+            # I/J为圆心相对圆弧起点的偏移
+            ij = np.where((ops == OP_LINE)[:,None],0,centers - points[starts])
+            chunks.append(build(ops,x=points[ends,0],y=points[ends,1],i=ij[:,0],j=ij[:,1],feed=feed,power=power))
+        chunks.append(build(OP_OFF,x=points[-1,0],y=points[-1,1]))
+    return concat(chunks)
+
+def compile_outlines(paths : list[np.ndarray],params) -> np.ndarray:
+    # 闭合轮廓：填充模式按扫描线填充内部，描边模式沿轮廓加工
+    if params['engraving_mode'] == 'fill':
+        from .hatch import compile_hatch
+        return compile_hatch(paths,params)
+    return compile_paths(paths,[True] * len(paths),params)
+
+def compile_vectors(item : JobElement) -> np.ndarray:
+    # 与 draw_to_svg 一致，所有线条都按闭合路径加工
+    paths = []
+    for points in item.lines:
+        points = apply_affine(item.affine,points)
+        if len(points) > 2 and np.allclose(points[0],points[-1]): points = points[:-1]
+        if len(points) < 2: continue
+        paths.append(points)
+    return compile_outlines(paths,item.params)
+
+def compile_label(item : JobElement) -> np.ndarray:
+    from .glyphs import text_outlines
+    paths = [apply_affine(item.affine,points) for points in text_outlines(item.text,item.family,item.font_size)]
+    return compile_outlines(paths,item.params)
+
+def compile_model(item : JobElement) -> np.ndarray:
+    if item.params['engraving_mode'] == 'internal':
+        # 水晶内雕：体素化后逐层输出激光点
+        from .crystal import compile_crystal
+        return compile_crystal(item)
+    if item.params['relief'] == 'contour':
+        # 轮廓浮雕：逐层切片描边
+        from .contour import compile_contours
+        return compile_contours(item)
+
+    # 浮雕：模型投影为深度图，越高越浅，模型以外加工到最深
+    from .slicer import load_mesh
+    from .depthmap import model_depth
+    from .relief import compile_relief
+    params = item.params
+    vertices,faces = load_mesh(item.filepath,item.matrix,item.offset)
+    heights,grid = model_depth(vertices,faces,(params['density_x'],params['density_y']))
+    top = heights.max()
+    darkness = 1 - heights / top if top > 0 else np.ones_like(heights)
+    return compile_relief(darkness,grid.affine(),params)
+
+# 编译缓存，设置 cache.directory 后同时缓存到磁盘
+cache = CompileCache()
+
+compilers = {
+    'Bitmap': compile_bitmap,
+    'Vectors': compile_vectors,
+    'Label': compile_label,
+    'Model': compile_model,
+}
+
+def compile_element(item : JobElement) -> np.ndarray:
+    # 子进程入口：完整编译一个元素，重采样和半色调也在这里计算
+    item.derive()
+    return compilers[item.kind](item)
+
+executor = None
+# 子进程数的上限：每个子进程都持有元素的像素和编译中间结果，并留一个核给界面和渲染
+MAX_WORKERS = 4
+
+def get_executor():
+    # 进程池只创建一次，之后的编译复用已启动的子进程。
+    # 界面进程有GTK、渲染和编译线程，fork会把其他线程持有的锁一起复制到子进程，所以用spawn启动；
+    # 子进程由 compile_worker.initialize 初始化，只导入编译用到的模块，不加载GTK和pygfx
+    global executor
+    if executor is None:
+        import compile_worker
+        workers = max(1,min(MAX_WORKERS,(os.cpu_count() or 1) - 1))
+        executor = ProcessPoolExecutor(max_workers=workers,mp_context=multiprocessing.get_context('spawn'),initializer=compile_worker.initialize)
+    return executor
+
+def element_names(job : Job) -> list[str]:
+    # 工具路径中element字段对应的名称
+    return [item.name if item.kind in compilers else f'{item.name}: 暂不支持 {item.kind}' for item in job]
+
+def compile_toolpath(job : Job,parallel=True) -> Iterator[np.ndarray]:
+    # 按加工顺序逐个元素返回工具路径数组，element字段为元素在job中的序号
+    # 第一个未缓存的元素在本进程编译，保证很快得到第一段；
+    # 其余未缓存的元素同时提交到进程池，最后按加工顺序合并。
+    # 超大位图直接从磁盘逐个行带编译并返回，内存只与行带大小有关。
+    # 这里只计算缓存键，调用方在后台线程迭代时不占用界面线程；重采样和半色调在 compile_element 中计算
+    from .tiles import streamed,stream_tiled
+    for item in job: item.prepare()
+    pending = [item for item in job if item.kind in compilers and not streamed(item) and cache.get(item.key) is None]
+    futures = {}
+    if parallel and len(pending) > 1 and (os.cpu_count() or 1) > 1:
+        pool = get_executor()
+        futures = {item.index: pool.submit(compile_element,item) for item in pending[1:]}
+
+    yield build([OP_ABS,OP_OFF])
+    for item in job:
+        yield build(OP_COMMENT,element=item.index)
+        if item.kind not in compilers: continue
+        if streamed(item):
+            for path in stream_tiled(item):
+                path['element'] = item.index
+                yield path
+            continue
+
+        path = cache.get(item.key)
+        if path is None:
+            path = futures[item.index].result() if item.index in futures else compile_element(item)
+            cache.put(item.key,path)
+
+        path = path.copy()
+        path['element'] = item.index
+        yield path
+    yield build([OP_OFF,OP_END])
+
+def compile_gcode(job : Job,parallel=True,resolution=0.001) -> Iterator[str]:
+    # G代码文本(不含换行符)，用于保存到文件；坐标量化到resolution
+    from .compactor import compact
+    writer = GcodeWriter(resolution,element_names(job))
+    for path in compile_toolpath(job,parallel):
+        yield from writer.lines(compact(path,resolution))
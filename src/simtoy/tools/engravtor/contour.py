@@ -0,0 +1,84 @@
+from collections import OrderedDict
+import os
+import numpy as np
+from .slicer import load_mesh,slice_mesh,chain_segments
+from .toolpath import z_step,concat
+
+# 模型轮廓浮雕：一次批量切出所有层的截面轮廓，自上而下逐层描边，与深度分层(见relief.py)一样每遍加工后下降pass_depth。
+# 网格和每层的轮廓都按(文件, 变换)缓存，修改速度、功率等参数不需要重新切片，
+# 修改pass_depth只重新切片，不重新读取模型
+
+
+class ContourCache:
+    # 最近使用的模型网格及其各层轮廓，轮廓按层高索引
+    def __init__(self,max_meshes=4):
+        self.max_meshes = max_meshes
+        self.entries : OrderedDict[tuple,dict] = OrderedDict()
+
+    def mesh_key(self,item) -> tuple:
+        return (item.filepath,os.path.getmtime(item.filepath),item.matrix.tobytes(),item.offset.tobytes())
+
+    def entry(self,item) -> dict:
+        key = self.mesh_key(item)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        vertices,faces = load_mesh(item.filepath,item.matrix,item.offset)
+        entry = self.entries[key] = dict(vertices=vertices,faces=faces,layers={})
+        while len(self.entries) > self.max_meshes: self.entries.popitem(last=False)
+        return entry
+
+    def layers(self,item,heights : np.ndarray,tolerance) -> list:
+        # 返回各层的(折线列表, 是否闭合)，只切缓存中没有的层
+        entry = self.entry(item)
+        layers = entry['layers']
+        keys = [round(float(h),6) for h in heights]
+        missing = np.array([h for h,k in zip(heights,keys) if k not in layers])
+        if len(missing):
+            order = np.argsort(missing)
+            for k,segments in slice_mesh(entry['vertices'],entry['faces'],missing[order]):
+                layers[round(float(missing[order][k]),6)] = chain_segments(segments,tolerance)
+        return [layers[k] for k in keys]
+
+contours = ContourCache()
+
+def contour_heights(vertices : np.ndarray,pass_depth,passes,layers) -> np.ndarray:
+    # 自上而下的切片高度，取在每层的中间，避开顶面。
+    # 下降时层距为passes*pass_depth，与 compile_layers 每层下降的距离一致；不下降时按layers等分高度
+    z0,z1 = vertices[:,2].min(),vertices[:,2].max()
+    depth = pass_depth * max(1,round(passes))
+    if depth > 0:
+        count = max(int(np.floor((z1 - z0) / depth + 1e-9)),1)
+        spacing = min(depth,(z1 - z0) / count)
+    else:
+        count = max(1,round(layers))
+        spacing = (z1 - z0) / count
+    return z1 - (np.arange(count) + 0.5) * spacing
+
+def compile_contours(item) -> np.ndarray:
+    params = item.params
+    entry = contours.entry(item)
+    heights = contour_heights(entry['vertices'],params['pass_depth'],params['passes'],params['layers'])
+    return compile_layers(contours.layers(item,heights,params['tolerance'] / 100),params)
+
+def compile_layers(layers,params) -> np.ndarray:
+    # 自上而下逐层描边，每层加工passes遍，每遍之后下降pass_depth
+    from .compiler import compile_paths
+    pass_depth = params['pass_depth']
+    passes = max(1,round(params['passes']))
+    # 与 compile_relief 一致，最深处没有轮廓的层不再下降
+    layers = list(layers)
+    while layers and not layers[-1][0]: layers.pop()
+    chunks = []
+    steps = 0
+    for paths,closed in layers:
+        path = compile_paths(paths,closed,params) if paths else None
+        for _ in range(passes):
+            if path is not None: chunks.append(path)
+            if pass_depth:
+                chunks.append(z_step(-pass_depth,params['speed']))
+                steps += 1
+
+    # 加工完成后抬回起始高度
+    if steps: chunks.append(z_step(pass_depth * steps,params['speed']))
+    return concat(chunks)
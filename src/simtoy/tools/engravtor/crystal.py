@@ -0,0 +1,153 @@
+import numpy as np
+from .slicer import load_mesh,layer_heights,slice_mesh
+from .toolpath import OP_RAPID,OP_DWELL,OP_ON,OP_OFF,build,z_step,concat,TOOLPATH
+
+# 水晶内雕：把模型按体素间距pitch体素化，自下而上逐层输出激光点。
+# 每层由切片的交线段做扫描线奇偶填充得到实心截面；表面模式只保留
+# 与上下层或同层四邻域不全是实心的体素。层内按最近邻顺序加工
+
+
+class Lattice:
+    # 加工平面上的体素网格，体素中心为 origin + (序号 + 0.5) * pitch
+    def __init__(self,vertices : np.ndarray,pitch):
+        self.pitch = pitch
+        self.origin = vertices[:,:2].min(axis=0)
+        self.shape = tuple((np.ceil((vertices[:,:2].max(axis=0) - self.origin) / pitch).astype(np.int64) + 1)[::-1])
+
+    def fill(self,segments : np.ndarray) -> np.ndarray:
+        # 截面的实心体素(行对应y，列对应x)
+        h,w = self.shape
+        mask = np.zeros((h,w + 1),dtype=np.int32)
+        if not len(segments): return mask[:,:w].astype(bool)
+
+        (xa,ya),(xb,yb) = segments[:,0].T,segments[:,1].T
+        # 每条线段与哪些行的中心线相交：行中心在[ymin,ymax)内，避免顶点处重复计数
+        ymin,ymax = np.minimum(ya,yb),np.maximum(ya,yb)
+        r0 = np.ceil((ymin - self.origin[1]) / self.pitch - 0.5).astype(np.int64)
+        r1 = np.ceil((ymax - self.origin[1]) / self.pitch - 0.5).astype(np.int64)
+        counts = np.maximum(r1 - r0,0)
+        owner = np.repeat(np.arange(len(segments)),counts)
+        rows = np.repeat(r0 - np.cumsum(np.r_[0,counts[:-1]]),counts) + np.arange(counts.sum())
+        yc = self.origin[1] + (rows + 0.5) * self.pitch
+        xs = xa[owner] + (yc - ya[owner]) * (xb[owner] - xa[owner]) / (yb[owner] - ya[owner])
+
+        # 同一行的交点排序后两两配对，每对之间为实心
+        order = np.lexsort((xs,rows))
+        rows,xs = rows[order],xs[order]
+        first = np.searchsorted(rows,rows,side='left')
+        start = (np.arange(len(rows)) - first) % 2 == 0
+        pair = start[:-1] & (rows[1:] == rows[:-1])
+        i = np.flatnonzero(pair)
+        c0 = np.clip(np.ceil((xs[i] - self.origin[0]) / self.pitch - 0.5).astype(np.int64),0,w)
+        c1 = np.clip(np.ceil((xs[i + 1] - self.origin[0]) / self.pitch - 0.5).astype(np.int64),0,w)
+        r = np.clip(rows[i],0,h - 1)
+        np.add.at(mask,(r,c0),1)
+        np.add.at(mask,(r,c1),-1)
+        return np.cumsum(mask,axis=1)[:,:w] > 0
+
+    def points(self,rows,cols) -> np.ndarray:
+        return np.column_stack((self.origin[0] + (cols + 0.5) * self.pitch,self.origin[1] + (rows + 0.5) * self.pitch))
+
+def surface(prev : np.ndarray,cur : np.ndarray,following : np.ndarray) -> np.ndarray:
+    # 表面体素：自身实心，但上下层或同层四邻域中有空的
+    inner = cur & prev & following
+    inner[1:] &= cur[:-1]
+    inner[:-1] &= cur[1:]
+    inner[:,1:] &= cur[:,:-1]
+    inner[:,:-1] &= cur[:,1:]
+    inner[0] = inner[-1] = False
+    inner[:,0] = inner[:,-1] = False
+    return cur & ~inner
+
+def serpentine(mask : np.ndarray):
+    # 实心截面按行往返加工，在满格点阵上即为最近邻顺序
+    rows,cols = np.nonzero(mask)
+    if not len(rows): return rows,cols
+    bounds = np.flatnonzero(np.r_[True,rows[1:] != rows[:-1],True])
+    line = np.repeat(np.arange(len(bounds) - 1),np.diff(bounds))
+    flip = line % 2 == 1
+    key = np.where(flip,-cols,cols)
+    order = np.lexsort((key,line))
+    return rows[order],cols[order]
+
+NEIGHBOURS = [(0,1),(1,0),(0,-1),(-1,0),(1,1),(1,-1),(-1,1),(-1,-1)]
+
+def nearest_walk(mask : np.ndarray):
+    # 贪心最近邻：先查8邻域(距离1或√2个体素)，都已加工时再用网格索引找最近的剩余点
+    rows,cols = np.nonzero(mask)
+    n = len(rows)
+    if n < 3: return rows,cols
+
+    from .ordering import PointGrid
+    h,w = mask.shape
+    stride = w + 2
+    index = np.full((h + 2) * stride,-1,dtype=np.int64)
+    index[(rows + 1) * stride + cols + 1] = np.arange(n)
+    index = index.tolist()
+    offsets = [dr * stride + dc for dr,dc in NEIGHBOURS]
+    cells = ((rows + 1) * stride + cols + 1).tolist()
+
+    alive = np.ones(n,dtype=bool)
+    grid = None
+    order = []
+    k = 0
+    for _ in range(n):
+        alive[k] = False
+        order.append(k)
+        cell = cells[k]
+        for offset in offsets:
+            j = index[cell + offset]
+            if j >= 0:
+                index[cell + offset] = -1
+                break
+        else:
+            if len(order) == n: break
+            if grid is None: grid = PointGrid(np.column_stack((cols,rows)).astype(np.float64),np.arange(n))
+            j = grid.nearest(np.array([cols[k],rows[k]],dtype=np.float64),alive)
+            index[cells[j]] = -1
+        index[cell] = -1
+        k = j
+    order = np.array(order)
+    return rows[order],cols[order]
+
+def compile_crystal(item) -> np.ndarray:
+    params = item.params
+    pitch = max(params['pitch'],0.01)
+    vertices,faces = load_mesh(item.filepath,item.matrix,item.offset)
+    lattice = Lattice(vertices,pitch)
+    heights = layer_heights(vertices,pitch)
+    hollow = params['crystal_fill'] == 'surface'
+
+    power = round(params['power'])
+    dwell = params['dwell'] / 1000
+    chunks = []
+    # 焦点从模型底面开始按层抬升
+    base = z = vertices[:,2].min()
+    empty = np.zeros(lattice.shape,dtype=bool)
+    masks = (lattice.fill(segments) for _,segments in slice_mesh(vertices,faces,heights))
+    prev,cur = empty,next(masks,None)
+    for height in heights:
+        following = next(masks,empty)
+        if hollow: rows,cols = nearest_walk(surface(prev,cur,following))
+        else: rows,cols = serpentine(cur)
+        prev,cur = cur,following
+        if not len(rows): continue
+
+        chunks.append(z_step(height - z,params['speed']))
+        z = height
+
+        points = lattice.points(rows,cols)
+        dots = np.zeros(len(points) * 2,dtype=TOOLPATH)
+        dots['op'][0::2] = OP_RAPID
+        dots['op'][1::2] = OP_DWELL
+        dots['x'] = np.repeat(points[:,0],2)
+        dots['y'] = np.repeat(points[:,1],2)
+        dots['i'][1::2] = dwell
+        dots['feed'] = params['speed']
+        dots['power'][1::2] = power
+        chunks.append(build(OP_ON,x=points[0,0],y=points[0,1],power=power))
+        chunks.append(dots)
+        chunks.append(build(OP_OFF,x=points[-1,0],y=points[-1,1]))
+
+    if z != base: chunks.append(z_step(base - z,params['speed']))
+    return concat(chunks)
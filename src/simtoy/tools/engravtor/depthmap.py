@@ -0,0 +1,93 @@
+import numpy as np
+
+# 模型 -> 深度图：从上方正交投影，全部三角形一次向量化处理。由重心坐标的边函数求出
+# 每个三角形在各行覆盖的列范围，高度按重心插值(在三角形内是平面)，分批写入z-buffer取最高值
+
+
+class DepthGrid:
+    # 深度图的像素网格：第0行在最上方(y最大)，像素中心为 origin + (序号 + 0.5) * pitch
+    def __init__(self,vertices : np.ndarray,pitch):
+        self.pitch = np.broadcast_to(np.asarray(pitch,dtype=np.float64),(2,))
+        self.origin = vertices[:,:2].min(axis=0)
+        w,h = np.maximum(np.ceil((vertices[:,:2].max(axis=0) - self.origin) / self.pitch).astype(np.int64),1)
+        self.shape = (int(h),int(w))
+
+    def affine(self) -> np.ndarray:
+        # 与 compile_raster 的像素坐标约定一致的2x3仿射矩阵
+        h,w = self.shape
+        px,py = self.pitch
+        return np.array([[px,0,self.origin[0] + w * px / 2],[0,py,self.origin[1] + h * py / 2]])
+
+    def project(self,vertices : np.ndarray) -> np.ndarray:
+        # 加工坐标 -> 像素坐标(列,行)，像素中心为整数
+        h,_ = self.shape
+        u = (vertices[:,0] - self.origin[0]) / self.pitch[0] - 0.5
+        v = h - (vertices[:,1] - self.origin[1]) / self.pitch[1] - 0.5
+        return np.column_stack((u,v))
+
+def rasterize(vertices : np.ndarray,faces : np.ndarray,grid : DepthGrid,budget=1 << 22) -> np.ndarray:
+    # 返回每个像素的最高点z，未被覆盖的像素为-inf。budget为一批最多处理的像素数
+    h,w = grid.shape
+    zbuf = np.full(h * w,-np.inf)
+    uv = grid.project(vertices)
+
+    # 三角形的边函数：w_k = a_k*列 + b_k*行 + c_k，三个w之和为两倍有向面积，像素在内部当且仅当w全部同号。
+    # 边k(顶点k->k+1)对面的顶点是k+2，z = Σw_k*z_(k+2) / 面积，是像素坐标的线性函数 z = A*列 + B*行 + C
+    p = uv[faces]
+    q = np.roll(p,-1,axis=1)
+    a = p[:,:,1] - q[:,:,1]
+    b = q[:,:,0] - p[:,:,0]
+    c = p[:,:,0] * q[:,:,1] - q[:,:,0] * p[:,:,1]
+    area = c.sum(axis=1)
+    keep = np.abs(area) > 1e-12
+    # 竖直的面在投影中退化为线段，它的上沿与相邻面重合，直接跳过
+    a,b,c,area,p = a[keep],b[keep],c[keep],area[keep],p[keep]
+    zt = np.roll(vertices[faces[keep],2],-2,axis=1) / area[:,None]
+    plane = np.column_stack(((a * zt).sum(axis=1),(b * zt).sum(axis=1),(c * zt).sum(axis=1)))
+    sign = np.sign(area)[:,None]
+    a,b,c = a * sign,b * sign,c * sign
+
+    # 每个三角形按行拆成扫描段
+    r0 = np.maximum(np.ceil(p[:,:,1].min(axis=1)),0).astype(np.int64)
+    r1 = np.minimum(np.floor(p[:,:,1].max(axis=1)),h - 1).astype(np.int64)
+    counts = np.maximum(r1 - r0 + 1,0)
+    tri = np.repeat(np.arange(len(counts)),counts)
+    row = np.repeat(r0 - np.cumsum(np.r_[0,counts[:-1]]),counts) + np.arange(counts.sum())
+
+    # 每条边在该行给出列的一个半平面 a*列 >= -(b*行 + c)，三个半平面求交即为扫描段
+    rhs = -(b[tri] * row[:,None] + c[tri])
+    at = a[tri]
+    with np.errstate(divide='ignore',invalid='ignore'):
+        bound = rhs / at
+    eps = 1e-9
+    lo = np.where(at > 0,bound - eps,-np.inf).max(axis=1)
+    hi = np.where(at < 0,bound + eps,np.inf).min(axis=1)
+    # 与行平行的边：整行都在半平面内或都不在
+    hi[((at == 0) & (rhs > eps)).any(axis=1)] = -np.inf
+    col0 = np.maximum(np.ceil(lo),0)
+    col1 = np.minimum(np.floor(hi),w - 1)
+    sizes = np.maximum(col1 - col0 + 1,0).astype(np.int64)
+    col0 = np.where(sizes > 0,col0,0).astype(np.int64)
+
+    # 扫描段起点的高度和沿列的增量，段内逐像素只需一次乘加
+    slope = plane[tri,0]
+    z0 = slope * col0 + plane[tri,1] * row + plane[tri,2]
+    flat = row * w + col0
+
+    ends = np.cumsum(sizes)
+    start = 0
+    while start < len(sizes):
+        stop = max(int(np.searchsorted(ends,ends[start] - sizes[start] + budget,side='right')),start + 1)
+        n = sizes[start:stop]
+        owner = np.repeat(np.arange(start,stop),n)
+        k = np.arange(len(owner)) - np.repeat(ends[start:stop] - n - (ends[start] - sizes[start]),n)
+        np.maximum.at(zbuf,flat[owner] + k,z0[owner] + slope[owner] * k)
+        start = stop
+    return zbuf.reshape(h,w)
+
+def model_depth(vertices : np.ndarray,faces : np.ndarray,pitch):
+    # 返回(高度图, 像素网格)：高度从模型底面起算，未覆盖的像素为0
+    grid = DepthGrid(vertices,pitch)
+    heights = rasterize(vertices,faces,grid)
+    base = vertices[:,2].min()
+    return np.where(np.isfinite(heights),heights - base,0.0),grid
@@ -0,0 +1,90 @@
+import numpy as np
+
+# 半色调：把黑度(0~1)变成只有开/关的点，二极管激光在木头上做不出256级功率，用点的疏密表现灰度。
+# 阈值和有序抖动一次向量化完成；误差扩散按波前处理：像素(i,j)只依赖左边和上面几行的像素，
+# 把图像错位排列(第i行右移k*i列)后，同一列上的像素互不依赖，逐列整体计算；
+# 误差只保留尚未处理的几个波前，额外内存与图像高度成正比，不随像素数增长
+
+
+# 误差扩散核：(行偏移, 列偏移, 权重)
+KERNELS = {
+    'floyd': ([(0,1,7),(1,-1,3),(1,0,5),(1,1,1)],16),
+    'jarvis': ([(0,1,7),(0,2,5),(1,-2,3),(1,-1,5),(1,0,7),(1,1,5),(1,2,3),(2,-2,1),(2,-1,3),(2,0,5),(2,1,3),(2,2,1)],48),
+    'atkinson': ([(0,1,1),(0,2,1),(1,-1,1),(1,0,1),(1,1,1),(2,0,1)],8),
+}
+
+def bayer(order=3) -> np.ndarray:
+    # 2^order阶Bayer矩阵，取值0..4^order-1
+    m = np.zeros((1,1),dtype=np.int64)
+    for _ in range(order):
+        m = np.block([[4 * m,4 * m + 2],[4 * m + 3,4 * m + 1]])
+    return m
+
+def ordered(darkness : np.ndarray,order=3,row=0) -> np.ndarray:
+    # row为第一行在整幅图像中的行号，分段处理时阈值矩阵保持对齐
+    m = bayer(order)
+    h,w = darkness.shape
+    n = len(m)
+    threshold = (m + 0.5) / m.size
+    return darkness > np.tile(threshold,(-(-h // n) + 1,-(-w // n)))[row % n:row % n + h,:w]
+
+def diffuse(darkness : np.ndarray,kernel,carry=None):
+    # 返回(点阵, 扩散到下面几行的误差)，carry为上一段扩散到本段开头几行的误差
+    entries,total = KERNELS[kernel]
+    h,w = darkness.shape
+    if carry is not None:
+        darkness = darkness.astype(np.float32)
+        n = min(h,len(carry))
+        darkness[:n] += carry[:n]
+    # 错位系数k：每个扩散目标(i+di,j+dj)的波前号 k*(i+di)+j+dj 必须大于源像素的 k*i+j
+    k = max(-(-(1 - dj) // di) for di,dj,_ in entries if di > 0)
+    reach = max(di for di,_,_ in entries)
+    span = max(k * di + dj for di,dj,_ in entries)
+
+    # 像素(i,j)在第k*i+j个波前上，误差最多扩散到之后第span个波前，只需保留span+1个波前的误差：
+    # ring[t % (span+1), i] 为扩散到第t个波前第i行像素的误差，多出的reach行收集流出本段的误差
+    size = span + 1
+    ring = np.zeros((size,h + reach),dtype=np.float32)
+    rows = np.arange(h + reach)
+    dots = np.zeros((h,w),dtype=bool)
+    below = np.zeros((reach,w),dtype=np.float32)
+    targets = [(k * di + dj,di,np.float32(weight / total)) for di,dj,weight in entries]
+
+    for t in range(k * (h + reach - 1) + w):
+        errors = ring[t % size]
+        # 本波前上的有效像素行号范围
+        lo = max(0,-(-(t - w + 1) // k))
+        hi = min(h,t // k + 1)
+        if lo < hi:
+            i = rows[lo:hi]
+            j = t - k * i
+            value = darkness[i,j] + errors[lo:hi]
+            on = value >= 0.5
+            dots[i,j] = on
+            error = (value - on).astype(np.float32)
+            for offset,di,weight in targets:
+                ring[(t + offset) % size,lo + di:hi + di] += error * weight
+        # 本段以下几行的误差已经累加完毕
+        lo = max(h,-(-(t - w + 1) // k))
+        hi = min(h + reach,t // k + 1)
+        if lo < hi: below[rows[lo:hi] - h,t - k * rows[lo:hi]] = errors[lo:hi]
+        errors[:] = 0
+    return dots,below
+
+class Ditherer:
+    # 按行带依次处理整幅图像，保留行号和流向下一段的误差；与一次处理整幅图像只有误差累加的浮点舍入顺序不同
+    def __init__(self,method : str):
+        self.method = method
+        self.row = 0
+        self.carry = None
+
+    def __call__(self,darkness : np.ndarray) -> np.ndarray:
+        if self.method == 'threshold': dots = darkness >= 0.5
+        elif self.method == 'ordered': dots = ordered(darkness,row=self.row)
+        else: dots,self.carry = diffuse(darkness,self.method,self.carry)
+        self.row += len(darkness)
+        return dots
+
+def dither(darkness : np.ndarray,method : str) -> np.ndarray:
+    # 返回需要出光的点(bool数组)
+    return Ditherer(method)(darkness)
@@ -0,0 +1,154 @@
+import numpy as np
+
+# 能量沉积模拟：按高斯光斑把每段出光运动的能量累加到覆盖加工范围的网格上，再按耗材的响应曲线换算成黑度，
+# 在加工前预览烧出来的效果。能量单位为满功率秒每平方毫米：功率按S的百分比，运动段取回放时间轴(见playback.py)。
+# 线段按进给速度F(毫米/分)匀速处理(每毫米能量为S/(F/60))，停留按时间计算；高斯光斑沿线段的积分有解析解(误差函数)，长线段切成短段后只计算光斑半径内的像素；
+# 网格按块计算，内存与加工范围无关
+
+
+# 耗材的黑度响应曲线：(阈值, 尺度)，黑度 = 1 - exp(-(能量 - 阈值) / 尺度)，低于阈值不变色
+RESPONSES = {'木板': (0.001,0.004)}
+
+def erf(x : np.ndarray) -> np.ndarray:
+    # Abramowitz-Stegun 7.1.26，误差小于1.5e-7
+    s = np.sign(x)
+    x = np.abs(x)
+    t = 1 / (1 + 0.3275911 * x)
+    y = 1 - (((((1.061405429 * t - 1.453152027) * t) + 1.421413741) * t - 0.284496736) * t + 0.254829592) * t * np.exp(-x * x)
+    return s * y
+
+def response(energy : np.ndarray,consumable : str) -> np.ndarray:
+    # 耗材名称为"材料-尺寸"，按材料查找响应曲线
+    threshold,scale = RESPONSES.get(consumable.split('-')[0],RESPONSES['木板'])
+    return (1 - np.exp(-np.maximum(energy - threshold,0) / scale)).astype(np.float32)
+
+def burn_segments(playback):
+    # 回放时间轴上出光的线段和定点：返回(线段(n,4), 每毫米能量(n,), 定点(m,2), 能量(m,))
+    segments = playback.segments[:playback.count]
+    durations = np.diff(np.r_[playback.times[:playback.count],playback.end])
+    power = segments['power'].astype(np.float64) / 100
+    burning = (power > 0) & (durations > 0)
+    segments,power,durations = segments[burning],power[burning],durations[burning]
+    lines = np.column_stack((segments['x0'],segments['y0'],segments['x1'],segments['y1'])).astype(np.float64)
+    lengths = np.hypot(lines[:,2] - lines[:,0],lines[:,3] - lines[:,1])
+    # 停留和长度为0的运动按定点处理
+    moving = lengths > 1e-9
+    density = power[moving] / np.maximum(segments['feed'][moving] / 60,1e-9)
+    return lines[moving],density,lines[~moving,:2],power[~moving] * durations[~moving]
+
+def split_lines(lines : np.ndarray,piece):
+    # 把线段切成长度不超过piece的短段，分段后的积分之和与原线段相同
+    lengths = np.hypot(lines[:,2] - lines[:,0],lines[:,3] - lines[:,1])
+    counts = np.maximum(1,np.ceil(lengths / piece).astype(np.int64))
+    owner = np.repeat(np.arange(len(lines)),counts)
+    k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts,counts)
+    a,b = lines[owner,:2],lines[owner,2:]
+    f0 = (k / counts[owner])[:,None]
+    f1 = ((k + 1) / counts[owner])[:,None]
+    return np.hstack((a + (b - a) * f0,a + (b - a) * f1)),owner
+
+class Grid:
+    # 覆盖加工范围的网格，坐标原点在工作区中心(与工具路径一致)，第0行在上方
+    def __init__(self,x_lim,y_lim,pitch):
+        self.pitch = pitch
+        self.width = (x_lim[1] - x_lim[0]) * 1000
+        self.height = (y_lim[1] - y_lim[0]) * 1000
+        self.shape = (max(1,round(self.height / pitch)),max(1,round(self.width / pitch)))
+
+    def pixels(self,x : np.ndarray,y : np.ndarray):
+        # 坐标所在的(行, 列)，浮点
+        return (self.height / 2 - y) / self.pitch - 0.5,(x + self.width / 2) / self.pitch - 0.5
+
+    def centers(self,rows : np.ndarray,cols : np.ndarray):
+        return (cols + 0.5) * self.pitch - self.width / 2,self.height / 2 - (rows + 0.5) * self.pitch
+
+class Splats:
+    # 每个短段或定点影响的像素窗口，按窗口的起始行排序，便于按块查找
+    def __init__(self,grid : Grid,x0,y0,x1,y1,radius):
+        r0,c0 = grid.pixels(x0,y0)
+        r1,c1 = grid.pixels(x1,y1)
+        reach = radius / grid.pitch
+        self.rows = (np.floor(np.minimum(r0,r1) - reach).astype(np.int64),np.ceil(np.maximum(r0,r1) + reach).astype(np.int64))
+        self.cols = (np.floor(np.minimum(c0,c1) - reach).astype(np.int64),np.ceil(np.maximum(c0,c1) + reach).astype(np.int64))
+        self.order = np.argsort(self.rows[0],kind='stable')
+        self.first = self.rows[0][self.order]
+        self.span = int((self.rows[1] - self.rows[0]).max(initial=0))
+
+    def window(self,r0,r1,c0,c1):
+        # 与块[r0,r1)x[c0,c1)相交的窗口：返回(编号, 裁剪后的行范围, 列范围)
+        lo,hi = np.searchsorted(self.first,(r0 - self.span,r1))
+        index = self.order[lo:hi]
+        ra,rb = np.maximum(self.rows[0][index],r0),np.minimum(self.rows[1][index],r1 - 1)
+        ca,cb = np.maximum(self.cols[0][index],c0),np.minimum(self.cols[1][index],c1 - 1)
+        valid = (ra <= rb) & (ca <= cb)
+        return index[valid],(ra[valid],rb[valid]),(ca[valid],cb[valid])
+
+def expand(rows,cols,budget):
+    # 把窗口展开为(窗口序号, 行, 列)，每批不超过budget个像素
+    ra,rb = rows
+    ca,cb = cols
+    wc = cb - ca + 1
+    counts = (rb - ra + 1) * wc
+    ends = np.cumsum(counts)
+    start = 0
+    while start < len(counts):
+        base = ends[start - 1] if start else 0
+        stop = max(start + 1,int(np.searchsorted(ends,base + budget,side='right')))
+        n = counts[start:stop]
+        owner = np.repeat(np.arange(start,stop),n)
+        offset = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n,n)
+        yield owner,ra[owner] + offset // wc[owner],ca[owner] + offset % wc[owner]
+        start = stop
+
+def deposit_tiles(playback,x_lim,y_lim,lightspotsize,pitch=None,tile=1024,budget=1 << 22):
+    # 逐块返回(起始行, 起始列, 能量)；光斑直径为1/e²直径，sigma为其四分之一。
+    # 每个像素取像素面积内的平均能量，近似为高斯再与像素宽度的方框卷积，方差加上pitch²/12
+    pitch = pitch or lightspotsize / 2
+    sigma = np.sqrt((lightspotsize / 4) ** 2 + pitch * pitch / 12)
+    radius = 3.5 * sigma
+    grid = Grid(x_lim,y_lim,pitch)
+    lines,density,points,charges = burn_segments(playback)
+    pieces,owner = split_lines(lines,8 * pitch + radius)
+    density = density[owner]
+    line_splats = Splats(grid,pieces[:,0],pieces[:,1],pieces[:,2],pieces[:,3],radius)
+    point_splats = Splats(grid,points[:,0],points[:,1],points[:,0],points[:,1],radius)
+
+    # 线段方向、长度
+    d = pieces[:,2:] - pieces[:,:2]
+    lengths = np.hypot(d[:,0],d[:,1])
+    d = d / lengths[:,None]
+    scale = np.sqrt(2) * sigma
+    h,w = grid.shape
+    for r0 in range(0,h,tile):
+        for c0 in range(0,w,tile):
+            r1,c1 = min(h,r0 + tile),min(w,c0 + tile)
+            energy = np.zeros((r1 - r0) * (c1 - c0),dtype=np.float64)
+
+            index,rows,cols = line_splats.window(r0,r1,c0,c1)
+            for k,r,c in expand(rows,cols,budget):
+                i = index[k]
+                x,y = grid.centers(r,c)
+                px,py = x - pieces[i,0],y - pieces[i,1]
+                # 沿线段方向的投影u和到直线的距离
+                u = px * d[i,0] + py * d[i,1]
+                v = px * d[i,1] - py * d[i,0]
+                value = density[i] * np.exp(-v * v / (2 * sigma * sigma)) / (np.sqrt(2 * np.pi) * sigma)
+                value *= 0.5 * (erf((lengths[i] - u) / scale) + erf(u / scale))
+                energy += np.bincount((r - r0) * (c1 - c0) + c - c0,weights=value,minlength=len(energy))
+
+            index,rows,cols = point_splats.window(r0,r1,c0,c1)
+            for k,r,c in expand(rows,cols,budget):
+                i = index[k]
+                x,y = grid.centers(r,c)
+                rr = (x - points[i,0]) ** 2 + (y - points[i,1]) ** 2
+                value = charges[i] * np.exp(-rr / (2 * sigma * sigma)) / (2 * np.pi * sigma * sigma)
+                energy += np.bincount((r - r0) * (c1 - c0) + c - c0,weights=value,minlength=len(energy))
+            yield r0,c0,energy.reshape(r1 - r0,c1 - c0)
+
+def predict_burn(playback,x_lim,y_lim,lightspotsize,consumable,pitch=None,tile=1024) -> np.ndarray:
+    # 预测的黑度图(0~1)，第0行在工作区上方
+    shape = Grid(x_lim,y_lim,pitch or lightspotsize / 2).shape
+    darkness = np.zeros(shape,dtype=np.float32)
+    for r0,c0,energy in deposit_tiles(playback,x_lim,y_lim,lightspotsize,pitch,tile):
+        darkness[r0:r0 + len(energy),c0:c0 + energy.shape[1]] = response(energy,consumable)
+    return darkness
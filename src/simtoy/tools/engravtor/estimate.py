@@ -0,0 +1,152 @@
+import numpy as np
+from .toolpath import OP_COMMENT,OP_RAPID,OP_LINE,OP_CW,OP_CCW,OP_DWELL,MOTIONS
+
+# 加工时间估算：对整个工具路径一次性套用与模拟器(见playback.py)相同的运动模型，得到总时间、切割/空程距离和每个元素的时间。
+# 运动模型：F为毫米/分，加速度为机器加速度ACCELERATION(毫米/秒²)；共线、同速的连续直线段(例如扫描行内的各个功率段)
+# 之间不减速，整串按一个梯形速度曲线加工，只在转向、圆弧、暂停处从0加速、减速到0
+
+
+# 默认的机器加速度(毫米/秒²)，与常见二极管激光雕刻机的GRBL设置($120/$121)同量级
+ACCELERATION = 1000.0
+
+def segment_lengths(path : np.ndarray,start) -> np.ndarray:
+    # 移动指令的路径长度，圆弧按弧长计算
+    x = path['x'].astype(np.float64)
+    y = path['y'].astype(np.float64)
+    x0 = np.r_[start[0],x[:-1]]
+    y0 = np.r_[start[1],y[:-1]]
+    lengths = np.hypot(x - x0,y - y0)
+
+    arcs = np.flatnonzero(np.isin(path['op'],(OP_CW,OP_CCW)))
+    if len(arcs):
+        i = path['i'][arcs].astype(np.float64)
+        j = path['j'][arcs].astype(np.float64)
+        cx,cy = x0[arcs] + i,y0[arcs] + j
+        a0 = np.arctan2(y0[arcs] - cy,x0[arcs] - cx)
+        a1 = np.arctan2(y[arcs] - cy,x[arcs] - cx)
+        sweep = np.where(path['op'][arcs] == OP_CCW,a1 - a0,a0 - a1) % (2 * np.pi)
+        # 起点与终点重合的圆弧是整圆
+        sweep[sweep == 0] = 2 * np.pi
+        lengths[arcs] = np.hypot(i,j) * sweep
+    return lengths
+
+def modal_speed(feed : np.ndarray,speed) -> np.ndarray:
+    # F是模态的，未指定速度的移动沿用上一次的速度，speed为之前的速度
+    feed = feed.astype(np.float64)
+    last = np.maximum.accumulate(np.where(feed > 0,np.arange(len(feed)),-1))
+    return np.where(last >= 0,feed[np.maximum(last,0)],speed)
+
+def trapezoid_profile(lengths : np.ndarray,speed : np.ndarray,acceleration):
+    # 起止速度为0、长度为lengths的运动：返回(加速时间, 匀速时间, 峰值速度)，减速时间等于加速时间；速度为毫米/秒
+    speed = np.maximum(speed,1e-9)
+    acceleration = np.maximum(acceleration,1e-9)
+    peak = np.minimum(speed,np.sqrt(lengths * acceleration))
+    ramp = peak / acceleration
+    cruise = np.where(peak > 0,np.maximum(lengths - peak * ramp,0) / np.maximum(peak,1e-9),0)
+    return ramp,cruise,peak
+
+def profile_time(s : np.ndarray,lengths : np.ndarray,ramp,cruise,peak,acceleration) -> np.ndarray:
+    # 按梯形速度曲线走到距离s所用的时间，与 profile_distance 互逆
+    accelerate = 0.5 * peak * ramp
+    constant = peak * cruise
+    with np.errstate(divide='ignore',invalid='ignore'):
+        t = np.where(s <= accelerate,np.sqrt(2 * np.maximum(s,0) / acceleration),
+            np.where(s <= accelerate + constant,ramp + (s - accelerate) / np.maximum(peak,1e-9),
+                     2 * ramp + cruise - np.sqrt(2 * np.maximum(lengths - s,0) / acceleration)))
+    return np.where(lengths > 0,t,0)
+
+def profile_distance(t,ramp,cruise,peak,acceleration):
+    # 梯形速度曲线上时间t走过的距离
+    if t <= ramp: return 0.5 * acceleration * t * t
+    if t <= ramp + cruise: return 0.5 * peak * ramp + peak * (t - ramp)
+    t = min(t - ramp - cruise,ramp)
+    return 0.5 * peak * ramp + peak * cruise + peak * t - 0.5 * acceleration * t * t
+
+def plan_motion(op : np.ndarray,x0,y0,x1,y1,lengths : np.ndarray,speed : np.ndarray,acceleration):
+    # op为移动和暂停指令，速度为毫米/秒。把可以连续加工的段合并成一串：
+    # 非零长度的直线段与上一条非零长度的直线段共线、同向、同速，且中间没有圆弧和暂停时接在同一串上，交接处不减速；
+    # 长度为0的段不打断一串。返回每段的(起始时间相对所在串的偏移, 用时, 串内起点距离, 串长, 加速时间, 匀速时间, 峰值速度)
+    n = len(op)
+    straight = np.isin(op,(OP_RAPID,OP_LINE)) & (lengths > 0)
+    barrier = ~np.isin(op,(OP_RAPID,OP_LINE))
+    index = np.flatnonzero(straight)
+    joined = np.zeros(n,dtype=bool)
+    if len(index) > 1:
+        prev,cur = index[:-1],index[1:]
+        dx,dy = (x1 - x0) / np.maximum(lengths,1e-12),(y1 - y0) / np.maximum(lengths,1e-12)
+        # 两段之间(不含两端)有圆弧或暂停
+        barriers = np.cumsum(barrier)
+        clear = barriers[cur - 1] == barriers[prev]
+        aligned = dx[prev] * dx[cur] + dy[prev] * dy[cur] > 1 - 1e-9
+        joined[cur] = clear & aligned & (speed[prev] == speed[cur])
+    # 每串从一个不与前一段相接的非零段、圆弧或暂停开始
+    starts = (straight & ~joined) | barrier
+    starts[0] = True
+    chain = np.cumsum(starts) - 1
+    first = np.flatnonzero(starts)
+
+    ends = np.cumsum(lengths)
+    offset = ends - lengths - (ends - lengths)[first][chain]
+    total = np.add.reduceat(lengths,first)[chain]
+    chain_speed = np.minimum.reduceat(np.where(lengths > 0,speed,np.inf),first)
+    chain_speed = np.where(np.isfinite(chain_speed),chain_speed,0)[chain]
+    ramp,cruise,peak = trapezoid_profile(total,chain_speed,acceleration)
+    elapsed = profile_time(offset,total,ramp,cruise,peak,acceleration)
+    durations = profile_time(offset + lengths,total,ramp,cruise,peak,acceleration) - elapsed
+    return elapsed,durations,offset,total,ramp,cruise,peak
+
+class Estimator:
+    # 可分段累加：按加工顺序依次add每段工具路径
+    def __init__(self,acceleration=ACCELERATION,start=(0.0,0.0)):
+        self.acceleration = acceleration
+        self.x,self.y = start
+        self.speed = 0.0
+        self.time = 0.0
+        self.cut = 0.0
+        self.travel = 0.0
+        self.elements = {}
+        # 每个元素路径排序减少的空程
+        self.saved = {}
+
+    def add(self,path : np.ndarray):
+        notes = path[(path['op'] == OP_COMMENT) & ((path['i'] != 0) | (path['j'] != 0))]
+        for e,before,after in zip(notes['element'].tolist(),notes['i'].tolist(),notes['j'].tolist()):
+            self.saved[e] = self.saved.get(e,0.0) + before - after
+
+        keep = np.isin(path['op'],MOTIONS + (OP_DWELL,))
+        path = path[keep].copy()
+        if not len(path): return
+        moving = path['op'] != OP_DWELL
+        # 暂停停在上一条移动指令的终点，只计时间(秒数在i)
+        last = np.maximum.accumulate(np.where(moving,np.arange(len(path)),-1))
+        path['x'] = np.where(last >= 0,path['x'][np.maximum(last,0)],self.x)
+        path['y'] = np.where(last >= 0,path['y'][np.maximum(last,0)],self.y)
+
+        lengths = np.where(moving,segment_lengths(path,(self.x,self.y)),0)
+        feed = modal_speed(path['feed'],self.speed)
+        x0,y0 = np.r_[self.x,path['x'][:-1]],np.r_[self.y,path['y'][:-1]]
+        _,times,*_ = plan_motion(path['op'],x0,y0,path['x'],path['y'],lengths,feed / 60,self.acceleration)
+        times = np.where(moving,times,path['i'])
+
+        cutting = moving & (path['op'] != OP_RAPID) & (path['power'] > 0)
+        self.cut += float(lengths[cutting].sum())
+        self.travel += float(lengths[moving & ~cutting].sum())
+        self.time += float(times.sum())
+
+        self.add_elements(path['element'],times)
+
+        self.x,self.y = float(path['x'][-1]),float(path['y'][-1])
+        self.speed = float(feed[-1])
+
+    def add_elements(self,elements : np.ndarray,times : np.ndarray):
+        tagged = elements >= 0
+        sums = np.bincount(elements[tagged],weights=times[tagged])
+        for e in np.flatnonzero(np.bincount(elements[tagged])).tolist():
+            self.elements[e] = self.elements.get(e,0.0) + float(sums[e])
+
+def format_duration(seconds) -> str:
+    seconds = round(seconds)
+    h,m,s = seconds // 3600,seconds // 60 % 60,seconds % 60
+    if h: return f'{h}小时{m}分{s}秒'
+    if m: return f'{m}分{s}秒'
+    return f'{s}秒'
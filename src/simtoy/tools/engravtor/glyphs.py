@@ -0,0 +1,85 @@
+from collections import OrderedDict
+import threading
+import numpy as np
+
+# 文字轮廓：cairo生成文字路径后展平为折线，坐标与 Label.draw_to_svg 一致：
+# 以文字包围盒中心为原点，单位毫米，y轴向上。
+# 每个字形只展平一次，按(字体, 字号, 字形号)缓存，重复的字符只平移缓存的轮廓。
+# 界面线程(Label)和编译线程都会用到：cairo上下文每个线程一个，缓存的读写加锁
+
+
+def flat_polygons(path) -> list[np.ndarray]:
+    # copy_path_flat 的结果拆成闭合折线，坐标为cairo坐标(y轴向下)，去掉与起点重合的终点
+    import cairo
+    outlines = []
+    points = []
+    for kind,coords in path:
+        if kind == cairo.PATH_MOVE_TO:
+            if len(points) > 2: outlines.append(points)
+            points = [coords]
+        elif kind == cairo.PATH_LINE_TO:
+            points.append(coords)
+        elif kind == cairo.PATH_CLOSE_PATH:
+            if len(points) > 2: outlines.append(points)
+            points = []
+    if len(points) > 2: outlines.append(points)
+
+    polygons = []
+    for points in outlines:
+        points = np.array(points,dtype=np.float64)
+        if np.allclose(points[0],points[-1]): points = points[:-1]
+        if len(points) > 2: polygons.append(points)
+    return polygons
+
+class GlyphCache:
+    # 最近使用的字形轮廓，坐标以字形原点为原点
+    def __init__(self,max_glyphs=4096):
+        self.max_glyphs = max_glyphs
+        self.entries : OrderedDict[tuple,list] = OrderedDict()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def context(self,family,font_size):
+        # 当前线程每种(字体, 字号)一个排版用的上下文
+        import cairo
+        if not hasattr(self.local,'contexts'): self.local.contexts = dict()
+        contexts = self.local.contexts
+        key = (family,font_size)
+        if key not in contexts:
+            cr = cairo.Context(cairo.RecordingSurface(cairo.CONTENT_ALPHA,None))
+            cr.select_font_face(family,cairo.FONT_SLANT_NORMAL,cairo.FONT_WEIGHT_NORMAL)
+            cr.set_font_size(font_size)
+            contexts[key] = cr
+        return contexts[key]
+
+    def outline(self,family,font_size,index) -> list[np.ndarray]:
+        import cairo
+        key = (family,font_size,index)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        # 展平在本线程的上下文上进行，不占用锁；两个线程同时展平同一字形时结果相同，后写入的覆盖
+        cr = self.context(family,font_size)
+        cr.new_path()
+        cr.glyph_path([cairo.Glyph(index,0,0)])
+        polygons = flat_polygons(cr.copy_path_flat())
+        cr.new_path()
+        with self.lock:
+            self.entries[key] = polygons
+            while len(self.entries) > self.max_glyphs: self.entries.popitem(last=False)
+        return polygons
+
+glyphs = GlyphCache()
+
+def text_outlines(text : str,family : str,font_size) -> list[np.ndarray]:
+    cr = glyphs.context(family,font_size)
+    extents = cr.text_extents(text)
+    x0 = -extents.x_bearing - extents.width / 2
+    y0 = -extents.y_bearing - extents.height / 2
+    polygons = []
+    # 排版(字距、连字)仍由cairo完成，只取每个字形的位置
+    for glyph in cr.get_scaled_font().text_to_glyphs(x0,y0,text,False):
+        offset = np.array([glyph.x,glyph.y])
+        polygons.extend((points + offset) * [1,-1] for points in glyphs.outline(family,font_size,glyph.index))
+    return polygons
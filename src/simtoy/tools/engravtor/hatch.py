@@ -0,0 +1,46 @@
+import numpy as np
+from .raster import compile_runs,overscan_distance
+
+# 矢量填充：扫描线直接与多边形的边求交，不经过位图。
+# 所有边一次展开成活动边表(每条边与哪些扫描线相交)，同一扫描线的交点排序后按奇偶规则两两配对，
+# 每对之间是一段G1。扫描线间距为density_y，可按hatch_angle旋转
+
+
+def hatch_runs(polygons : list[np.ndarray],spacing,angle=0.0):
+    # 返回(行号, 起点, 终点, 2x3仿射矩阵)：起止点为旋转后坐标系的x，仿射矩阵按 scanline_points 的约定换算回加工坐标
+    theta = np.radians(angle)
+    rotation = np.array([[np.cos(theta),-np.sin(theta)],[np.sin(theta),np.cos(theta)]])
+    polygons = [p @ rotation for p in polygons if len(p) > 2]
+    if not polygons: return np.zeros(0,np.int64),np.zeros(0),np.zeros(0),None
+
+    a = np.concatenate(polygons)
+    b = np.concatenate([np.roll(p,-1,axis=0) for p in polygons])
+    top = max(a[:,1].max(),b[:,1].max())
+    affine = np.column_stack((rotation @ np.diag([1.0,spacing]),rotation @ [0,top]))
+
+    # 扫描线 y_r = top - (r + 0.5) * spacing，边在 [ymin,ymax) 内与之相交，避免顶点处重复计数
+    ymin,ymax = np.minimum(a[:,1],b[:,1]),np.maximum(a[:,1],b[:,1])
+    r0 = np.floor((top - ymax) / spacing - 0.5).astype(np.int64) + 1
+    r1 = np.floor((top - ymin) / spacing - 0.5).astype(np.int64) + 1
+    counts = np.maximum(r1 - r0,0)
+    edge = np.repeat(np.arange(len(a)),counts)
+    rows = np.repeat(r0 - np.cumsum(np.r_[0,counts[:-1]]),counts) + np.arange(counts.sum())
+    y = top - (rows + 0.5) * spacing
+    (xa,ya),(xb,yb) = a[edge].T,b[edge].T
+    xs = xa + (y - ya) * (xb - xa) / (yb - ya)
+
+    order = np.lexsort((xs,rows))
+    rows,xs = rows[order],xs[order]
+    first = np.searchsorted(rows,rows,side='left')
+    pair = ((np.arange(len(rows)) - first) % 2 == 0)[:-1] & (rows[1:] == rows[:-1])
+    i = np.flatnonzero(pair)
+    i = i[xs[i + 1] > xs[i]]
+    return rows[i],xs[i],xs[i + 1],affine
+
+def compile_hatch(polygons : list[np.ndarray],params) -> np.ndarray:
+    # polygons为加工坐标(毫米)下的闭合多边形，首尾不重复
+    spacing = max(params['density_y'],0.001)
+    rows,starts,ends,affine = hatch_runs(polygons,spacing,params['hatch_angle'])
+    power = np.full(len(rows),round(params['power']),dtype=np.int32)
+    scan = dict(bidirectional=params['bidirectional'],overscan=overscan_distance(params))
+    return compile_runs(rows,starts,ends,power,(0,0),affine,params['speed'],**scan)
@@ -0,0 +1,62 @@
+import numpy as np
+from .slicer import chain_segments
+
+# 灰度等值线：灰度先量化为层号，再对所有层一次做marching squares。
+# 每个2x2单元只与它四个角的最小、最大层号之间的那些等值线相交，把(单元, 层)一次展开，
+# 查表得到交线段，再按层连接成闭合轮廓。第k层轮廓是层号大于k的区域边界，与浮雕第k层的加工区域一致
+
+
+# 单元的边：0上 1右 2下 3左，角：1左上 2右上 4右下 8左下；每种情形最多两条线段(起始边, 结束边)
+SEGMENTS = np.full((18,2,2),-1,dtype=np.int64)
+for case,pairs in {1: [(3,0)],2: [(0,1)],3: [(3,1)],4: [(1,2)],5: [(3,0),(1,2)],6: [(0,2)],7: [(3,2)],
+                   8: [(2,3)],9: [(0,2)],10: [(0,1),(2,3)],11: [(1,2)],12: [(1,3)],13: [(0,1)],14: [(3,0)],
+                   # 鞍点：中心在区域内时两个对角相连
+                   16: [(0,1),(2,3)],17: [(3,0),(1,2)]}.items():
+    SEGMENTS[case,:len(pairs)] = pairs
+
+# 边中点和角点在单元内的位置(列,行)
+EDGE_POINTS = np.array([[0.5,0],[1,0.5],[0.5,1],[0,0.5]])
+CORNER_POINTS = np.array([[0,0],[1,0],[1,1],[0,1]])
+
+def iso_segments(levels : np.ndarray,count):
+    # 返回(层号, 线段(m,2,2))，坐标为(列,行)的像素中心坐标；翻转为y轴向上后区域在线段左侧，与 slicer.orient 一致
+    grid = np.pad(levels.astype(np.int64),1)
+    corners = np.stack((grid[:-1,:-1],grid[:-1,1:],grid[1:,1:],grid[1:,:-1]),axis=-1)
+    low,high = corners.min(axis=-1),np.minimum(corners.max(axis=-1),count)
+    rows,cols = np.nonzero(high > low)
+    low,high,corners = low[rows,cols],high[rows,cols],corners[rows,cols]
+
+    counts = high - low
+    cell = np.repeat(np.arange(len(rows)),counts)
+    level = np.repeat(low - np.cumsum(np.r_[0,counts[:-1]]),counts) + np.arange(counts.sum())
+    inside = corners[cell] > level[:,None]
+    case = inside @ np.array([1,2,4,8])
+    saddle = (case == 5) | (case == 10)
+    center = corners[cell].mean(axis=1) > level
+    case = np.where(saddle & center,np.where(case == 5,16,17),case)
+
+    pairs = SEGMENTS[case]
+    valid = pairs[:,:,0] >= 0
+    owner = np.repeat(np.arange(len(case)),valid.sum(axis=1))
+    pairs = pairs[valid]
+    origin = np.column_stack((cols,rows))[cell[owner]] - 1.0
+    a = origin + EDGE_POINTS[pairs[:,0]]
+    b = origin + EDGE_POINTS[pairs[:,1]]
+
+    # 按区域一侧统一方向：起始边顺时针方向的下一个角决定区域在哪一侧
+    corner = (pairs[:,0] + 1) % 4
+    side = inside[owner,corner]
+    c = origin + CORNER_POINTS[corner]
+    cross = (b[:,0] - a[:,0]) * (c[:,1] - a[:,1]) - (b[:,1] - a[:,1]) * (c[:,0] - a[:,0])
+    flip = (cross > 0) == side
+    segments = np.stack((np.where(flip[:,None],b,a),np.where(flip[:,None],a,b)),axis=1)
+    return level[owner],segments
+
+def iso_contours(levels : np.ndarray,count) -> list:
+    # 每层的(折线列表, 是否闭合)，坐标为以图像中心为原点的像素坐标，y轴向上，与 scanline_points 一致
+    h,w = levels.shape
+    level,segments = iso_segments(levels,count)
+    segments = segments * [1,-1] + [0.5 - w / 2,h / 2 - 0.5]
+    order = np.argsort(level,kind='stable')
+    bounds = np.searchsorted(level[order],np.arange(count + 1))
+    return [chain_segments(segments[order[bounds[k]:bounds[k + 1]]]) for k in range(count)]
@@ -0,0 +1,186 @@
+from concurrent.futures import Future
+import numpy as np
+from .cache import element_key
+
+# 加工任务的内存描述：元素、变换、参数和像素数据(直接引用，不复制)，
+# 编译器只读取Job，不再经过 PNG编码 -> base64 -> SVG -> 再解码 的绕行。
+# SVG只作为可选的磁盘交换格式，见 Engravtor.export_svg
+
+
+def element_affine(obj) -> np.ndarray:
+    # 元素坐标(毫米) -> 加工坐标(毫米)的2x3仿射矩阵
+    m = np.asarray(obj.local.matrix,dtype=np.float64)
+    affine = np.empty((2,3))
+    affine[:,:2] = m[:2,:2]
+    affine[:,2] = m[:2,3] * 1000
+    return affine
+
+def apply_affine(affine : np.ndarray,points : np.ndarray) -> np.ndarray:
+    return points @ affine[:,:2].T + affine[:,2]
+
+class BitmapSource:
+    # 位图的像素(超大位图为显示用的缩略图和磁盘上的store)及其派生结果：源摘要、重采样、半色调和等值线。
+    # 元素和JobElement共用同一个对象，界面线程只传递引用，派生结果在编译线程按需计算并缓存。
+    # 超大位图的store可以是后台转换的Future(见 tiles.open_store)，第一次用到时等待转换完成。
+    # 传给子进程时只带像素和store，派生结果在子进程中重新计算
+    def __init__(self,pixels,store,size):
+        self.pixels = pixels
+        self.store = store
+        self.size = size
+        self.digest = None
+        self.resampled = dict()
+        self.dithered = dict()
+        self.isolines = dict()
+
+    def load(self):
+        if isinstance(self.store,Future):
+            store = self.store.result()
+            self.pixels = np.asarray(store.mip())
+            self.store = store
+
+    def __getstate__(self):
+        self.load()
+        return dict(pixels=self.pixels,store=self.store,size=self.size,digest=self.digest)
+
+    def __setstate__(self,state):
+        self.__init__(state['pixels'],state['store'],state['size'])
+        self.digest = state['digest']
+
+    def get_digest(self) -> bytes:
+        self.load()
+        if self.digest is None:
+            import hashlib
+            h = hashlib.sha1()
+            # 超大位图按源文件摘要，不读取全部像素
+            if self.store is not None: h.update(self.store.digest.encode())
+            else:
+                h.update(f'{self.pixels.shape}'.encode())
+                h.update(np.ascontiguousarray(self.pixels).data)
+            self.digest = h.digest()
+        return self.digest
+
+    def get_resampled(self,key):
+        # 重采样到加工点阵的像素(见resample.py)，key为(点阵, 方法)；
+        # 未启用重采样(key为None)时返回原像素，超大位图缩放后仍然太大时返回None
+        self.load()
+        if key is None: return None if self.store is not None else self.pixels
+        pixels = self.resampled.get(key)
+        if pixels is None and key not in self.resampled:
+            from .resample import resample,resample_store
+            grid,method = key
+            if self.store is not None: pixels = resample_store(self.store,grid,method)
+            else: pixels = resample(self.pixels,grid,method)
+            # 拖动缩放时会产生很多点阵大小，只保留最近几个
+            if len(self.resampled) >= 4: self.resampled.clear()
+            self.resampled[key] = pixels
+        return pixels
+
+    def get_dithered(self,key,method) -> np.ndarray:
+        # 半色调点阵，在重采样后的点阵上计算；键包含重采样的点阵和滤波方法，只改滤波方法时点阵大小不变，结果也不同
+        dots = self.dithered.get((key,method))
+        if dots is None:
+            from .raster import image_darkness
+            from .dither import dither
+            dots = dither(image_darkness(self.get_resampled(key)),method)
+            if len(self.dithered) >= 4: self.dithered.clear()
+            self.dithered[(key,method)] = dots
+        return dots
+
+    def get_isolines(self,layers) -> list:
+        # 各层灰度等值线(原图的像素坐标，见 isolines.iso_contours)，预览和编译共用
+        self.load()
+        contours = self.isolines.get(layers)
+        if contours is None:
+            from .raster import image_darkness
+            from .relief import depth_levels
+            from .isolines import iso_contours
+            contours = iso_contours(depth_levels(image_darkness(self.pixels),layers),layers)
+            # 超大位图在缩略图上求等值线，再换算到原图的像素坐标
+            scale = self.size[0] / self.pixels.shape[1]
+            if scale != 1: contours = [([p * scale for p in paths],closed) for paths,closed in contours]
+            self.isolines[layers] = contours
+        return contours
+
+class JobElement:
+    # 单个元素编译需要的全部数据，可以交给子进程编译。
+    # 构造在界面线程进行，只记录参数、变换和数据的引用；缓存键在编译线程的 prepare 中计算，
+    # 重采样、半色调和等值线在编译这个元素时(通常在子进程中)由 derive 计算，缓存命中时不计算
+    def __init__(self,obj,index,tolerance=0.05):
+        self.index = index
+        self.kind = obj.__class__.__name__
+        self.name = obj.name
+        self.params = dict(obj.params,tolerance=tolerance)
+        self.affine = element_affine(obj)
+        self.key = None
+
+        if self.kind == 'Bitmap':
+            self.source = obj.source
+            self.resample = None
+            if self.params['resample'] != 'none':
+                from .resample import dot_grid
+                grid = dot_grid(obj.size,self.affine,self.params['density_x'],self.params['density_y'])
+                self.resample = (grid,self.params['resample'])
+        elif self.kind == 'Vectors':
+            self.lines = [np.asarray(line.geometry.positions.data)[:,:2] * 1000 for line in obj.lines]
+        elif self.kind == 'Label':
+            self.text,self.family,self.font_size = obj.text,obj.family,obj.font_size
+        elif self.kind == 'Model':
+            self.filepath = obj.filepath
+            # 完整的三维变换(平移量为毫米)，以及模型相对包围盒中心的偏移(毫米)
+            self.matrix = np.asarray(obj.local.matrix,dtype=np.float64).copy()
+            self.matrix[:3,3] *= 1000
+            self.offset = np.asarray(obj.obj.local.position,dtype=np.float64) * 1000
+
+    def prepare(self):
+        # 在编译线程、提交给子进程之前调用一次：缓存键，以及超大位图是否从磁盘逐个行带编译
+        if self.key is not None: return
+        self.key = element_key(self)
+        if self.kind != 'Bitmap': return
+        # 超大位图未重采样，或重采样后仍然太大(见 resample_store)时，编译读取磁盘上的store
+        from .tiles import TILED_PIXELS
+        self.store = self.source.store
+        if self.resample is not None and np.prod(self.resample[0]) <= TILED_PIXELS: self.store = None
+
+    def derive(self):
+        # 编译这个元素时调用一次(本进程或子进程)；本进程编译时与预览共用 BitmapSource 的缓存
+        if self.kind != 'Bitmap' or self.source is None: return
+
+        # 重采样到加工点阵的RGBA像素，未重采样时与预览纹理共用同一块内存；
+        # 超大位图不能整体放入内存时pixels只是显示用的缩略图，编译读取磁盘上的store
+        source = self.source
+        pixels = source.get_resampled(self.resample) if self.store is None else None
+        self.pixels = source.pixels if pixels is None else pixels
+        affine = self.affine.copy()
+        if self.store is None:
+            # 像素坐标按点阵缩放，元素的物理尺寸不变
+            w,h = source.size
+            self.affine[:,0] *= w / self.pixels.shape[1]
+            self.affine[:,1] *= h / self.pixels.shape[0]
+        # 填充模式的半色调点阵
+        self.dots = None
+        if self.store is None and self.params['engraving_mode'] == 'fill' and self.params['dither'] != 'none':
+            self.dots = source.get_dithered(self.resample,self.params['dither'])
+        # 轮廓浮雕的各层等值线
+        self.isolines = None
+        if self.params['engraving_mode'] == 'external' and self.params['relief'] == 'contour':
+            self.isolines = source.get_isolines(max(1,round(self.params['layers'])))
+            # 等值线是原图的像素坐标，换算到与affine一致的点阵坐标
+            scale = np.linalg.norm(affine[:,:2],axis=0) / np.linalg.norm(self.affine[:,:2],axis=0)
+            if not np.allclose(scale,1): self.isolines = [([p * scale for p in paths],closed) for paths,closed in self.isolines]
+        # 派生结果已取出，不再需要元素的缓存
+        self.source = None
+
+class Job:
+    # 按加工顺序排列的可加工元素，元素的index即工具路径中的element字段
+    def __init__(self,items,tolerance=0.05,x_lim=(0,0.100),y_lim=(0,0.100)):
+        self.tolerance = tolerance
+        self.x_lim = x_lim
+        self.y_lim = y_lim
+        self.elements = []
+        for obj in items:
+            if not obj.params['excutable']: continue
+            self.elements.append(JobElement(obj,len(self.elements),tolerance))
+
+    def __len__(self): return len(self.elements)
+
+    def __iter__(self): return iter(self.elements)
@@ -0,0 +1,149 @@
+import numpy as np
+
+# 线条加工顺序优化：用网格空间索引做最近邻排序，再用窗口化的2-opt
+# 消除交叉的空程，减少G0在工作台上来回穿梭的距离。
+# 开放路径可以从任意一端进入，闭合路径可以从任意顶点重新起刀。
+
+
+class PointGrid:
+    # 均匀网格空间索引，按单元格排序存储所有候选点(CSR结构)
+    def __init__(self,points : np.ndarray,owners : np.ndarray):
+        self.points = points
+        self.owners = owners
+        self.lo = points.min(axis=0)
+        extent = np.maximum(points.max(axis=0) - self.lo,1e-9)
+        self.size = max(float(np.sqrt(extent[0] * extent[1] / max(len(points),1))) * 2,1e-6)
+        self.shape = (extent // self.size).astype(np.int64) + 1
+
+        cells = self.cell_of(points)
+        ids = cells[:,0] * self.shape[1] + cells[:,1]
+        self.order = np.argsort(ids,kind='stable')
+        self.offsets = np.searchsorted(ids[self.order],np.arange(self.shape[0] * self.shape[1] + 1))
+
+    def cell_of(self,points):
+        return np.clip(((points - self.lo) // self.size).astype(np.int64),0,self.shape - 1)
+
+    def nearest(self,p,alive : np.ndarray):
+        # 由近到远逐圈搜索，返回最近的有效候选点序号
+        cx,cy = self.cell_of(np.asarray(p)[None])[0]
+        best,best_d = -1,np.inf
+        r = 0
+        while True:
+            if (r - 1) * self.size > best_d: break
+            x0,x1 = cx - r,cx + r
+            y0,y1 = cy - r,cy + r
+            if x0 < 0 and y0 < 0 and x1 >= self.shape[0] and y1 >= self.shape[1]: break
+
+            ring = []
+            for x in range(max(x0,0),min(x1,self.shape[0] - 1) + 1):
+                if x == x0 or x == x1:
+                    ys = range(max(y0,0),min(y1,self.shape[1] - 1) + 1)
+                else:
+                    ys = [y for y in (y0,y1) if 0 <= y < self.shape[1]]
+                for y in ys:
+                    cell = x * self.shape[1] + y
+                    a,b = self.offsets[cell],self.offsets[cell + 1]
+                    if a != b: ring.append(self.order[a:b])
+
+            if ring:
+                ids = np.concatenate(ring)
+                ids = ids[alive[self.owners[ids]]]
+                if len(ids):
+                    d = np.hypot(*(self.points[ids] - p).T)
+                    i = d.argmin()
+                    if d[i] < best_d: best,best_d = ids[i],d[i]
+            r += 1
+        return best
+
+def travel_length(start,entries,exits) -> float:
+    if not len(entries): return 0.0
+    prev = np.vstack(([start],exits[:-1]))
+    return float(np.hypot(*(entries - prev).T).sum())
+
+def two_opt(start,entries,exits,order,reverse,window=50,passes=50):
+    # 翻转第i..j段：只有两端的两条空程会改变，段内空程长度不变。
+    # 每轮一次性算出所有(i,j)组合的收益，再贪心地应用互不重叠的翻转
+    n = len(order)
+    offsets = np.arange(min(window,n))
+    for _ in range(passes):
+        prev = np.vstack(([start],exits[:-1]))
+        i = np.arange(n)[:,None]
+        j = i + offsets[None,:]
+        valid = j < n
+        has_next = j + 1 < n
+        j = np.minimum(j,n - 1)
+        nxt = np.minimum(j + 1,n - 1)
+
+        old = np.hypot(*(entries - prev).T)[:,None] + np.where(has_next,np.hypot(*(entries[nxt] - exits[j]).transpose(2,0,1)),0)
+        new = np.hypot(*(exits[j] - prev[:,None]).transpose(2,0,1)) + np.where(has_next,np.hypot(*(entries[nxt] - entries[:,None]).transpose(2,0,1)),0)
+        delta = np.where(valid,new - old,0)
+        best = delta.argmin(axis=1)
+        gain = delta[np.arange(n),best]
+        candidates = np.flatnonzero(gain < -1e-9)
+        if not len(candidates): break
+
+        used = np.zeros(n + 2,dtype=bool)
+        for i in candidates[np.argsort(gain[candidates])].tolist():
+            j = i + int(best[i])
+            if used[i:j + 3].any(): continue
+            used[i:j + 3] = True
+            s = slice(i,j + 1)
+            entries[s],exits[s] = exits[s][::-1].copy(),entries[s][::-1].copy()
+            order[s] = order[s][::-1].copy()
+            reverse[s] = ~reverse[s][::-1]
+
+def order_paths(paths : list[np.ndarray],closed : list[bool],start=(0.0,0.0)):
+    # 返回 [(路径序号, 起点顶点序号, 是否反向)], 优化前空程, 优化后空程
+    n = len(paths)
+    start = np.asarray(start,dtype=np.float64)
+    if n == 0: return [],0.0,0.0
+
+    before = travel_length(start,np.array([p[0] for p in paths]),
+                           np.array([p[0] if c else p[-1] for p,c in zip(paths,closed)]))
+
+    # 候选入口：开放路径取两个端点，闭合路径取全部顶点
+    points,owners,vertex = [],[],[]
+    for i,(p,c) in enumerate(zip(paths,closed)):
+        idx = np.arange(len(p)) if c else np.array([0,len(p) - 1])
+        points.append(p[idx])
+        owners.append(np.full(len(idx),i))
+        vertex.append(idx)
+    points = np.concatenate(points)
+    owners = np.concatenate(owners)
+    vertex = np.concatenate(vertex)
+    grid = PointGrid(points,owners)
+
+    alive = np.ones(n,dtype=bool)
+    order = np.empty(n,dtype=np.int64)
+    starts = np.empty(n,dtype=np.int64)
+    entries = np.empty((n,2))
+    exits = np.empty((n,2))
+    p = start
+    for k in range(n):
+        c = grid.nearest(p,alive)
+        i = owners[c]
+        alive[i] = False
+        order[k] = i
+        starts[k] = vertex[c]
+        entries[k] = points[c]
+        if closed[i]: exits[k] = points[c]
+        else: exits[k] = paths[i][-1] if vertex[c] == 0 else paths[i][0]
+        p = exits[k]
+
+    # 最近邻得到的方向：开放路径从末端进入即为反向
+    reverse = np.array([not closed[i] and starts[k] != 0 for k,i in enumerate(order)])
+    perm = np.arange(n)
+    two_opt(start,entries,exits,perm,reverse)
+    order,starts = order[perm],starts[perm]
+
+    after = travel_length(start,entries,exits)
+    result = []
+    for i,s,r in zip(order.tolist(),starts.tolist(),reverse.tolist()):
+        if closed[i]: result.append((i,s,False))
+        else: result.append((i,0,r))
+    return result,before,after
+
+def arrange_path(path : np.ndarray,closed : bool,start : int,reverse : bool) -> np.ndarray:
+    # 按排序结果重排顶点：闭合路径从start起刀并回到起点，开放路径按需反向
+    if closed: return np.vstack((path[start:],path[:start],path[start:start + 1]))
+    return path[::-1] if reverse else path
@@ -0,0 +1,148 @@
+import numpy as np
+from .toolpath import OP_RAPID,OP_ON,OP_OFF,OP_END,OP_DWELL,MOTIONS
+from .estimate import ACCELERATION,segment_lengths,modal_speed,plan_motion,profile_distance
+
+# 模拟器的时间轴回放：工具路径一次换算成带起始时间的运动段数组，运动模型与 estimate 相同(共线的连续段之间不减速)。
+# 每帧只推进播放时间，二分查找当前所在的段并计算段内位置，与路径长度无关；
+# 可以暂停、跳转到任意时间，并按1~1000倍速播放
+
+
+# 每段：起始时间、起点、终点、路径长度、进给速度F(毫米/分)、功率，
+# 以及所在一串连续段的速度曲线：本段起点相对串起点的时间和距离、串长、加速时间、匀速时间、峰值速度(毫米/秒)、加速度
+SEGMENT = np.dtype([('time',np.float64),('x0',np.float32),('y0',np.float32),('x1',np.float32),('y1',np.float32),('length',np.float32),('feed',np.float32),
+                    ('power',np.float32),('elapsed',np.float64),('offset',np.float64),('total',np.float64),
+                    ('ramp',np.float32),('cruise',np.float32),('peak',np.float32),('acceleration',np.float32)])
+
+MIN_RATE = 1.0
+MAX_RATE = 1000.0
+
+class Playback:
+    # 按加工顺序依次extend每段工具路径，len()为未播放完的段数，与 USBController.steps 的用法一致
+    def __init__(self,acceleration=ACCELERATION,start=(0.0,0.0)):
+        self.acceleration = acceleration
+        self.segments = np.zeros(1024,dtype=SEGMENT)
+        # 起始时间另存一份连续数组，结构化数组的字段不连续，searchsorted每次都要复制
+        self.times = np.zeros(1024,dtype=np.float64)
+        self.count = 0
+        # 时间轴终点和当前播放时间(秒)
+        self.end = 0.0
+        self.time = 0.0
+        self.rate = 1.0
+        self.playing = True
+        # 最后加入的指令执行后的位置、速度和激光功率
+        self.x,self.y = start
+        self.speed = 0.0
+        self.power = 0.0
+
+    def __len__(self):
+        return self.count - self.index() if self.time < self.end else 0
+
+    def extend(self,path : np.ndarray):
+        # 激光状态是模态的：开光、直线和圆弧带功率，关光和结束为0
+        op = path['op']
+        laser = np.isin(op,(OP_ON,OP_OFF,OP_END) + MOTIONS[1:])
+        value = np.where(np.isin(op,(OP_OFF,OP_END)),0,path['power'])
+        last = np.maximum.accumulate(np.where(laser,np.arange(len(path)),-1))
+        state = np.where(last >= 0,value[np.maximum(last,0)],self.power)
+        if len(path): self.power = float(state[-1])
+
+        keep = np.isin(op,MOTIONS + (OP_DWELL,))
+        rows = path[keep].copy()
+        if not len(rows): return
+        state = state[keep]
+
+        # 暂停停在上一条移动指令的终点
+        moving = rows['op'] != OP_DWELL
+        last = np.maximum.accumulate(np.where(moving,np.arange(len(rows)),-1))
+        x1 = np.where(last >= 0,rows['x'][np.maximum(last,0)],self.x)
+        y1 = np.where(last >= 0,rows['y'][np.maximum(last,0)],self.y)
+        rows['x'],rows['y'] = x1,y1
+
+        # 圆弧按直线模拟，时间按弧长计算，与估算一致
+        lengths = np.where(moving,segment_lengths(rows,(self.x,self.y)),0)
+        speed = modal_speed(rows['feed'],self.speed)
+        x0,y0 = np.r_[self.x,x1[:-1]],np.r_[self.y,y1[:-1]]
+        elapsed,durations,offset,total,ramp,cruise,peak = plan_motion(rows['op'],x0,y0,x1,y1,lengths,speed / 60,self.acceleration)
+        durations = np.where(moving,durations,rows['i'])
+
+        n = len(rows)
+        if self.count + n > len(self.segments):
+            segments = np.zeros(max(2 * len(self.segments),self.count + n),dtype=SEGMENT)
+            segments[:self.count] = self.segments[:self.count]
+            self.segments = segments
+            times = np.zeros(len(segments),dtype=np.float64)
+            times[:self.count] = self.times[:self.count]
+            self.times = times
+        new = self.segments[self.count:self.count + n]
+        new['time'] = self.times[self.count:self.count + n] = self.end + np.r_[0,np.cumsum(durations)[:-1]]
+        new['x0'],new['y0'] = x0,y0
+        new['x1'],new['y1'] = x1,y1
+        new['length'] = lengths
+        new['feed'] = speed
+        new['elapsed'],new['offset'],new['total'] = elapsed,offset,total
+        new['ramp'],new['cruise'],new['peak'] = ramp,cruise,peak
+        new['acceleration'] = self.acceleration
+        new['power'] = np.where(rows['op'] == OP_RAPID,0,np.where(moving,rows['power'],state))
+        self.count += n
+
+        self.end += float(durations.sum())
+        self.x,self.y = float(x1[-1]),float(y1[-1])
+        self.speed = float(speed[-1])
+
+    def index(self,time=None) -> int:
+        # 时间所在的段
+        time = self.time if time is None else time
+        return max(0,int(np.searchsorted(self.times[:self.count],time,side='right')) - 1)
+
+    def state(self,time=None):
+        # 返回时间点的(x, y, 功率)
+        time = self.time if time is None else time
+        if not self.count or time >= self.end: return self.x,self.y,self.power
+        segment = self.segments[self.index(time)]
+        # 在所在一串的速度曲线上求出走过的距离，再换算到本段内
+        t = max(0.0,time - float(segment['time'])) + float(segment['elapsed'])
+        s = profile_distance(t,*(float(segment[k]) for k in ('ramp','cruise','peak','acceleration'))) - float(segment['offset'])
+        length = float(segment['length'])
+        k = min(max(s / length,0.0),1.0) if length > 0 else 1.0
+        x = float(segment['x0']) + (float(segment['x1']) - float(segment['x0'])) * k
+        y = float(segment['y0']) + (float(segment['y1']) - float(segment['y0'])) * k
+        return x,y,float(segment['power'])
+
+    def trace(self,t0,t1):
+        # 时间区间[t0,t1]内走过的出光线段，返回(起点(n,2), 终点(n,2), 功率(n,))；
+        # 只读取区间内的段，首尾两段截取到区间端点
+        k0,k1 = self.index(t0),self.index(t1)
+        segments = self.segments[k0:k1 + 1]
+        starts = np.column_stack((segments['x0'],segments['y0']))
+        ends = np.column_stack((segments['x1'],segments['y1']))
+        if len(segments):
+            starts[0] = self.state(t0)[:2]
+            ends[-1] = self.state(t1)[:2]
+        burning = segments['power'] > 0
+        return starts[burning],ends[burning],segments['power'][burning]
+
+    def step(self,dt):
+        if self.playing: self.time = min(self.end,self.time + dt * self.rate)
+        return self.state()
+
+    def play(self): self.playing = True
+
+    def pause(self): self.playing = False
+
+    def seek(self,time):
+        self.time = min(max(0.0,time),self.end)
+
+    def scrub(self,fraction):
+        # 按进度(0~1)跳转
+        self.seek(fraction * self.end)
+
+    def set_rate(self,rate):
+        self.rate = min(max(rate,MIN_RATE),MAX_RATE)
+
+    def clear(self):
+        # 停在当前位置，丢弃未播放的指令，之后加入的指令立即播放
+        self.x,self.y,_ = self.state()
+        self.count = 0
+        self.end = self.time = 0.0
+        self.power = 0.0
+        self.playing = True
@@ -0,0 +1,139 @@
+from typing import Iterator
+import numpy as np
+from .toolpath import OP_RAPID,OP_LINE,OP_ON,OP_OFF,TOOLPATH,concat
+from .estimate import ACCELERATION
+
+# 位图扫描引擎：一次性用NumPy求出所有扫描行上功率相同的连续段，
+# 相同功率的像素合并为一段G1，功率为0的空白段用G0跳过
+
+
+def image_darkness(image : np.ndarray) -> np.ndarray:
+    # 灰度按透明度合成到白色背景后的黑度，0为白，1为黑
+    rgba = np.asarray(image,dtype=np.float32)
+    gray = rgba[...,:3] @ np.array([0.299,0.587,0.114],dtype=np.float32)
+    return (255 - gray) * rgba[...,3] / (255 * 255)
+
+def image_power(image : np.ndarray,power,precision=255) -> np.ndarray:
+    # 灰度映射为激光功率，越黑功率越大
+    # precision为灰度等级数，等级越少相邻像素越容易合并成一段
+    darkness = image_darkness(image)
+    levels = max(1,round(precision) - 1)
+    return np.rint(np.rint(darkness * levels) / levels * power).astype(np.int32)
+
+def scanline_runs(powers : np.ndarray):
+    # 返回所有非零功率段：行号、起始列、结束列(不含)、功率
+    h,w = powers.shape
+    edges = np.ones((h,w + 1),dtype=bool)
+    edges[:,1:w] = powers[:,1:] != powers[:,:-1]
+    rows,cols = np.nonzero(edges)
+
+    # 每行最后一个边界在第w列，因此每个起点的下一个边界必在同一行
+    starts = np.flatnonzero(cols < w)
+    ends = cols[starts + 1]
+    rows = rows[starts]
+    starts = cols[starts]
+    values = powers[rows,starts]
+
+    keep = values > 0
+    return rows[keep],starts[keep],ends[keep],values[keep]
+
+def scanline_points(rows : np.ndarray,cols : np.ndarray,shape,affine : np.ndarray) -> np.ndarray:
+    # (行,列边界)转换为加工坐标
+    h,w = shape
+    return np.column_stack((cols - w / 2,h / 2 - rows - 0.5)) @ affine[:,:2].T + affine[:,2]
+
+def crop_affine(affine : np.ndarray,shape,box) -> np.ndarray:
+    # 裁剪后的子图仍以自身中心为原点，把中心偏移并入平移量
+    h,w = shape
+    r0,r1,c0,c1 = box
+    dx = c0 + (c1 - c0) / 2 - w / 2
+    dy = h / 2 - r0 - (r1 - r0) / 2
+    cropped = affine.copy()
+    cropped[:,2] += affine[:,:2] @ np.array([dx,dy])
+    return cropped
+
+def overscan_distance(params,acceleration=ACCELERATION) -> float:
+    # 行首、行尾的引入/引出距离：手动设置的overscan优先，未设置(None)时取从静止加速到扫描速度的距离v²/(2a)，
+    # 速度F为毫米/分。引入段不出光，出光的部分都已达到扫描速度，行两端不会因为减速而烧得更深
+    if params['overscan'] is not None: return params['overscan']
+    speed = params['speed'] / 60
+    return speed * speed / (2 * acceleration)
+
+def compile_raster(powers : np.ndarray,affine : np.ndarray,speed,bidirectional=False,overscan=0.0) -> np.ndarray:
+    return compile_runs(*scanline_runs(powers),powers.shape,affine,speed,bidirectional,overscan)
+
+def compile_runs(rows,starts,ends,values,shape,affine : np.ndarray,speed,bidirectional=False,overscan=0.0,flip=False) -> np.ndarray:
+    # 按扫描行排好序的加工段(行号、起止列、功率)输出为工具路径，列可以是小数，坐标换算见 scanline_points
+    # flip为双向扫描时第一行是否反向，分段编译时用来与前一段衔接
+    if not len(rows): return np.zeros(0,dtype=TOOLPATH)
+
+    bounds = np.flatnonzero(np.r_[True,rows[1:] != rows[:-1],True])
+    first,last = bounds[:-1],bounds[1:] - 1
+    counts = np.diff(bounds)
+    lines = np.repeat(np.arange(len(first)),counts)
+
+    # 双向扫描时相邻的非空行交替方向，反向行从右往左依次加工各段
+    reverse = np.zeros(len(first),dtype=bool)
+    if bidirectional: reverse[0 if flip else 1::2] = True
+    backward = np.repeat(reverse,counts)
+    enter = np.where(backward,ends,starts)
+    leave = np.where(backward,starts,ends)
+    position = np.where(backward,last[lines] - np.arange(len(rows)),np.arange(len(rows)) - first[lines])
+
+    # 每行第一个加工的段，以及与前一段之间有空白、需要先快速移动的段
+    head = np.zeros(len(rows),dtype=bool)
+    head[np.where(reverse,last,first)] = True
+    gaps = np.zeros(len(rows),dtype=bool)
+    gaps[1:] = ~backward[1:] & (starts[1:] != ends[:-1])
+    gaps[:-1] |= backward[:-1] & (ends[:-1] != starts[1:])
+    gaps &= ~head
+
+    # 每条指令按(扫描行, 行内次序)排序：
+    # 0 G0到行首 | 1 M3 S0 | 2 引入段G1 S0 | 3+2p 段间G0 | 4+2p 段G1 | 末尾 引出段G1 S0、M5
+    n = len(first)
+    tail = 2 * counts.max() + 4
+    entry = np.where(reverse,ends[last],starts[first]).astype(np.float64)
+    parts = [
+        (lines[gaps],3 + 2 * position[gaps],OP_RAPID,rows[gaps],enter[gaps],0),
+        (lines,4 + 2 * position,OP_LINE,rows,leave,values),
+        (np.arange(n),np.ones(n,dtype=np.int64),OP_ON,rows[first],entry,0),
+        (np.arange(n),np.full(n,tail + 1),OP_OFF,rows[first],entry,0),
+    ]
+
+    # 所有行的引入、引出点一次算出：沿扫描方向在行首、行尾各外延overscan毫米
+    if overscan > 0:
+        margin = overscan / np.linalg.norm(affine[:,0])
+        sign = np.where(reverse,-1,1)
+        row_end = np.where(reverse,starts[first],ends[last]) + sign * margin
+        parts += [
+            (np.arange(n),np.zeros(n,dtype=np.int64),OP_RAPID,rows[first],entry - sign * margin,0),
+            (np.arange(n),np.full(n,2),OP_LINE,rows[first],entry,0),
+            (np.arange(n),np.full(n,tail),OP_LINE,rows[first],row_end,0),
+        ]
+    else:
+        parts.append((np.arange(n),np.zeros(n,dtype=np.int64),OP_RAPID,rows[first],entry,0))
+
+    line = np.concatenate([p[0] for p in parts])
+    order = np.lexsort((np.concatenate([p[1] for p in parts]),line))
+    path = np.zeros(len(line),dtype=TOOLPATH)
+    path['op'] = np.concatenate([np.full(len(p[0]),p[2]) for p in parts])[order]
+    points = scanline_points(np.concatenate([p[3] for p in parts]),np.concatenate([p[4] for p in parts]),shape,affine)[order]
+    path['x'] = points[:,0]
+    path['y'] = points[:,1]
+    path['feed'] = speed
+    path['power'] = np.concatenate([np.broadcast_to(p[5],len(p[0])) for p in parts])[order]
+    return path
+
+def stream_bands(bands,shape,affine : np.ndarray,speed,bidirectional=False,overscan=0.0) -> Iterator[np.ndarray]:
+    # 逐个行带编译超大位图，bands依次给出(行号范围, 列号范围, 功率数组)，shape为整幅图像的尺寸；
+    # 每个行带编译后立即返回，内存只与行带大小有关
+    flip = False
+    for (r0,r1),(c0,c1),powers in bands:
+        runs = scanline_runs(powers)
+        yield compile_runs(*runs,powers.shape,crop_affine(affine,shape,(r0,r1,c0,c1)),speed,bidirectional,overscan,flip)
+        # 双向扫描时下一段的第一行与本段最后一个非空行方向相反
+        lines = np.count_nonzero(np.diff(runs[0])) + 1 if len(runs[0]) else 0
+        flip ^= bool(bidirectional and lines % 2)
+
+def compile_bands(bands,shape,affine : np.ndarray,speed,bidirectional=False,overscan=0.0) -> np.ndarray:
+    return concat(stream_bands(bands,shape,affine,speed,bidirectional,overscan))
@@ -0,0 +1,85 @@
+from typing import Iterator
+import numpy as np
+from .raster import compile_raster,stream_bands,crop_affine,overscan_distance
+from .toolpath import z_step,concat
+
+# 浮雕分层引擎：黑度(位图灰度或模型深度图)一次量化为层号，越黑越深。第k层加工层号大于k的像素，
+# 各层只扫描自己的包围盒，空行不输出，每遍加工后下降pass_depth
+
+
+def depth_levels(darkness : np.ndarray,layers) -> np.ndarray:
+    # 每个像素需要加工的层数：黑度d(0~1)的像素参与第0..ceil(d*layers)-1层
+    levels = np.ceil(darkness * layers - 1e-6)
+    return np.clip(levels,0,layers).astype(np.uint8 if layers < 256 else np.uint16)
+
+def layer_boxes(levels : np.ndarray,layers) -> list:
+    # 各层的包围盒(行起止、列起止)，层是逐层嵌套的，只需每行、每列的最大层号
+    return extent_boxes(levels.max(axis=1),levels.max(axis=0),layers)
+
+def extent_boxes(row_max : np.ndarray,col_max : np.ndarray,layers) -> list:
+    boxes = []
+    for k in range(layers):
+        rows = np.flatnonzero(row_max > k)
+        cols = np.flatnonzero(col_max > k)
+        if not len(rows): break
+        boxes.append((rows[0],rows[-1] + 1,cols[0],cols[-1] + 1))
+    return boxes
+
+def compile_relief(darkness : np.ndarray,affine : np.ndarray,params) -> np.ndarray:
+    layers = max(1,round(params['layers']))
+    passes = max(1,round(params['passes']))
+    pass_depth = params['pass_depth']
+    power = round(params['power'])
+    scan = dict(bidirectional=params['bidirectional'],overscan=overscan_distance(params))
+
+    levels = depth_levels(darkness,layers)
+    chunks = []
+    steps = 0
+    for k,box in enumerate(layer_boxes(levels,layers)):
+        r0,r1,c0,c1 = box
+        mask = np.where(levels[r0:r1,c0:c1] > k,power,0).astype(np.int32)
+        raster = compile_raster(mask,crop_affine(affine,levels.shape,box),params['speed'],**scan)
+        for _ in range(passes):
+            chunks.append(raster)
+            if pass_depth: chunks.append(z_step(-pass_depth,params['speed']))
+            steps += 1
+
+    # 加工完成后抬回起始高度
+    if pass_depth and steps: chunks.append(z_step(pass_depth * steps,params['speed']))
+    return concat(chunks)
+
+def stream_relief_bands(bands,shape,affine : np.ndarray,params) -> Iterator[np.ndarray]:
+    # 超大位图的浮雕：bands(起始行, 结束行)逐个行带给出(起始行, 黑度数组)，可以多次调用；
+    # 每层每遍逐个行带返回工具路径，内存只与行带大小有关
+    layers = max(1,round(params['layers']))
+    passes = max(1,round(params['passes']))
+    pass_depth = params['pass_depth']
+    power = round(params['power'])
+    scan = dict(bidirectional=params['bidirectional'],overscan=overscan_distance(params))
+
+    # 第一遍只统计每行、每列的最大层号，得到各层的包围盒
+    row_max = np.zeros(shape[0],dtype=np.uint16)
+    col_max = np.zeros(shape[1],dtype=np.uint16)
+    for r0,darkness in bands(0,shape[0]):
+        levels = depth_levels(darkness,layers)
+        row_max[r0:r0 + len(levels)] = levels.max(axis=1)
+        np.maximum(col_max,levels.max(axis=0),out=col_max)
+
+    steps = 0
+    for k,(r0,r1,c0,c1) in enumerate(extent_boxes(row_max,col_max,layers)):
+        def masks():
+            for b0,darkness in bands(r0,r1):
+                a0,a1 = max(r0,b0),min(r1,b0 + len(darkness))
+                if a0 >= a1: continue
+                levels = depth_levels(darkness[a0 - b0:a1 - b0,c0:c1],layers)
+                yield (a0,a1),(c0,c1),np.where(levels > k,power,0).astype(np.int32)
+        for _ in range(passes):
+            # 每遍重新读取行带，不保留整层的工具路径
+            yield from stream_bands(masks(),shape,affine,params['speed'],**scan)
+            if pass_depth: yield z_step(-pass_depth,params['speed'])
+            steps += 1
+
+    if pass_depth and steps: yield z_step(pass_depth * steps,params['speed'])
+
+def compile_relief_bands(bands,shape,affine : np.ndarray,params) -> np.ndarray:
+    return concat(stream_relief_bands(bands,shape,affine,params))
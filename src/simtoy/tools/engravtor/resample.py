@@ -0,0 +1,45 @@
+import numpy as np
+
+# 重采样到加工点阵：机器实际加工的点距由density_x/density_y和元素的物理尺寸决定，
+# 与源图的像素数无关。编译前先把位图缩放到点阵大小，之后的半色调、扫描和时间估算都只处理这个最小的数组。
+# 面积平均(BOX)和Lanczos都由PIL完成，RGBA按预乘透明度缩放，黑度(见 image_darkness)在面积平均下保持不变
+
+
+def filters():
+    from PIL import Image
+    return {'area': Image.Resampling.BOX,'lanczos': Image.Resampling.LANCZOS}
+
+def dot_grid(size,affine : np.ndarray,density_x,density_y) -> tuple[int,int]:
+    # 加工点阵的(列数, 行数)：像素尺寸乘以每个像素的物理大小(毫米)，再除以点距
+    w,h = size
+    columns = w * np.linalg.norm(affine[:,0]) / max(density_x,1e-3)
+    rows = h * np.linalg.norm(affine[:,1]) / max(density_y,1e-3)
+    return max(1,round(columns)),max(1,round(rows))
+
+def resample(pixels : np.ndarray,grid,method='area') -> np.ndarray:
+    from PIL import Image
+    if pixels.shape[1::-1] == tuple(grid): return pixels
+    return np.asarray(Image.fromarray(pixels,'RGBA').resize(grid,filters()[method]))
+
+def resample_store(store,grid,method='area',band_pixels=1 << 24):
+    # 磁盘上的超大位图按输出行分段缩放，每段只读取它覆盖的源图行(加上滤波器半径)，
+    # 结果仍然太大时返回None，由编译器直接逐行带读取原图
+    from PIL import Image
+    from .tiles import TILED_PIXELS
+    columns,rows = grid
+    if columns * rows > TILED_PIXELS: return None
+
+    h,w = store.shape
+    scale = h / rows
+    # Lanczos缩小时的滤波半径为3个输出像素
+    margin = int(np.ceil(3 * max(scale,1))) + 1 if method == 'lanczos' else int(np.ceil(max(scale,1))) + 1
+    step = max(1,int(band_pixels // (w * max(scale,1))))
+    out = np.empty((rows,columns,4),dtype=np.uint8)
+    pixels = store.levels[0]
+    for o0 in range(0,rows,step):
+        o1 = min(rows,o0 + step)
+        y0,y1 = o0 * scale,o1 * scale
+        r0,r1 = max(0,int(y0) - margin),min(h,int(np.ceil(y1)) + margin)
+        im = Image.fromarray(np.asarray(pixels[r0:r1]),'RGBA')
+        out[o0:o1] = np.asarray(im.resize((columns,o1 - o0),filters()[method],box=(0,y0 - r0,w,y1 - r0)))
+    return out
@@ -0,0 +1,80 @@
+import numpy as np
+
+# 折线简化与圆弧拟合：先用Douglas-Peucker去掉多余顶点，
+# 再把连续落在同一圆上的顶点合并为一段G2/G3，减少串口传输和控制器规划的指令数
+
+
+def douglas_peucker(points : np.ndarray,tolerance) -> np.ndarray:
+    n = len(points)
+    if n < 3: return points
+
+    keep = np.zeros(n,dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0,n - 1)]
+    while stack:
+        a,b = stack.pop()
+        if b - a < 2: continue
+        seg = points[b] - points[a]
+        d = points[a + 1:b] - points[a]
+        # 到线段(而不是直线)的距离：越过线段两端折返的顶点也要保留
+        t = np.clip(d @ seg / max(seg @ seg,1e-300),0,1)
+        dist = np.hypot(*(d - t[:,None] * seg).T)
+        i = int(dist.argmax())
+        if dist[i] > tolerance:
+            m = a + 1 + i
+            keep[m] = True
+            stack.append((a,m))
+            stack.append((m,b))
+    return points[keep]
+
+def circle_through(p0,p1,p2):
+    # 三点定圆，三点共线时返回None
+    ax,ay = p1 - p0
+    bx,by = p2 - p0
+    d = 2 * (ax * by - ay * bx)
+    if abs(d) < 1e-12: return None
+    a2 = ax * ax + ay * ay
+    b2 = bx * bx + by * by
+    return p0 + np.array([(by * a2 - ay * b2) / d,(ax * b2 - bx * a2) / d])
+
+def fit_arc(points : np.ndarray,tolerance,max_radius):
+    # 判断points能否用一段圆弧代替，返回(圆心, 是否逆时针)或None
+    center = circle_through(points[0],points[len(points) // 2],points[-1])
+    if center is None: return None
+
+    radii = np.hypot(*(points - center).T)
+    r = radii[0]
+    if r > max_radius or np.abs(radii - r).max() > tolerance: return None
+
+    # 弦与圆弧之间的拱高也不能超过容差
+    chords = np.hypot(*np.diff(points,axis=0).T)
+    if (r - np.sqrt(np.maximum(r * r - chords * chords / 4,0))).max() > tolerance: return None
+
+    # 所有顶点必须沿同一方向绕圆心前进，且总转角不超过半圆
+    angles = np.unwrap(np.arctan2(*(points - center).T[::-1]))
+    steps = np.diff(angles)
+    if not ((steps > 0).all() or (steps < 0).all()): return None
+    if abs(angles[-1] - angles[0]) > np.pi: return None
+    return center,bool(steps[0] > 0)
+
+def fit_arcs(points : np.ndarray,tolerance,min_points=4,max_points=256,max_radius=1000.0):
+    # 返回依次加工的段：(终点序号, 圆心或None, 是否逆时针)
+    n = len(points)
+    moves = []
+    i = 0
+    while i < n - 1:
+        best = None
+        j = i + min_points - 1
+        while j < n and j - i < max_points:
+            arc = fit_arc(points[i:j + 1],tolerance,max_radius)
+            if arc is None: break
+            best = (j,) + arc
+            j += 1
+
+        if best:
+            moves.append(best)
+            i = best[0]
+        else:
+            moves.append((i + 1,None,False))
+            i += 1
+    return moves
@@ -0,0 +1,128 @@
+from typing import Iterator
+import numpy as np
+
+# 网格按Z分层切片：每个三角形只与它跨越的那几层求交，
+# 按层分批处理三角形，内存只与一批层的截面大小有关，与面数无关
+
+
+def load_mesh(filepath : str,matrix : np.ndarray,offset : np.ndarray):
+    # 读取网格并变换到加工坐标(毫米)，返回(顶点, 三角形)
+    # offset与Model一致：模型原点在包围盒中心、底面在z=0；matrix为元素变换(平移量为毫米)
+    import trimesh
+    mesh = trimesh.load(filepath,force='mesh',process=False)
+    vertices = np.asarray(mesh.vertices,dtype=np.float64) * 1000 + offset
+    vertices = vertices @ matrix[:3,:3].T + matrix[:3,3]
+    return vertices,np.asarray(mesh.faces,dtype=np.int64)
+
+def layer_heights(vertices : np.ndarray,pitch) -> np.ndarray:
+    # 层高取在每个体素的中间，避开顶面和底面
+    z0,z1 = vertices[:,2].min(),vertices[:,2].max()
+    count = max(int(np.floor((z1 - z0) / pitch)),1)
+    return z0 + (np.arange(count) + 0.5) * (z1 - z0) / count
+
+def intersect(triangles : np.ndarray,heights : np.ndarray) -> np.ndarray:
+    # 三角形与水平面的交线段，triangles为(n,3,3)，heights为(n,)，返回(n,2,2)
+    # 顶点恰好在平面上时按在平面上方处理，每个跨越平面的三角形恰有两条边与平面相交
+    d = triangles[:,:,2] - heights[:,None]
+    a = triangles
+    b = np.roll(triangles,-1,axis=1)
+    da = d
+    db = np.roll(d,-1,axis=1)
+    crosses = (da >= 0) != (db >= 0)
+    t = da / np.where(crosses,da - db,1)
+    points = a[:,:,:2] + (b[:,:,:2] - a[:,:,:2]) * t[:,:,None]
+    edges = np.argsort(~crosses,axis=1,kind='stable')[:,:2]
+    return np.take_along_axis(points,edges[:,:,None],axis=1)
+
+def orient(segments : np.ndarray,triangles : np.ndarray) -> np.ndarray:
+    # 交线段沿 z × 法向 的方向，实体在线段左侧：外轮廓逆时针、孔顺时针，相邻面的线段首尾相接
+    normals = np.cross(triangles[:,1] - triangles[:,0],triangles[:,2] - triangles[:,0])
+    d = segments[:,1] - segments[:,0]
+    flip = d[:,0] * -normals[:,1] + d[:,1] * normals[:,0] < 0
+    segments[flip] = segments[flip,::-1]
+    return segments
+
+def chain_segments(segments : np.ndarray,tolerance=1e-6) -> tuple[list[np.ndarray],list[bool]]:
+    # 把同一层的有向线段连接成折线，返回(折线列表, 是否闭合)
+    # 端点按tolerance量化后合并；每条线段的后继是起点等于自身终点的线段，用倍增法一次算出各条链的顺序
+    n = len(segments)
+    if not n: return [],[]
+    _,nodes = np.unique(np.round(segments.reshape(-1,2) / tolerance),axis=0,return_inverse=True)
+    nodes = nodes.reshape(-1,2)
+    keep = nodes[:,0] != nodes[:,1]
+    segments,nodes = segments[keep],nodes[keep]
+    n = len(segments)
+    if not n: return [],[]
+
+    head = np.full(nodes.max() + 1,-1)
+    head[nodes[:,0]] = np.arange(n)
+    succ = head[nodes[:,1]]
+    # 非流形处可能有多条线段指向同一后继，只保留一条
+    taken = np.zeros(n,dtype=bool)
+    valid = np.flatnonzero(succ >= 0)
+    _,first = np.unique(succ[valid],return_index=True)
+    taken[valid[first]] = True
+    succ = np.where(taken,succ,-1)
+
+    index = np.arange(n)
+    nxt = np.where(succ >= 0,succ,index)
+    # 环上的最小序号作为起点，在它前面断开，所有链都变成开链
+    label,jump = index.copy(),nxt.copy()
+    for _ in range(int(np.ceil(np.log2(n))) + 1):
+        label = np.minimum(label,label[jump])
+        jump = jump[jump]
+    # 开链跳到链尾后不再移动，仍在移动的是环
+    cut = (nxt[jump] != jump) & (succ == label)
+    cycle = np.zeros(n,dtype=bool)
+    cycle[succ[cut]] = True
+    nxt = np.where(cut,index,nxt)
+
+    # 倍增求每条线段到链尾的距离和所在链的链尾
+    dist = (nxt != index).astype(np.int64)
+    tail = nxt.copy()
+    for _ in range(int(np.ceil(np.log2(n))) + 1):
+        dist = dist + dist[tail]
+        tail = tail[tail]
+    order = np.lexsort((-dist,tail))
+    bounds = np.flatnonzero(np.r_[True,tail[order][1:] != tail[order][:-1],True])
+
+    paths,closed = [],[]
+    for a,b in zip(bounds[:-1],bounds[1:]):
+        chain = order[a:b]
+        is_cycle = bool(cycle[chain[0]])
+        points = segments[chain,0] if is_cycle else np.vstack((segments[chain,0],segments[chain[-1],1]))
+        if len(points) < (3 if is_cycle else 2): continue
+        paths.append(points)
+        closed.append(is_cycle)
+    return paths,closed
+
+def slice_mesh(vertices : np.ndarray,faces : np.ndarray,heights : np.ndarray,batch=32) -> Iterator[tuple[int,np.ndarray]]:
+    # 自下而上逐层返回(层号, 交线段(m,2,2))，线段方向见 orient
+    zmin = np.minimum.reduce([vertices[faces[:,k],2] for k in range(3)])
+    zmax = np.maximum.reduce([vertices[faces[:,k],2] for k in range(3)])
+    order = np.argsort(zmin,kind='stable')
+    zmin,zmax = zmin[order],zmax[order]
+
+    for start in range(0,len(heights),batch):
+        block = heights[start:start + batch]
+        # 三角形跨越平面h当且仅当 zmin < h <= zmax；zmin已排序，候选是前缀中zmax不低于本批最低层的部分
+        end = np.searchsorted(zmin,block[-1],side='left')
+        candidates = np.flatnonzero(zmax[:end] >= block[0])
+        if not len(candidates):
+            for k in range(len(block)): yield start + k,np.zeros((0,2,2))
+            continue
+
+        # 每个三角形跨越的层号范围 [k0,k1)
+        k0 = np.searchsorted(block,zmin[candidates],side='right')
+        k1 = np.searchsorted(block,zmax[candidates],side='right')
+        counts = k1 - k0
+        owner = np.repeat(candidates,counts)
+        layer = np.repeat(k0 - np.cumsum(np.r_[0,counts[:-1]]),counts) + np.arange(counts.sum())
+        triangles = vertices[faces[order[owner]]]
+        segments = orient(intersect(triangles,block[layer]),triangles)
+
+        sort = np.argsort(layer,kind='stable')
+        segments = segments[sort]
+        bounds = np.searchsorted(layer[sort],np.arange(len(block) + 1))
+        for k in range(len(block)):
+            yield start + k,segments[bounds[k]:bounds[k + 1]]
@@ -0,0 +1,239 @@
+from concurrent.futures import Future,ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+
+# 超大位图的磁盘存储：RGBA像素逐个行带解码后写入磁盘上的原始文件，通过内存映射按需读取。
+# 编译时逐个行带读取，显示时读取尺寸合适的多级缩略图(mip)，内存占用与图像大小无关。
+# 转换在后台线程进行(见 open_store)，存储目录按最近使用时间清理，总大小不超过 STORE_BYTES
+
+
+# 超过该像素数的位图使用磁盘存储
+TILED_PIXELS = 64 * 1024 * 1024
+# 显示纹理的最大边长
+MAX_TEXTURE = 4096
+# 存储目录的总大小上限，超出时删除最久未使用的图像
+STORE_BYTES = 16 * 1024 ** 3
+# 没有header.json(转换未完成)的目录超过该时间(秒)视为中断的转换
+STALE_SECONDS = 3600
+
+@contextmanager
+def open_large(filepath):
+    # 超大位图是预期的输入：只在打开它的期间解除PIL的解压炸弹限制(默认约1.79亿像素)，之后恢复，其他图像仍受保护
+    from PIL import Image
+    limit = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        with Image.open(filepath) as im:
+            yield im
+    finally:
+        Image.MAX_IMAGE_PIXELS = limit
+
+def raw_layout(im):
+    # 未压缩图像(BMP、PPM、未压缩TIFF的条带和分块)的数据布局：[(块范围, 数据偏移, rawmode, 行宽, 行序)]，
+    # 可以按行读取任意行带。PNG、JPEG、压缩的TIFF和调色板图像返回None
+    if im.mode in ('P','PA') or not im.tile: return None
+    from PIL import ImageMode
+    layout = []
+    for name,extents,offset,args in im.tile:
+        if name != 'raw': return None
+        rawmode,stride,orientation = (args,0,1) if isinstance(args,str) else (tuple(args) + (0,1))[:3]
+        x0,y0,x1,y1 = extents
+        if not stride:
+            # 未给出行宽时只处理与图像模式相同的字节对齐格式
+            mode = ImageMode.getmode(im.mode)
+            if rawmode != im.mode or mode.typestr[-2] not in 'uif': return None
+            stride = (x1 - x0) * len(mode.bands) * np.dtype(mode.typestr).itemsize
+        layout.append(((x0,y0,x1,y1),offset,rawmode,stride,orientation))
+    return layout
+
+def decode_bands(filepath,band=1024) -> Iterator[tuple[int,np.ndarray]]:
+    # 逐个行带解码为RGBA，返回(起始行, RGBA数组)。未压缩的图像每次只读取与行带相交的行；
+    # 其他格式PIL只能整体解码(第一次crop时)，内存中有一份源格式的完整图像(灰度每像素1字节，RGB为3字节)，
+    # 再逐个行带转换为RGBA，不在内存中保留完整的RGBA副本
+    with open_large(filepath) as im:
+        w,h = im.size
+        mode = im.mode
+        info = {k: v for k,v in im.info.items() if k == 'transparency'}
+        layout = raw_layout(im)
+        if layout is None:
+            for r0 in range(0,h,band):
+                yield r0,np.asarray(im.crop((0,r0,w,min(h,r0 + band))).convert('RGBA'))
+            return
+
+    from PIL import Image
+    with open(filepath,'rb') as f:
+        for r0 in range(0,h,band):
+            r1 = min(h,r0 + band)
+            image = Image.new(mode,(w,r1 - r0))
+            for (x0,y0,x1,y1),offset,rawmode,stride,orientation in layout:
+                a,b = max(y0,r0),min(y1,r1)
+                if a >= b: continue
+                # 倒序存放(BMP)时块内的行从下往上排列，行带的最后一行最先出现
+                f.seek(offset + (a - y0 if orientation > 0 else y1 - b) * stride)
+                data = f.read((b - a) * stride)
+                image.paste(Image.frombytes(mode,(x1 - x0,b - a),data,'raw',rawmode,stride,orientation),(x0,a - r0))
+            image.info.update(info)
+            yield r0,np.asarray(image.convert('RGBA'))
+
+def store_directory() -> Path:
+    return Path(os.environ.get('ENGRAVTOR_TILES',Path(tempfile.gettempdir()) / 'engravtor-tiles'))
+
+# 本进程打开的存储目录，清理时跳过
+opened = set()
+
+def prune_stores(limit=STORE_BYTES,keep=()):
+    # 按最近使用时间(header.json的修改时间)删除旧的存储，直到总大小不超过limit；
+    # 中断的转换(没有header.json且长时间未修改)直接删除，本进程打开的和keep中的目录保留
+    root = store_directory()
+    if not root.is_dir(): return
+    keep = {Path(directory).resolve() for directory in (*opened,*keep)}
+    stores = []
+    for directory in root.iterdir():
+        if not directory.is_dir() or directory.resolve() in keep: continue
+        header = directory / 'header.json'
+        try:
+            if not header.exists():
+                if time.time() - directory.stat().st_mtime > STALE_SECONDS: shutil.rmtree(directory,ignore_errors=True)
+                continue
+            size = sum(f.stat().st_size for f in directory.iterdir())
+            stores.append((header.stat().st_mtime,size,directory))
+        except OSError: continue
+    total = sum(size for _,size,_ in stores) + sum(f.stat().st_size for directory in keep if directory.is_dir() for f in directory.iterdir())
+    for _,size,directory in sorted(stores):
+        if total <= limit: break
+        # 先删除header.json，删除不完整时下次打开会重新转换
+        try: (directory / 'header.json').unlink()
+        except OSError: continue
+        shutil.rmtree(directory,ignore_errors=True)
+        total -= size
+
+class TileStore:
+    def __init__(self,directory,shape,digest):
+        self.directory = Path(directory)
+        opened.add(str(self.directory))
+        self.shape = tuple(shape)
+        self.digest = digest
+        self.levels = []
+        h,w = self.shape
+        while True:
+            self.levels.append(np.memmap(self.directory / f'level{len(self.levels)}.rgba',dtype=np.uint8,mode='r',shape=(h,w,4)))
+            if max(h,w) <= MAX_TEXTURE: break
+            h,w = -(-h // 2),-(-w // 2)
+
+    @classmethod
+    def open(cls,filepath,band=1024):
+        # 已转换过的图像直接复用，键为文件路径、大小和修改时间
+        stat = os.stat(filepath)
+        digest = hashlib.sha1(f'{os.path.abspath(filepath)}|{stat.st_size}|{stat.st_mtime_ns}'.encode()).hexdigest()
+        directory = store_directory() / digest
+        header = directory / 'header.json'
+        if header.exists():
+            # 更新使用时间，清理时保留最近使用的
+            os.utime(header)
+            return cls(directory,json.loads(header.read_text())['shape'],digest)
+
+        directory.mkdir(parents=True,exist_ok=True)
+        with open_large(filepath) as im:
+            w,h = im.size
+        # 转换只在第一次打开时进行，之后的显示和编译都只读取磁盘上的文件
+        level = np.memmap(directory / 'level0.rgba',dtype=np.uint8,mode='w+',shape=(h,w,4))
+        for r0,pixels in decode_bands(filepath,band):
+            level[r0:r0 + len(pixels)] = pixels
+        level.flush()
+
+        # 逐级2x2平均缩小，直到能作为显示纹理
+        k = 0
+        while max(level.shape[:2]) > MAX_TEXTURE:
+            k += 1
+            level = downsample(level,directory / f'level{k}.rgba',band)
+        header.write_text(json.dumps(dict(shape=[h,w])))
+        prune_stores(keep=(directory,))
+        return cls(directory,(h,w),digest)
+
+    def bands(self,start=0,stop=None,rows=1024,level=0):
+        # 逐个行带返回[start,stop)范围内的(起始行, RGBA数组)
+        pixels = self.levels[level]
+        stop = len(pixels) if stop is None else min(stop,len(pixels))
+        for r0 in range(start,stop,rows):
+            yield r0,np.asarray(pixels[r0:min(r0 + rows,stop)])
+
+    def mip(self,size=MAX_TEXTURE) -> np.ndarray:
+        # 最长边不超过size的最精细一级
+        for pixels in self.levels:
+            if max(pixels.shape[:2]) <= size: return pixels
+        return self.levels[-1]
+
+    def __getstate__(self):
+        # 传给子进程时只传路径，子进程重新映射文件
+        return dict(directory=str(self.directory),shape=self.shape,digest=self.digest)
+
+    def __setstate__(self,state):
+        self.__init__(state['directory'],state['shape'],state['digest'])
+
+# 后台转换的线程，多个图像依次转换，不同时占用磁盘
+converter = None
+converter_lock = threading.Lock()
+
+def open_store(filepath) -> Future:
+    # 在后台线程打开(第一次时转换)超大位图，返回结果为TileStore的Future，界面线程不等待转换
+    global converter
+    with converter_lock:
+        if converter is None: converter = ThreadPoolExecutor(max_workers=1,thread_name_prefix='tiles')
+    return converter.submit(TileStore.open,filepath)
+
+def mip_shape(shape) -> tuple:
+    # 最粗一级缩略图的(高, 宽)，与 TileStore.mip 的结果相同
+    h,w = shape
+    while max(h,w) > MAX_TEXTURE: h,w = -(-h // 2),-(-w // 2)
+    return h,w
+
+def downsample(pixels : np.ndarray,path,band=1024) -> np.ndarray:
+    h,w = pixels.shape[:2]
+    out = np.memmap(path,dtype=np.uint8,mode='w+',shape=(-(-h // 2),-(-w // 2),4))
+    band -= band % 2
+    for r0 in range(0,h,band):
+        block = np.asarray(pixels[r0:r0 + band],dtype=np.float32)
+        # 奇数边长时复制最后一行/列
+        block = np.pad(block,((0,len(block) % 2),(0,w % 2),(0,0)),mode='edge')
+        block = block.reshape(len(block) // 2,2,-1,2,4).mean(axis=(1,3))
+        out[r0 // 2:r0 // 2 + len(block)] = np.rint(block).astype(np.uint8)
+    out.flush()
+    return out
+
+def streamed(item) -> bool:
+    # 直接从磁盘编译的超大位图：工具路径逐个行带返回，不缓存，也不交给子进程(结果要整体传回)
+    return item.kind == 'Bitmap' and item.store is not None and not (item.params['engraving_mode'] == 'external' and item.params['relief'] == 'contour')
+
+def stream_tiled(item) -> Iterator[np.ndarray]:
+    # 逐个行带编译磁盘上的超大位图，半色调按行带衔接处理
+    from .raster import image_darkness,image_power,stream_bands,overscan_distance
+    params = item.params
+    store = item.store
+    scan = dict(bidirectional=params['bidirectional'],overscan=overscan_distance(params))
+    if params['engraving_mode'] == 'external':
+        from .relief import stream_relief_bands
+        bands = lambda start,stop: ((r0,image_darkness(pixels)) for r0,pixels in store.bands(start,stop))
+        yield from stream_relief_bands(bands,store.shape,item.affine,params)
+        return
+
+    def powers():
+        from .dither import Ditherer
+        ditherer = Ditherer(params['dither']) if params['dither'] != 'none' else None
+        for r0,pixels in store.bands():
+            if ditherer: band = np.where(ditherer(image_darkness(pixels)),round(params['power']),0).astype(np.int32)
+            else: band = image_power(pixels,params['power'],params['precision'])
+            yield (r0,r0 + len(band)),(0,band.shape[1]),band
+    yield from stream_bands(powers(),store.shape,item.affine,params['speed'],**scan)
+
+def compile_tiled(item) -> np.ndarray:
+    from .toolpath import concat
+    return concat(stream_tiled(item))
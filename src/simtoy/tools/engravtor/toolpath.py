@@ -0,0 +1,187 @@
+from typing import Iterable, Iterator
+from functools import lru_cache
+import numpy as np
+
+# 工具路径中间表示：每条指令一行的NumPy结构化数组，编译器、模拟器和串口发送共用，
+# 按行号O(1)访问，不再来回解析文本。只有发往串口和显示时才格式化为G代码文本。
+# 每行记录指令执行后的目标坐标、进给速度和功率，未用到的字段为0；G4的暂停秒数存放在i
+
+
+TOOLPATH = np.dtype([
+    ('op','u1'),
+    ('element','i4'),
+    ('x','f4'),('y','f4'),('z','f4'),
+    ('i','f4'),('j','f4'),
+    ('feed','f4'),
+    ('power','f4'),
+])
+
+OP_COMMENT = 0   # ; 元素名，i/j不为0时为路径排序前后的空程(毫米)
+OP_RAPID = 1     # G0
+OP_LINE = 2      # G1
+OP_CW = 3        # G2
+OP_CCW = 4       # G3
+OP_Z = 5         # G1 Z
+OP_ON = 6        # M3
+OP_OFF = 7       # M5
+OP_END = 8       # M2
+OP_ABS = 9       # G90
+OP_REL = 10      # G91
+OP_DWELL = 11    # G4
+
+CODES = ['','G0','G1','G2','G3','G1','M3','M5','M2','G90','G91','G4']
+MOTIONS = (OP_RAPID,OP_LINE,OP_CW,OP_CCW)
+
+def build(op,element=-1,x=0,y=0,z=0,i=0,j=0,feed=0,power=0) -> np.ndarray:
+    # 按广播规则一次生成多行，例如 build(OP_LINE,x=xs,y=ys,feed=800,power=powers)
+    fields = dict(op=op,element=element,x=x,y=y,z=z,i=i,j=j,feed=feed,power=power)
+    n = max(np.size(v) for v in fields.values())
+    rows = np.zeros(n,dtype=TOOLPATH)
+    for name,value in fields.items():
+        rows[name] = value
+    return rows
+
+def z_step(dz,feed) -> np.ndarray:
+    # 相对下降/抬升dz毫米，之后恢复绝对坐标；带进给速度，作业中第一条G1是Z移动时也有F
+    return build([OP_REL,OP_Z,OP_ABS],z=[0,dz,0],feed=feed)
+
+def concat(chunks : Iterable[np.ndarray]) -> np.ndarray:
+    chunks = list(chunks)
+    return np.concatenate(chunks) if chunks else np.zeros(0,dtype=TOOLPATH)
+
+class Toolpath:
+    # 可增长的工具路径，容量按倍数扩展，已有行的下标不变
+    def __init__(self,capacity=4096):
+        self.data = np.zeros(capacity,dtype=TOOLPATH)
+        self.size = 0
+
+    def __len__(self): return self.size
+
+    def __getitem__(self,key): return self.data[:self.size][key]
+
+    def extend(self,rows : np.ndarray):
+        if self.size + len(rows) > len(self.data):
+            data = np.zeros(max(len(self.data) * 2,self.size + len(rows)),dtype=TOOLPATH)
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+        self.data[self.size:self.size + len(rows)] = rows
+        self.size += len(rows)
+
+    def find(self,op,start=0,block=65536) -> int:
+        # 从start开始查找下一条op指令，分块查找避免每次扫描到末尾；找不到返回-1
+        while start < self.size:
+            hits = np.flatnonzero(self.data['op'][start:min(start + block,self.size)] == op)
+            if len(hits): return start + int(hits[0])
+            start += block
+        return -1
+
+class GcodeWriter:
+    # 把工具路径格式化为G代码文本，每行指令对应一行文本(comments为False时跳过注释)。
+    # 省略与上一行相同的模态字(G0/G1、X、Y、F、S)，连续调用时沿用之前的模态状态
+    def __init__(self,resolution=0.001,names=(),comments=True):
+        self.resolution = resolution
+        self.decimals = next((d for d in range(7) if abs(round(resolution,d) - resolution) < 1e-12),6)
+        self.names = names
+        self.comments = comments
+        # 扫描坐标大量重复，格式化结果按数值缓存
+        self.number = lru_cache(maxsize=1 << 16)(self.format)
+        self.reset()
+
+    def reset(self):
+        self.motion = None
+        self.x = self.y = self.f = self.s = None
+
+    def format(self,v) -> str:
+        s = f'{round(v / self.resolution) * self.resolution:.{self.decimals}f}'
+        if '.' in s: s = s.rstrip('0').rstrip('.')
+        return '0' if s == '-0' else s
+
+    def lines(self,path : np.ndarray) -> Iterator[str]:
+        number = self.number
+        columns = [path[name].tolist() for name in ('op','element','x','y','z','i','j','feed','power')]
+        for op,element,x,y,z,i,j,f,s in zip(*columns):
+            if op == OP_COMMENT:
+                if not self.comments: continue
+                if i or j: yield f'; 空程 {i:.1f}mm -> {j:.1f}mm'
+                else: yield f'; {self.names[element] if 0 <= element < len(self.names) else element}'
+                continue
+
+            code = CODES[op]
+            if op == OP_ABS:
+                # 绝对坐标恢复后不再确定当前状态，下一行输出完整的模态字
+                self.reset()
+                yield code
+                continue
+            if op in (OP_REL,OP_OFF,OP_END):
+                yield code
+                continue
+            if op == OP_DWELL:
+                yield f'{code} P{i:g}'
+                continue
+
+            words = []
+            if op == OP_ON:
+                words.append(code)
+            else:
+                if code != self.motion: words.append(code)
+                self.motion = code
+
+            if op in MOTIONS:
+                xs,ys = number(x),number(y)
+                arc = op in (OP_CW,OP_CCW)
+                if arc or xs != self.x: words.append('X' + xs)
+                if arc or ys != self.y: words.append('Y' + ys)
+                if arc: words += ['I' + number(i),'J' + number(j)]
+                self.x,self.y = xs,ys
+            elif op == OP_Z:
+                words.append('Z' + number(z))
+
+            if op not in (OP_RAPID,OP_ON) and (op != OP_Z or f):
+                fs = number(f)
+                if fs != self.f: words.append('F' + fs)
+                self.f = fs
+            if op not in (OP_RAPID,OP_Z):
+                ss = number(s)
+                if ss != self.s: words.append('S' + ss)
+                self.s = ss
+            yield ' '.join(words) if words else code
+
+def parse_gcode(text : str,x=0.0,y=0.0,feed=0.0,power=0.0) -> np.ndarray:
+    # 解析手工输入的G代码(对焦、走边框等)，x,y,feed,power为执行前的状态。
+    # 与模拟器一致，不带坐标的G0回到原点
+    rows = []
+    motion = OP_RAPID
+    for line in text.split('\n'):
+        words = line.split(';')[0].split()
+        if not words: continue
+
+        op = None
+        home = False
+        nx,ny,z,i,j = x,y,None,0.0,0.0
+        for word in words:
+            c,value = word[0],word[1:]
+            if word in ('G0','G00'): op = motion = OP_RAPID; home = True
+            elif word in ('G1','G01'): op = motion = OP_LINE
+            elif word in ('G2','G02'): op = motion = OP_CW
+            elif word in ('G3','G03'): op = motion = OP_CCW
+            elif word == 'G90': rows.append((OP_ABS,-1,x,y,0,0,0,feed,power))
+            elif word == 'G91': rows.append((OP_REL,-1,x,y,0,0,0,feed,power))
+            elif word == 'M3': op = OP_ON
+            elif word == 'M5': op = OP_OFF
+            elif word == 'M2': op = OP_END
+            elif c == 'X': nx = float(value); home = False
+            elif c == 'Y': ny = float(value); home = False
+            elif c == 'Z': z = float(value)
+            elif c == 'I': i = float(value)
+            elif c == 'J': j = float(value)
+            elif c == 'F': feed = float(value)
+            elif c == 'S': power = float(value)
+
+        if op is None and (nx != x or ny != y): op = motion
+        if z is not None and op in (None,OP_LINE,OP_RAPID) and nx == x and ny == y: op = OP_Z; home = False
+        if op is None and words[0][0] in 'FS': op = OP_LINE if motion == OP_LINE else None
+        if op is None: continue
+        if home: nx = ny = 0.0
+        x,y = nx,ny
+        rows.append((op,-1,x,y,z or 0.0,i,j,feed,power))
+    return np.array(rows,dtype=TOOLPATH)
@@ -0,0 +1,74 @@
+import os
+import sys
+import tempfile
+import types
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__),'..','src'))
+from simtoy.tools.engravtor.toolpath import OP_LINE,build
+from simtoy.tools.engravtor.cache import CompileCache,element_key
+from simtoy.tools.engravtor.job import BitmapSource
+
+PARAMS = dict(engraving_mode='stroke',power=60,speed=800,tolerance=0.05)
+AFFINE = np.array([[1.0,0,5],[0,1.0,5]])
+
+def vectors(**params):
+    return types.SimpleNamespace(kind='Vectors',lines=[np.array([[0,0],[10,0],[10,10]],dtype=np.float32)],params=dict(PARAMS,**params),affine=AFFINE.copy())
+
+def bitmap(pixels):
+    return types.SimpleNamespace(kind='Bitmap',source=BitmapSource(pixels,None,pixels.shape[1::-1]),params=dict(PARAMS),affine=AFFINE.copy())
+
+def path(rows):
+    return build(OP_LINE,x=np.arange(rows),feed=800,power=60)
+
+def test_key_changes_with_source_params_and_transform():
+    key = element_key(vectors())
+    assert element_key(vectors()) == key
+    assert element_key(vectors(power=61)) != key
+    item = vectors()
+    item.affine[0,2] += 0.001
+    assert element_key(item) != key
+    item = vectors()
+    item.lines[0][1,0] = 10.5
+    assert element_key(item) != key
+
+    pixels = np.zeros((8,8,4),dtype=np.uint8)
+    key = element_key(bitmap(pixels))
+    assert element_key(bitmap(pixels.copy())) == key
+    pixels[3,3] = 255
+    assert element_key(bitmap(pixels)) != key
+
+def test_hit_and_miss_on_param_change():
+    cache = CompileCache()
+    first,second = element_key(vectors()),element_key(vectors(speed=1000))
+    assert cache.get(first) is None
+    cache.put(first,path(3))
+    assert np.array_equal(cache.get(first),path(3))
+    assert cache.get(second) is None
+
+def test_lru_eviction_by_rows():
+    cache = CompileCache(max_rows=7)
+    cache.put('a',path(3))
+    cache.put('b',path(3))
+    # 读取a后b成为最久未使用的
+    assert cache.get('a') is not None
+    cache.put('c',path(3))
+    assert cache.get('b') is None and cache.get('a') is not None and cache.get('c') is not None
+    assert cache.rows == 6
+    # 超过容量的单个元素也保留
+    cache.put('d',path(10))
+    assert list(cache.entries) == ['d'] and cache.rows == 10
+
+def test_disk_cache_survives_restart():
+    with tempfile.TemporaryDirectory() as directory:
+        CompileCache(directory=directory).put('a',path(4))
+        cache = CompileCache(directory=directory)
+        assert np.array_equal(cache.get('a'),path(4))
+        assert cache.get('b') is None
+
+if __name__ == '__main__':
+    test_key_changes_with_source_params_and_transform()
+    test_hit_and_miss_on_param_change()
+    test_lru_eviction_by_rows()
+    test_disk_cache_survives_restart()
+    print('test')
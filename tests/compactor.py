@@ -0,0 +1,52 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__),'..','src'))
+from simtoy.tools.engravtor.toolpath import OP_RAPID,OP_LINE,OP_ON,OP_OFF,OP_DWELL,OP_CW,GcodeWriter,build,concat
+from simtoy.tools.engravtor.compactor import compact,merge_collinear,pulse_resolution
+from simtoy.tools.engravtor.estimate import Estimator
+
+def test_compact_keeps_dwell():
+    # 水晶内雕的点：G0到点位后暂停1毫秒，暂停时间不能被量化到脉冲分辨率
+    resolution = pulse_resolution('$222P1P400')
+    path = concat([build(OP_ON,power=50),
+                   build([OP_RAPID,OP_DWELL] * 3,x=[1,1,2,2,3,3],y=0,i=[0,0.001] * 3,feed=800,power=[0,50] * 3),
+                   build(OP_OFF)])
+    path = compact(path,resolution)
+    dwell = path[path['op'] == OP_DWELL]
+    assert len(dwell) == 3
+    assert np.allclose(dwell['i'],0.001)
+    lines = list(GcodeWriter(resolution).lines(path))
+    assert lines.count('G4 P0.001') == 3
+
+    estimator = Estimator()
+    estimator.add(path)
+    assert estimator.time > 0.003 - 1e-9
+
+def test_compact_rounds_arc_offsets():
+    resolution = pulse_resolution('$222P1P400')
+    path = compact(build(OP_CW,x=2,y=0,i=1.0011,j=0.0004,feed=800,power=50),resolution)
+    assert np.isclose(path['i'][0],1.0)
+    assert np.isclose(path['j'][0],0.0)
+
+def test_merge_collinear_keeps_power_and_feed_changes():
+    # 共线同向、功率和速度相同的中间点去掉，偏离不超过半个脉冲的点也去掉
+    line = lambda x,y,feed=800,power=50: build(OP_LINE,x=x,y=y,feed=feed,power=power)
+    path = concat([build(OP_RAPID,x=0,y=0),line([1,2,3,4],[0,0.0004,0,0])])
+    assert merge_collinear(path,0.001)[['x','y']].tolist() == [(0,0),(4,0)]
+    # 功率或速度改变的点是两段的分界，不能去掉
+    for changed in (dict(power=[50,80,80]),dict(feed=[800,600,600])):
+        path = concat([build(OP_RAPID,x=0,y=0),build(OP_LINE,x=[1,2,3],y=0,**dict(dict(feed=800,power=50),**changed))])
+        assert merge_collinear(path,0.001)['x'].tolist() == [0,1,3]
+    # 折返和偏离超过半个脉冲的点保留
+    path = concat([build(OP_RAPID,x=0,y=0),line([2,1],[0,0])])
+    assert len(merge_collinear(path,0.001)) == 3
+    path = concat([build(OP_RAPID,x=0,y=0),line([1,2],[0.001,0])])
+    assert len(merge_collinear(path,0.001)) == 3
+
+if __name__ == '__main__':
+    test_compact_keeps_dwell()
+    test_compact_rounds_arc_offsets()
+    test_merge_collinear_keeps_power_and_feed_changes()
+    print('test')
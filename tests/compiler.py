@@ -0,0 +1,74 @@
+import os
+import sys
+import types
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__),'..','src'))
+# 与进程池的子进程一样只导入编译用到的模块(见 compile_worker)，spawn重新导入本文件时也不加载GTK和pygfx
+import compile_worker
+compile_worker.initialize()
+from simtoy.tools.engravtor.toolpath import OP_COMMENT,concat
+from simtoy.tools.engravtor.job import Job,BitmapSource
+from simtoy.tools.engravtor import compiler
+
+PARAMS = dict(excutable=True,power=60,speed=800,simplify=False,path_order=True,precision=8,bidirectional=True,overscan=None,
+              dither='none',resample='none',density_x=0.1,density_y=0.1,layers=3,relief='depth')
+
+def matrix(x,y,scale=1.0):
+    m = np.eye(4)
+    m[0,0] = m[1,1] = scale
+    m[:2,3] = x / 1000,y / 1000
+    return m
+
+class Vectors:
+    def __init__(self,name,lines,x,y):
+        self.name = name
+        self.params = dict(PARAMS,engraving_mode='stroke')
+        self.local = types.SimpleNamespace(matrix=matrix(x,y))
+        self.lines = [types.SimpleNamespace(geometry=types.SimpleNamespace(positions=types.SimpleNamespace(data=np.column_stack((p / 1000,np.zeros(len(p))))))) for p in lines]
+
+class Bitmap:
+    def __init__(self,name,pixels,x,y,**params):
+        self.name = name
+        self.params = dict(PARAMS,engraving_mode='fill',**params)
+        self.local = types.SimpleNamespace(matrix=matrix(x,y,0.1))
+        self.size = pixels.shape[1::-1]
+        self.source = BitmapSource(pixels,None,self.size)
+
+def objects():
+    rng = np.random.default_rng(6)
+    items = []
+    for k in range(6):
+        if k % 2:
+            lines = [rng.random((int(rng.integers(3,30)),2)) * 20 for _ in range(int(rng.integers(1,20)))]
+            items.append(Vectors(f'线条{k}',lines,k * 5,0))
+        else:
+            # 第一个元素最大，在本进程编译，后面的元素在进程池中先完成
+            pixels = rng.integers(0,256,(200 if k == 0 else 20,150 if k == 0 else 30,4),dtype=np.uint8)
+            pixels[...,3] = 255
+            items.append(Bitmap(f'位图{k}',pixels,0,k * 5,dither='floyd' if k == 2 else 'none'))
+    return items
+
+def test_parallel_merge_keeps_job_order():
+    # 单核机器上也走进程池
+    os.cpu_count = lambda: 4
+    compiler.cache.clear()
+    serial = concat(compiler.compile_toolpath(Job(objects()),parallel=False))
+    compiler.cache.clear()
+    parallel = concat(compiler.compile_toolpath(Job(objects()),parallel=True))
+    assert compiler.executor is not None
+    assert np.array_equal(parallel,serial)
+
+    # 元素按加工顺序排列：元素名注释(i/j为0)标出元素的开始，之后的行都属于该元素
+    names = (parallel['op'] == OP_COMMENT) & (parallel['i'] == 0) & (parallel['j'] == 0)
+    marks = parallel[names & (parallel['element'] >= 0)]['element']
+    assert list(marks) == list(range(6))
+    tagged = parallel['element'][parallel['element'] >= 0]
+    assert np.all(np.diff(tagged) >= 0)
+
+    # 再次编译全部命中缓存，结果相同
+    assert np.array_equal(concat(compiler.compile_toolpath(Job(objects()),parallel=True)),serial)
+
+if __name__ == '__main__':
+    test_parallel_merge_keeps_job_order()
+    print('test')
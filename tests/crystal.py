@@ -0,0 +1,57 @@
+import os
+import sys
+import tempfile
+import types
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__),'..','src'))
+from simtoy.tools.engravtor.toolpath import OP_DWELL,OP_Z
+from simtoy.tools.engravtor.crystal import compile_crystal,nearest_walk
+
+PARAMS = dict(pitch=0.5,power=80,dwell=2,speed=600)
+
+def box_item(directory,size,fill):
+    # 边长size毫米的立方体，模型文件以米为单位
+    import trimesh
+    filepath = os.path.join(directory,'box.stl')
+    trimesh.creation.box(extents=[size / 1000] * 3).export(filepath)
+    return types.SimpleNamespace(params=dict(PARAMS,crystal_fill=fill),filepath=filepath,matrix=np.eye(4),offset=np.zeros(3))
+
+def layers(path):
+    # 每层的激光点(n,2)，层之间以Z移动分开
+    z = np.cumsum(np.where(path['op'] == OP_Z,path['z'],0))
+    dots = path['op'] == OP_DWELL
+    return [np.column_stack((path['x'][dots & (z == h)],path['y'][dots & (z == h)])) for h in np.unique(z[dots])]
+
+def test_solid_and_surface_point_counts():
+    with tempfile.TemporaryDirectory() as directory:
+        # 4毫米立方体、间距0.5：8层，每层8x8个体素
+        solid = layers(compile_crystal(box_item(directory,4,'solid')))
+        assert [len(points) for points in solid] == [64] * 8
+        surface = layers(compile_crystal(box_item(directory,4,'surface')))
+        # 表面模式：顶层和底层全部保留，中间各层只保留外圈28个
+        assert [len(points) for points in surface] == [64] + [28] * 6 + [64]
+        for points in solid + surface:
+            assert len(np.unique(points,axis=0)) == len(points)
+            assert np.all(np.abs(points) < 2)
+
+def test_nearest_walk_visits_every_point_once():
+    rng = np.random.default_rng(4)
+    mask = rng.random((40,50)) < 0.3
+    mask[10:20,10:30] = True
+    rows,cols = nearest_walk(mask)
+    assert len(rows) == mask.sum()
+    assert np.array_equal(np.sort(rows * 50 + cols),np.flatnonzero(mask))
+
+    # 只要还有未加工的8邻域点，下一步就走到相邻的体素
+    visited = np.zeros_like(mask)
+    for k in range(len(rows) - 1):
+        visited[rows[k],cols[k]] = True
+        r,c = rows[k],cols[k]
+        around = mask[max(r - 1,0):r + 2,max(c - 1,0):c + 2] & ~visited[max(r - 1,0):r + 2,max(c - 1,0):c + 2]
+        if around.any(): assert max(abs(rows[k + 1] - r),abs(cols[k + 1] - c)) == 1
+
+if __name__ == '__main__':
+    test_solid_and_surface_point_counts()
+    test_nearest_walk_visits_every_point_once()
+    print('test')
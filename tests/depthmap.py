@@ -0,0 +1,47 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__),'..','src'))
+from simtoy.tools.engravtor.depthmap import DepthGrid,rasterize,model_depth
+
+def quad(x0,y0,x1,y1,z):
+    vertices = np.array([[x0,y0,z],[x1,y0,z],[x1,y1,z],[x0,y1,z]],dtype=float)
+    return vertices,np.array([[0,1,2],[0,2,3]])
+
+def merge(*meshes):
+    vertices,faces,n = [],[],0
+    for v,f in meshes:
+        vertices.append(v)
+        faces.append(f + n)
+        n += len(v)
+    return np.vstack(vertices),np.vstack(faces)
+
+def test_zbuffer_keeps_highest_surface():
+    # 两个重叠的水平面，重叠部分取高的一个，与三角形的先后顺序无关
+    low = quad(0,0,10,10,1.0)
+    high = quad(5,0,10,10,3.0)
+    for meshes in ((low,high),(high,low)):
+        vertices,faces = merge(*meshes)
+        grid = DepthGrid(vertices,1.0)
+        zbuf = rasterize(vertices,faces,grid)
+        assert grid.shape == (10,10)
+        assert np.allclose(zbuf[:,:5],1.0)
+        assert np.allclose(zbuf[:,5:],3.0)
+        # 分批写入z-buffer与一次写入结果相同
+        assert np.allclose(rasterize(vertices,faces,grid,budget=7),zbuf)
+
+def test_depth_interpolates_and_leaves_gaps():
+    # 斜面按重心插值；没有被覆盖的像素高度为0
+    ramp = (np.array([[0,0,0],[10,0,10],[10,4,10],[0,4,0]],dtype=float),np.array([[0,1,2],[0,2,3]]))
+    floor = quad(0,6,10,10,0.0)
+    vertices,faces = merge(ramp,floor)
+    heights,grid = model_depth(vertices,faces,1.0)
+    assert np.allclose(heights[-1],np.arange(10) + 0.5)
+    assert np.all(heights[4:6] == 0)
+    assert np.allclose(grid.affine(),[[1,0,5],[0,1,5]])
+
+if __name__ == '__main__':
+    test_zbuffer_keeps_highest_surface()
+    test_depth_interpolates_and_leaves_gaps()
+    print('test')
@@ -0,0 +1,34 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__),'..','src'))
+from simtoy.tools.engravtor.dither import dither,Ditherer
+
+def test_diffusion_preserves_mean_darkness():
+    # 误差扩散只搬运误差，整幅图的出光点比例接近平均黑度
+    darkness = np.tile(np.linspace(0,1,128),(96,1))
+    darkness[40:60] = 0.3
+    for method in ('floyd','jarvis','ordered'):
+        dots = dither(darkness,method)
+        assert dots.dtype == bool and dots.shape == darkness.shape
+        assert abs(dots.mean() - darkness.mean()) < 0.01, method
+        # 局部灰度也保持：均匀区域内的点密度接近该区域的黑度
+        assert abs(dots[44:56,16:112].mean() - 0.3) < 0.02, method
+
+    # Atkinson只扩散6/8的误差，中间调偏浅，但不会比原图更黑
+    dots = dither(darkness,'atkinson')
+    assert darkness.mean() - 0.03 < dots.mean() <= darkness.mean()
+
+def test_bands_match_whole_image():
+    # 按行带处理并传递误差，与一次处理整幅图像得到相同的点
+    darkness = np.random.default_rng(0).random((90,70))
+    for method in ('floyd','jarvis','atkinson','ordered'):
+        ditherer = Ditherer(method)
+        bands = np.vstack([ditherer(darkness[r0:r0 + 16]) for r0 in range(0,90,16)])
+        assert np.array_equal(bands,dither(darkness,method)), method
+
+if __name__ == '__main__':
+    test_diffusion_preserves_mean_darkness()
+    test_bands_match_whole_image()
+    print('test')
@@ -0,0 +1,42 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__),'..','src'))
+from simtoy.tools.engravtor.toolpath import OP_RAPID,OP_LINE,OP_ON,OP_OFF,OP_DWELL,build,concat
+from simtoy.tools.engravtor.playback import Playback
+from simtoy.tools.engravtor.energy import deposit_tiles,predict_burn
+
+X_LIM,Y_LIM = (0,0.04),(0,0.02)
+
+def total_energy(playback,tile=1024):
+    # 网格上的能量乘以像素面积，pitch为光斑直径的一半
+    pitch = 0.1
+    return sum(energy.sum() for _,_,energy in deposit_tiles(playback,X_LIM,Y_LIM,0.2,pitch,tile)) * pitch * pitch
+
+def test_energy_matches_power_times_time():
+    # 加速度足够大时按进给速度匀速：G1 20毫米、F1200(20毫米/秒)、S50，出光1秒，能量0.5；之后原地停留0.2秒，能量0.1
+    playback = Playback(acceleration=1e9)
+    playback.extend(concat([build(OP_RAPID,x=-10,y=-2,feed=60000),build(OP_ON,power=50),
+                            build(OP_LINE,x=10,y=3,feed=60 * np.hypot(20,5),power=50),
+                            build(OP_DWELL,i=0.2),build(OP_OFF)]))
+    assert np.isclose(playback.end - playback.times[1],1.2,atol=1e-3)
+    assert np.isclose(total_energy(playback),0.6,rtol=1e-3)
+    # 分块计算与整体计算相同
+    assert np.isclose(total_energy(playback,tile=37),total_energy(playback))
+
+def test_power_scales_burn():
+    darkness = []
+    for power in (20,80):
+        playback = Playback(acceleration=1e9)
+        playback.extend(concat([build(OP_RAPID,x=-10,y=0,feed=60000),build(OP_ON,power=power),
+                                build(OP_LINE,x=10,y=0,feed=12000,power=power),build(OP_OFF)]))
+        darkness.append(predict_burn(playback,X_LIM,Y_LIM,0.2,'木板-100x100'))
+    assert darkness[0].max() < darkness[1].max() <= 1
+    # 线段以外不变色
+    assert darkness[1][:50].max() == 0
+
+if __name__ == '__main__':
+    test_energy_matches_power_times_time()
+    test_power_scales_burn()
+    print('test')
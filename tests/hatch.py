@@ -0,0 +1,49 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__),'..','src'))
+from simtoy.tools.engravtor.toolpath import OP_LINE
+from simtoy.tools.engravtor.hatch import compile_hatch
+
+PARAMS = dict(density_y=0.5,power=60,speed=800,bidirectional=True,overscan=0.0,hatch_angle=0.0)
+SQUARE = np.array([[0,0],[10,0],[10,10],[0,10]],dtype=float)
+
+def runs(path):
+    # 出光段的(起点, 终点)，起点为上一条指令的终点
+    i = np.flatnonzero((path['op'] == OP_LINE) & (path['power'] > 0))
+    xy = np.column_stack((path['x'],path['y']))
+    return xy[i - 1],xy[i]
+
+def test_hatch_spacing_and_length():
+    start,end = runs(compile_hatch([SQUARE],PARAMS))
+    assert len(start) == 20
+    assert np.allclose(np.linalg.norm(end - start,axis=1),10)
+    # 扫描线水平，相邻两行相距density_y
+    assert np.allclose(start[:,1],end[:,1])
+    assert np.allclose(-np.diff(start[:,1]),0.5)
+
+def test_hatch_angle_rotates_runs():
+    for angle in (30.0,90.0):
+        start,end = runs(compile_hatch([SQUARE],dict(PARAMS,hatch_angle=angle)))
+        direction = (end - start) / np.linalg.norm(end - start,axis=1)[:,None]
+        theta = np.radians(angle)
+        assert np.allclose(np.abs(direction @ [np.cos(theta),np.sin(theta)]),1)
+        # 相邻扫描线沿法向相距density_y
+        normal = np.array([-np.sin(theta),np.cos(theta)])
+        offsets = np.unique(np.round(start @ normal,6))
+        assert np.allclose(np.diff(offsets),0.5)
+
+def test_hatch_skips_holes():
+    # 奇偶规则：中间的孔不加工，穿过孔的扫描线分成两段
+    hole = np.array([[3,3],[7,3],[7,7],[3,7]],dtype=float)
+    start,end = runs(compile_hatch([SQUARE,hole],PARAMS))
+    assert np.isclose(np.linalg.norm(end - start,axis=1).sum(),20 * 10 - 8 * 4)
+    middle = np.abs(start[:,1] - 5) < 2
+    assert np.count_nonzero(middle) == 16
+
+if __name__ == '__main__':
+    test_hatch_spacing_and_length()
+    test_hatch_angle_rotates_runs()
+    test_hatch_skips_holes()
+    print('test')
@@ -0,0 +1,41 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__),'..','src'))
+from simtoy.tools.engravtor.isolines import iso_contours
+
+def area(points):
+    x,y = points[:,0],points[:,1]
+    return 0.5 * np.sum(x * np.roll(y,-1) - np.roll(x,-1) * y)
+
+def test_isolines_are_closed_per_layer():
+    # 嵌套的三层，最深一层贴着图像边缘：每层都是闭合轮廓，面积为该层像素数减去四个切角
+    levels = np.zeros((20,30),dtype=np.uint8)
+    levels[2:18,2:28] = 1
+    levels[5:15,5:15] = 2
+    levels[0:4,24:30] = 3
+    contours = iso_contours(levels,3)
+    assert len(contours) == 3
+    for k,(paths,closed) in enumerate(contours):
+        assert all(closed)
+        pixels = np.count_nonzero(levels > k)
+        assert np.isclose(sum(area(p) for p in paths),pixels - 0.5 * len(paths)), k
+
+def test_holes_wind_the_other_way():
+    # 中间有孔的区域：外轮廓逆时针、孔顺时针，与模型切片的方向约定一致
+    levels = np.zeros((12,12),dtype=np.uint8)
+    levels[1:11,1:11] = 1
+    levels[4:8,4:8] = 0
+    (paths,closed), = iso_contours(levels,1)
+    assert closed == [True,True]
+    areas = sorted(area(p) for p in paths)
+    assert areas[0] < 0 < areas[1]
+    # 外轮廓和孔都切掉四个角，围成的面积仍等于区域的像素数
+    assert np.isclose(areas[1],100 - 0.5)
+    assert np.isclose(areas[0],-(16 - 0.5))
+
+if __name__ == '__main__':
+    test_isolines_are_closed_per_layer()
+    test_holes_wind_the_other_way()
+    print('test')
@@ -0,0 +1,46 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__),'..','src'))
+from simtoy.tools.engravtor.ordering import order_paths,arrange_path
+
+def travel(paths,start=(0.0,0.0)):
+    # 依次加工时的G0空程总长
+    p,total = np.asarray(start),0.0
+    for points in paths:
+        total += np.linalg.norm(points[0] - p)
+        p = points[-1]
+    return total
+
+def random_paths(rng,n):
+    paths,closed = [],[]
+    for k in range(n):
+        center = rng.random(2) * 100
+        if k % 2:
+            angles = np.linspace(0,2 * np.pi,7)[:-1]
+            paths.append(center + np.column_stack((np.cos(angles),np.sin(angles))) * rng.random() * 3)
+            closed.append(True)
+        else:
+            paths.append(center + np.cumsum(rng.normal(size=(5,2)),axis=0))
+            closed.append(False)
+    return paths,closed
+
+def test_ordering_never_adds_travel():
+    rng = np.random.default_rng(3)
+    for n in (2,10,200):
+        paths,closed = random_paths(rng,n)
+        order,before,after = order_paths(paths,closed)
+        assert sorted(i for i,_,_ in order) == list(range(n))
+        assert after <= before + 1e-9
+        original = [np.vstack((p,p[:1])) if c else p for p,c in zip(paths,closed)]
+        assert np.isclose(travel(original),before)
+        # 按排序结果重排后的实际空程与返回值一致，且每条路径的形状不变
+        arranged = [arrange_path(paths[i],closed[i],s,r) for i,s,r in order]
+        assert np.isclose(travel(arranged),after)
+        for (i,_,_),points in zip(order,arranged):
+            assert len(points) == len(paths[i]) + closed[i]
+
+if __name__ == '__main__':
+    test_ordering_never_adds_travel()
+    print('test')
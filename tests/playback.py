@@ -0,0 +1,82 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__),'..','src'))
+from simtoy.tools.engravtor.toolpath import OP_LINE,OP_DWELL,OP_ON,OP_OFF,build,concat
+from simtoy.tools.engravtor.playback import Playback
+from simtoy.tools.engravtor.estimate import Estimator
+
+def line(x,feed=600,power=50):
+    return concat([build(OP_ON,power=power),build(OP_LINE,x=x,y=0,feed=feed,power=power),build(OP_OFF,x=x)])
+
+def test_seek_follows_trapezoid_profile():
+    # 加速度10、F600(10毫米/秒)：加速1秒走5，匀速9秒走90，减速1秒走5
+    playback = Playback(acceleration=10)
+    playback.extend(line(100))
+    assert np.isclose(playback.end,11)
+    for time,x in ((0.5,1.25),(1,5),(5.5,50),(10,95),(10.5,98.75),(11,100)):
+        playback.seek(time)
+        px,py,power = playback.step(0)
+        assert np.isclose(px,x),(time,px)
+        assert py == 0
+        # 播放结束后停在终点，M5之后不出光
+        assert power == (50 if time < 11 else 0)
+
+    # 跳转限制在时间轴范围内，暂停时step不推进时间
+    playback.seek(-1)
+    assert playback.time == 0
+    playback.pause()
+    playback.step(3)
+    assert playback.time == 0
+    playback.play()
+    playback.set_rate(2)
+    assert np.isclose(playback.step(0.5)[0],5)
+
+def test_short_move_is_triangular_and_matches_estimate():
+    # 转向后距离不够加速到进给速度时只到峰值速度sqrt(L*a)，前后对称
+    path = concat([line(100),build(OP_LINE,x=100,y=2.5,feed=600,power=50)])
+    playback = Playback(acceleration=10)
+    playback.extend(path)
+    assert np.isclose(playback.end,12)
+    playback.seek(11.5)
+    assert np.allclose(playback.step(0)[:2],(100,1.25))
+
+    estimator = Estimator(acceleration=10)
+    estimator.add(path)
+    assert np.isclose(estimator.time,playback.end)
+
+    # 出光轨迹截取到查询区间的端点
+    starts,ends,powers = playback.trace(1,10)
+    assert np.allclose(starts,[[5,0]]) and np.allclose(ends,[[95,0]])
+    assert np.all(powers == 50)
+
+def test_collinear_segments_keep_speed():
+    # 同向、同速的连续段(例如扫描行内功率不同的段)交接处不减速，与一整段相同；换向或暂停要停下来
+    pieces = concat([build(OP_ON,power=50)] + [build(OP_LINE,x=x,y=0,feed=600,power=p) for x,p in ((30,50),(60,20),(100,80))] + [build(OP_OFF)])
+    playback = Playback(acceleration=10)
+    playback.extend(pieces)
+    assert np.isclose(playback.end,11)
+    for time,x in ((0.5,1.25),(5.5,50),(10.5,98.75)):
+        playback.seek(time)
+        assert np.isclose(playback.step(0)[0],x),(time,playback.step(0)[0])
+    playback.seek(5.5)
+    assert playback.step(0)[2] == 20
+
+    estimator = Estimator(acceleration=10)
+    estimator.add(pieces)
+    assert np.isclose(estimator.time,11)
+
+    # 折返：两段各自加减速
+    estimator = Estimator(acceleration=10)
+    estimator.add(concat([line(100),build(OP_LINE,x=0,y=0,feed=600,power=50)]))
+    assert np.isclose(estimator.time,22)
+    estimator = Estimator(acceleration=10)
+    estimator.add(concat([build(OP_LINE,x=50,y=0,feed=600),build(OP_DWELL,i=1),build(OP_LINE,x=100,y=0,feed=600)]))
+    assert np.isclose(estimator.time,2 * 6 + 1)
+
+if __name__ == '__main__':
+    test_seek_follows_trapezoid_profile()
+    test_short_move_is_triangular_and_matches_estimate()
+    test_collinear_segments_keep_speed()
+    print('test')
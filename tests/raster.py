@@ -0,0 +1,51 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__),'..','src'))
+from simtoy.tools.engravtor.toolpath import OP_RAPID,OP_LINE,OP_ON,OP_OFF
+from simtoy.tools.engravtor.raster import compile_raster,overscan_distance
+
+AFFINE = np.array([[1.0,0,0],[0,1.0,0]])
+
+def burns(path):
+    return path[(path['op'] == OP_LINE) & (path['power'] > 0)]
+
+def test_serpentine_alternates_direction():
+    powers = np.full((4,10),50,dtype=np.int32)
+    path = compile_raster(powers,AFFINE,800,bidirectional=True)
+    lines = burns(path)
+    assert len(lines) == 4
+    # 每行只有一段，偶数行从左往右，奇数行从右往左，相邻行首尾相接
+    assert np.allclose(lines['x'],[5,-5,5,-5])
+    assert np.all(np.diff(lines['y']) < 0)
+
+    lines = burns(compile_raster(powers,AFFINE,800,bidirectional=False))
+    assert np.allclose(lines['x'],5)
+
+def test_overscan_extends_both_ends_unlit():
+    powers = np.full((2,10),50,dtype=np.int32)
+    path = compile_raster(powers,AFFINE,800,bidirectional=True,overscan=2.0)
+    starts = np.flatnonzero(path['op'] == OP_RAPID)
+    assert np.allclose(path['x'][starts],[-7,7])
+    # 引入段和引出段都不出光，出光段在图像范围内
+    ends = np.flatnonzero(path['op'] == OP_OFF) - 1
+    assert np.allclose(path['x'][ends],[7,-7])
+    assert np.all(path['power'][ends] == 0)
+    assert np.all(path['power'][starts + 2] == 0)
+    assert np.all(np.abs(burns(path)['x']) <= 5)
+    assert np.count_nonzero(path['op'] == OP_ON) == 2
+
+def test_default_overscan_follows_speed():
+    # 未手动设置时为加速到扫描速度的距离，速度加倍距离变为4倍
+    slow = overscan_distance(dict(overscan=None,speed=1200))
+    fast = overscan_distance(dict(overscan=None,speed=2400))
+    assert slow > 0
+    assert np.isclose(fast,4 * slow)
+    assert overscan_distance(dict(overscan=1.5,speed=2400)) == 1.5
+
+if __name__ == '__main__':
+    test_serpentine_alternates_direction()
+    test_overscan_extends_both_ends_unlit()
+    test_default_overscan_follows_speed()
+    print('test')
@@ -0,0 +1,36 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__),'..','src'))
+from simtoy.tools.engravtor.toolpath import OP_Z
+from simtoy.tools.engravtor.relief import compile_relief
+from simtoy.tools.engravtor.contour import compile_layers
+
+PARAMS = dict(layers=4,passes=2,pass_depth=0.5,speed=800,power=60,bidirectional=True,overscan=0.0,
+              tolerance=0.05,simplify=False,path_order=False)
+
+def z_track(path):
+    # 每条Z移动之后的相对高度
+    return np.cumsum(path['z'][path['op'] == OP_Z])
+
+def test_depth_and_contour_reach_same_depth():
+    # 同样的层数、遍数和每遍下降量，深度分层和轮廓分层都每遍下降一次，加工到同一深度并抬回起点
+    darkness = np.tile(np.linspace(0.1,1,40),(8,1))
+    affine = np.array([[0.1,0,0],[0,-0.1,0]])
+    square = np.array([[0,0],[4,0],[4,4],[0,4]],dtype=float)
+    layers = [([square * (1 - k * 0.2)],[True]) for k in range(PARAMS['layers'])]
+    for path in (compile_relief(darkness,affine,PARAMS),compile_layers(layers,PARAMS)):
+        z = z_track(path)
+        assert np.isclose(z.min(),-PARAMS['layers'] * PARAMS['passes'] * PARAMS['pass_depth'])
+        assert np.isclose(z[-1],0)
+
+def test_contour_skips_empty_deep_layers():
+    square = np.array([[0,0],[4,0],[4,4],[0,4]],dtype=float)
+    layers = [([square],[True]),([],[]),([],[])]
+    assert np.isclose(z_track(compile_layers(layers,PARAMS)).min(),-PARAMS['passes'] * PARAMS['pass_depth'])
+
+if __name__ == '__main__':
+    test_depth_and_contour_reach_same_depth()
+    test_contour_skips_empty_deep_layers()
+    print('test')
@@ -0,0 +1,61 @@
+import os
+import sys
+import tempfile
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__),'..','src'))
+from simtoy.tools.engravtor.resample import dot_grid,resample,resample_store
+from simtoy.tools.engravtor.raster import image_darkness
+from simtoy.tools.engravtor.tiles import TileStore
+
+def rotation(angle,scale):
+    c,s = np.cos(angle) * scale,np.sin(angle) * scale
+    return np.array([[c,-s,0],[s,c,0]])
+
+def test_dot_grid_follows_physical_size():
+    # 200x100像素、每像素0.1毫米：20x10毫米，点距0.1毫米为200x100个点，与旋转无关
+    assert dot_grid((200,100),rotation(0,0.1),0.1,0.1) == (200,100)
+    assert dot_grid((200,100),rotation(0.7,0.1),0.1,0.1) == (200,100)
+    assert dot_grid((200,100),rotation(0,0.1),0.25,0.5) == (80,20)
+    # 不整除时四舍五入，至少一个点
+    assert dot_grid((200,100),rotation(0,0.1),0.3,0.3) == (67,33)
+    assert dot_grid((200,100),rotation(0,0.1),100,100) == (1,1)
+
+def test_resample_exact_grid():
+    rng = np.random.default_rng(2)
+    pixels = rng.integers(0,256,(123,77,4),dtype=np.uint8)
+    pixels[...,3] = 255
+    for grid in ((77,123),(40,61),(200,300),(1,1)):
+        for method in ('area','lanczos'):
+            out = resample(pixels,grid,method)
+            assert out.shape == (grid[1],grid[0],4) and out.dtype == np.uint8
+    # 点阵与原图相同时不复制
+    assert resample(pixels,(77,123)) is pixels
+    # 面积平均在整数倍缩小时保持黑度
+    out = resample(pixels,(7,41),'area')
+    assert np.isclose(image_darkness(out).mean(),image_darkness(pixels).mean(),atol=2e-3)
+
+def test_store_resample_matches_whole_image_across_bands():
+    # 磁盘存储按输出行分段缩放，每段多读滤波半径内的源图行，段与段的交界处与整体缩放相同
+    rng = np.random.default_rng(9)
+    gray = np.clip(np.linspace(0,255,997)[:,None] + rng.normal(0,30,(997,61)),0,255).astype(np.uint8)
+    with tempfile.TemporaryDirectory() as directory:
+        filepath = os.path.join(directory,'big.png')
+        Image.fromarray(gray).save(filepath)
+        os.environ['ENGRAVTOR_TILES'] = directory
+        store = TileStore.open(filepath,band=128)
+        pixels = np.asarray(store.levels[0])
+        for grid in ((61,997),(30,250),(45,613),(120,1500)):
+            for method in ('area','lanczos'):
+                # 很小的段，保证有很多段交界
+                banded = resample_store(store,grid,method,band_pixels=61 * 40)
+                whole = resample(pixels,grid,method)
+                assert banded.shape == whole.shape
+                assert np.abs(banded.astype(int) - whole).max() <= 1,(grid,method)
+
+if __name__ == '__main__':
+    test_dot_grid_follows_physical_size()
+    test_resample_exact_grid()
+    test_store_resample_matches_whole_image_across_bands()
+    print('test')
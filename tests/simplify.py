@@ -0,0 +1,74 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__),'..','src'))
+from simtoy.tools.engravtor.toolpath import OP_RAPID,OP_LINE,OP_CW,OP_CCW,MOTIONS
+from simtoy.tools.engravtor.simplify import douglas_peucker
+from simtoy.tools.engravtor.compiler import compile_paths
+
+PARAMS = dict(tolerance=0.05,simplify=True,path_order=False,speed=800,power=60)
+
+def circle(center,radius,n,ccw=True):
+    angles = np.linspace(0,2 * np.pi,n,endpoint=False) * (1 if ccw else -1)
+    return np.asarray(center) + radius * np.column_stack((np.cos(angles),np.sin(angles)))
+
+def moves(path):
+    # 出光的移动：(指令, 起点, 终点, I/J)，起点为上一条移动的终点
+    rows = path[np.isin(path['op'],MOTIONS)]
+    xy = np.column_stack((rows['x'],rows['y'])).astype(np.float64)
+    ij = np.column_stack((rows['i'],rows['j'])).astype(np.float64)
+    cutting = rows['op'] != OP_RAPID
+    return rows['op'][cutting],xy[np.flatnonzero(cutting) - 1],xy[cutting],ij[cutting]
+
+def distance_to_polyline(points,line):
+    # 每个点到折线的最近距离
+    a,b = line[:-1],line[1:]
+    ab = b - a
+    t = np.clip(np.einsum('pkd,kd->pk',points[:,None] - a,ab) / np.maximum((ab * ab).sum(axis=1),1e-12),0,1)
+    nearest = a + t[...,None] * ab
+    return np.linalg.norm(points[:,None] - nearest,axis=2).min(axis=1)
+
+def test_circle_becomes_arcs():
+    center = (5.0,3.0)
+    for ccw,op in ((True,OP_CCW),(False,OP_CW)):
+        ops,starts,ends,ij = moves(compile_paths([circle(center,10,72,ccw)],[True],PARAMS))
+        # 每段圆弧不超过半圆，整圆至少两段；逆时针为G3，顺时针为G2
+        assert 2 <= len(ops) < 10 and np.all(ops == op),ops
+        # I/J是圆心相对圆弧起点的偏移，起点和终点都在圆上
+        assert np.allclose(starts + ij,center,atol=PARAMS['tolerance'])
+        assert np.allclose(np.linalg.norm(ends - center,axis=1),10,atol=1e-4)
+        # 闭合路径回到起点
+        assert np.allclose(ends[-1],starts[0])
+
+def test_clockwise_polyline_becomes_g2():
+    # 顺时针的半圆弧折线(开放路径)，前后各接一段直线
+    arc = circle((0,0),20,64,ccw=False)[:33]
+    points = np.vstack(([[20,-30]],arc,[[-20,-30]]))
+    ops,starts,ends,ij = moves(compile_paths([points],[False],PARAMS))
+    assert list(ops) == [OP_LINE,OP_CW,OP_LINE]
+    assert np.allclose(starts[1] + ij[1],(0,0),atol=PARAMS['tolerance'])
+
+def test_simplify_stays_within_tolerance():
+    rng = np.random.default_rng(11)
+    points = np.cumsum(rng.normal(size=(500,2)) * [1,0.05],axis=0)
+    for tolerance in (0.01,0.1,1.0):
+        simplified = douglas_peucker(points,tolerance)
+        assert len(simplified) < len(points)
+        assert distance_to_polyline(points,simplified).max() <= tolerance + 1e-9
+        # 开放折线保留两端
+        assert np.array_equal(simplified[0],points[0]) and np.array_equal(simplified[-1],points[-1])
+
+def test_open_polyline_keeps_endpoints():
+    points = np.column_stack((np.linspace(0,10,50),np.sin(np.linspace(0,10,50)) * 0.01))
+    ops,starts,ends,_ = moves(compile_paths([points],[False],PARAMS))
+    # 几乎是直线：简化为一段G1，起点和终点不变
+    assert list(ops) == [OP_LINE]
+    assert np.allclose(starts[0],points[0]) and np.allclose(ends[-1],points[-1])
+
+if __name__ == '__main__':
+    test_circle_becomes_arcs()
+    test_clockwise_polyline_becomes_g2()
+    test_simplify_stays_within_tolerance()
+    test_open_polyline_keeps_endpoints()
+    print('test')
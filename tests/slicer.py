@@ -0,0 +1,42 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__),'..','src'))
+from simtoy.tools.engravtor.slicer import slice_mesh,chain_segments
+
+def box(x0,y0,z0,size):
+    # 立方体的顶点和朝外的三角面
+    corners = np.array([[x,y,z] for z in (0,1) for y in (0,1) for x in (0,1)],dtype=float)
+    faces = np.array([[0,2,1],[1,2,3],[4,5,6],[5,7,6],[0,1,4],[1,5,4],
+                      [2,6,3],[3,6,7],[0,4,2],[2,4,6],[1,3,5],[3,7,5]])
+    return corners * size + [x0,y0,z0],faces
+
+def area(points):
+    x,y = points[:,0],points[:,1]
+    return 0.5 * np.sum(x * np.roll(y,-1) - np.roll(x,-1) * y)
+
+def test_slices_chain_into_closed_loops():
+    # 两个分开的立方体：每层得到两个闭合、逆时针(实体在左侧)的正方形轮廓
+    v0,f0 = box(0,0,0,10)
+    v1,f1 = box(20,0,0,4)
+    vertices = np.vstack((v0,v1))
+    faces = np.vstack((f0,f1 + len(v0)))
+    heights = np.array([1.0,2.5,3.9])
+    layers = list(slice_mesh(vertices,faces,heights,batch=2))
+    assert [k for k,_ in layers] == [0,1,2]
+    for _,segments in layers:
+        paths,closed = chain_segments(segments)
+        assert closed == [True,True]
+        assert sorted(round(area(p),6) for p in paths) == [16,100]
+
+def test_open_chain_is_reported_open():
+    segments = np.array([[[0,0],[1,0]],[[1,0],[1,1]],[[1,1],[0,1]]],dtype=float)
+    paths,closed = chain_segments(segments)
+    assert closed == [False]
+    assert np.allclose(paths[0],[[0,0],[1,0],[1,1],[0,1]])
+
+if __name__ == '__main__':
+    test_slices_chain_into_closed_loops()
+    test_open_chain_is_reported_open()
+    print('test')
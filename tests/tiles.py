@@ -0,0 +1,91 @@
+import os
+import sys
+import tempfile
+import types
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__),'..','src'))
+from simtoy.tools.engravtor.tiles import TileStore,compile_tiled,open_large,open_store,decode_bands,raw_layout,prune_stores
+from simtoy.tools.engravtor.raster import image_darkness,image_power,compile_raster,overscan_distance
+from simtoy.tools.engravtor.relief import compile_relief
+from simtoy.tools.engravtor.dither import dither
+
+PARAMS = dict(engraving_mode='fill',power=60,precision=8,speed=1200,bidirectional=True,overscan=None,
+              dither='none',layers=3,passes=1,pass_depth=0.2,relief='depth')
+AFFINE = np.array([[0.1,0,0],[0,0.1,0]])
+
+def tiled_image(directory):
+    # 超过一个行带(1024行)的位图，行带交界处有内容，奇数行数
+    rng = np.random.default_rng(5)
+    gray = np.clip(np.linspace(0,255,2101)[:,None] + rng.normal(0,40,(2101,33)),0,255).astype(np.uint8)
+    gray[::7,::5] = 255
+    filepath = os.path.join(directory,'big.png')
+    Image.fromarray(gray).save(filepath)
+    os.environ['ENGRAVTOR_TILES'] = directory
+    store = TileStore.open(filepath)
+    with open_large(filepath) as im:
+        pixels = np.asarray(im.convert('RGBA'))
+    return store,pixels
+
+def test_bands_match_whole_image():
+    with tempfile.TemporaryDirectory() as directory:
+        store,pixels = tiled_image(directory)
+        assert np.array_equal(np.asarray(store.levels[0]),pixels)
+        item = lambda **params: types.SimpleNamespace(params=dict(PARAMS,**params),store=store,affine=AFFINE)
+        scan = dict(bidirectional=True,overscan=overscan_distance(PARAMS))
+
+        path = compile_tiled(item())
+        whole = compile_raster(image_power(pixels,60,8),AFFINE,1200,**scan)
+        assert np.array_equal(path,whole)
+
+        # 半色调在行带之间传递误差，与整幅图像一次处理相同
+        path = compile_tiled(item(dither='floyd'))
+        dots = np.where(dither(image_darkness(pixels),'floyd'),60,0).astype(np.int32)
+        assert np.array_equal(path,compile_raster(dots,AFFINE,1200,**scan))
+
+        path = compile_tiled(item(engraving_mode='external'))
+        whole = compile_relief(image_darkness(pixels),AFFINE,dict(PARAMS,engraving_mode='external'))
+        assert np.array_equal(path,whole)
+
+def test_uncompressed_image_decodes_by_band():
+    # BMP按行倒序存放，逐个行带读取的结果与整体解码相同
+    with tempfile.TemporaryDirectory() as directory:
+        rgb = np.random.default_rng(7).integers(0,256,(301,203,3),dtype=np.uint8)
+        filepath = os.path.join(directory,'big.bmp')
+        Image.fromarray(rgb).save(filepath)
+        with open_large(filepath) as im:
+            assert raw_layout(im) is not None
+            whole = np.asarray(im.convert('RGBA'))
+        bands = list(decode_bands(filepath,band=64))
+        assert [r0 for r0,_ in bands] == list(range(0,301,64))
+        assert np.array_equal(np.concatenate([pixels for _,pixels in bands]),whole)
+
+        # 后台转换得到同样的存储
+        os.environ['ENGRAVTOR_TILES'] = directory
+        store = open_store(filepath).result()
+        assert np.array_equal(np.asarray(store.levels[0]),whole)
+
+def test_prune_removes_least_recently_used():
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['ENGRAVTOR_TILES'] = directory
+        for k,name in enumerate(('old','new','current')):
+            os.makedirs(os.path.join(directory,name))
+            with open(os.path.join(directory,name,'level0.rgba'),'wb') as f: f.write(bytes(100))
+            header = os.path.join(directory,name,'header.json')
+            with open(header,'w') as f: f.write('{}')
+            os.utime(header,(1000 + k,1000 + k))
+        # 中断的转换
+        os.makedirs(os.path.join(directory,'broken'))
+        os.utime(os.path.join(directory,'broken'),(0,0))
+
+        prune_stores(limit=250,keep=(os.path.join(directory,'current'),))
+        assert sorted(os.listdir(directory)) == ['current','new']
+        prune_stores(limit=0,keep=(os.path.join(directory,'current'),))
+        assert os.listdir(directory) == ['current']
+
+if __name__ == '__main__':
+    test_bands_match_whole_image()
+    test_uncompressed_image_decodes_by_band()
+    test_prune_removes_least_recently_used()
+    print('test')
@@ -0,0 +1,39 @@
+import os
+import sys
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__),'..','src'))
+from simtoy.tools.engravtor.toolpath import GcodeWriter,z_step,parse_gcode,build,concat,OP_COMMENT,OP_RAPID,OP_LINE,OP_CCW,OP_ON,OP_OFF,OP_ABS
+
+def test_first_z_move_has_feed():
+    # 作业开头的Z移动之前没有设置过F，GRBL会拒绝不带F的G1
+    lines = list(GcodeWriter(0.0025).lines(z_step(-0.5,800)))
+    assert lines == ['G91','G1 Z-0.5 F800','G90']
+
+def test_manual_z_move_keeps_modal_feed():
+    lines = list(GcodeWriter(0.0025).lines(parse_gcode('G91\nG1 Z2\nG90\n',feed=200)))
+    assert lines[1] == 'G1 Z2 F200'
+
+def test_ordering_travel_comment():
+    # 路径排序前后的空程写在注释里，不带元素名
+    lines = list(GcodeWriter(0.0025,['线条']).lines(build(OP_COMMENT,element=0,i=30.56,j=10)))
+    assert lines == ['; 空程 30.6mm -> 10.0mm']
+
+def test_modal_words_are_elided():
+    writer = GcodeWriter(0.001)
+    path = concat([build(OP_RAPID,x=1,y=2),build(OP_ON,power=50),
+                   build(OP_LINE,x=[5,5,9],y=[2,6,6],feed=800,power=[50,50,30]),
+                   build(OP_CCW,x=9,y=6,i=1,j=0,feed=800,power=30),
+                   build(OP_LINE,x=12,y=6,feed=600,power=30),build(OP_OFF)])
+    assert list(writer.lines(path)) == ['G0 X1 Y2','M3 S50','G1 X5 F800','Y6','X9 S30','G3 X9 Y6 I1 J0','G1 X12 F600','M5']
+    # 连续调用沿用模态状态，G90之后重新输出完整的模态字
+    assert list(writer.lines(build(OP_LINE,x=13,y=6,feed=600,power=30))) == ['X13']
+    assert list(writer.lines(build([OP_ABS,OP_LINE],x=13,y=6,feed=600,power=30))) == ['G90','G1 X13 Y6 F600 S30']
+    writer.reset()
+    assert list(writer.lines(build(OP_RAPID,x=13,y=6))) == ['G0 X13 Y6']
+
+if __name__ == '__main__':
+    test_first_z_move_has_feed()
+    test_manual_z_move_keeps_modal_feed()
+    test_ordering_travel_comment()
+    test_modal_words_are_elided()
+    print('test')